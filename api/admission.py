@@ -0,0 +1,165 @@
+"""Request coalescing and admission control for the ASGI front end.
+
+Bursts of identical page requests (the same name or date sent by thousands
+of clients at once) should not each take a Flask worker thread:
+
+- SingleFlight shares one in-flight computation among concurrent callers
+  with the same key. The first caller runs it; everyone who arrives before
+  it finishes awaits the same result.
+- AdmissionQueue bounds the work waiting for the thread pool. Up to
+  `concurrency` requests run at once and at most `max_queue` wait behind
+  them. A request is shed straight away with Overloaded (a 503 with
+  Retry-After) when the queue is full, or when its expected wait passes
+  `max_wait`. The expected wait is the queue length times the average
+  service time over the concurrency. A request still waiting after
+  `max_wait` is shed too. Rejected clients get an answer in microseconds
+  instead of queueing until they time out, so latency for the admitted
+  requests stays bounded.
+
+Both run on the event loop and need no locks.
+"""
+import asyncio
+import collections
+import math
+import os
+import time
+
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_MAX_WAIT = 1.0
+# Weight of the newest sample in the average service time
+SMOOTHING = 0.1
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is in whole seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, factory):
+        """Await factory() once per key at a time; late callers share its outcome"""
+        task = self._calls.get(key)
+        if task is None:
+            # A separate task, so a caller that disconnects does not cancel the others
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller has gone
+            task.exception()
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class AdmissionQueue:
+    """Bounded wait queue in front of `concurrency` workers, with load shedding"""
+
+    def __init__(self, concurrency, max_queue=DEFAULT_MAX_QUEUE, max_wait=DEFAULT_MAX_WAIT):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.service_time = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def expected_wait(self, position=None):
+        """Seconds a request at this queue position can expect to wait"""
+        position = self.queued + 1 if position is None else position
+        return position * self.service_time / self.concurrency
+
+    def _reject(self):
+        self.shed += 1
+        retry_after = max(1, math.ceil(self.expected_wait()))
+        raise Overloaded(retry_after)
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue or self.expected_wait() > self.max_wait:
+            self._reject()
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        # Not asyncio.wait_for: it can swallow a cancel that arrives with the slot
+        timer = loop.call_later(self.max_wait, self._expire, waiter)
+        try:
+            granted = await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                # The slot was handed over; pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            timer.cancel()
+        if not granted:
+            self._reject()
+        self.admitted += 1
+
+    def _expire(self, waiter):
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            waiter.set_result(False)
+
+    def release(self, elapsed=None):
+        if elapsed is not None:
+            if self.service_time:
+                self.service_time += SMOOTHING * (elapsed - self.service_time)
+            else:
+                self.service_time = elapsed
+        # Hand the slot straight to the next waiter, so active stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    async def run(self, factory):
+        """Await factory() once admitted; raises Overloaded when shed"""
+        await self.acquire()
+        start = time.perf_counter()
+        try:
+            return await factory()
+        finally:
+            self.release(time.perf_counter() - start)
+
+
+def from_env(concurrency):
+    """AdmissionQueue configured by NUMEROLOGY_ADMISSION_* variables.
+
+    NUMEROLOGY_ADMISSION_QUEUE is the queue depth (0 disables admission
+    control) and NUMEROLOGY_ADMISSION_MAX_WAIT_MS the longest a request may
+    wait for a worker.
+    """
+    max_queue = int(os.environ.get("NUMEROLOGY_ADMISSION_QUEUE", str(DEFAULT_MAX_QUEUE)))
+    if max_queue <= 0:
+        return None
+    max_wait = float(os.environ.get("NUMEROLOGY_ADMISSION_MAX_WAIT_MS", str(DEFAULT_MAX_WAIT * 1000))) / 1000
+    return AdmissionQueue(concurrency, max_queue=max_queue, max_wait=max_wait)
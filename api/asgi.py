@@ -0,0 +1,397 @@
+"""ASGI serving mode for the numerology app.
+
+Run with any ASGI server, e.g.:
+
+    cd api && uvicorn asgi:app --workers 4
+
+Request bodies are read on the event loop, so slow clients only cost a
+coroutine instead of a blocked worker. The fully buffered request is then
+handed to the Flask app on a bounded thread pool, which keeps every existing
+route working unchanged. Responses with a Content-Length come back whole;
+streamed ones (NDJSON, generators) are sent on as they are produced, with
+each chunk pulled from the WSGI iterable on the thread pool. Batch name
+scoring is handled natively and fanned out in chunks to a bounded process
+pool so large batches do not stall the event loop or serialize on the GIL.
+
+The name calculator's as-you-type scoring runs over a WebSocket at
+/ws/live-score (see live_score.py).
+
+Requests for the thread pool and batch scoring requests pass an admission
+queue that sheds load with a 503 and Retry-After once it is full or too
+slow. Concurrent identical requests to the calculator pages are coalesced
+into one Flask call (see admission.py).
+"""
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+import admission
+import columnar
+from index import JOBS, app as wsgi_app, name_columns, score_names
+from live_score import LiveScore
+from numerology import NameResult, parse_fields
+
+logger = logging.getLogger(__name__)
+
+WSGI_THREADS = int(os.environ.get("NUMEROLOGY_ASGI_THREADS", "8"))
+BATCH_WORKERS = int(os.environ.get("NUMEROLOGY_ASGI_BATCH_WORKERS", str(os.cpu_count() or 1)))
+# Chunks allowed in flight in the process pool; further chunks wait on the loop
+BATCH_QUEUE = int(os.environ.get("NUMEROLOGY_ASGI_BATCH_QUEUE", str(BATCH_WORKERS * 2)))
+BATCH_CHUNK = 2000
+# Batches this small are cheaper to score inline than to ship to another process
+INLINE_BATCH = 64
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Pages whose response depends only on the method, query and body
+COALESCED_PATHS = ("/name-calculator", "/lo-shu-grid")
+
+
+class ASGIApp:
+    """ASGI front end that shares routes and logic with the Flask app"""
+
+    def __init__(self, wsgi, threads=WSGI_THREADS, batch_workers=BATCH_WORKERS, batch_queue=BATCH_QUEUE):
+        self.wsgi = wsgi
+        self.threads = threads
+        self.batch_workers = batch_workers
+        self.batch_queue = batch_queue
+        self.routes = {
+            ("POST", "/api/name-numbers"): self.name_numbers,
+        }
+        self.admission = admission.from_env(threads)
+        self.single_flight = admission.SingleFlight()
+        self._thread_pool = None
+        self._process_pool = None
+        self._batch_slots = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def _ensure_pools(self):
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="wsgi")
+        if self._batch_slots is None:
+            self._batch_slots = asyncio.Semaphore(self.batch_queue)
+
+    def _get_process_pool(self):
+        if self._process_pool is None:
+            # Forking a process that already runs threads can deadlock children
+            self._process_pool = ProcessPoolExecutor(max_workers=self.batch_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+        return self._process_pool
+
+    def shutdown(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
+        self._batch_slots = None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._ensure_pools()
+                if JOBS is not None:
+                    JOBS.resume()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # -- entry point -------------------------------------------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "websocket":
+            await self.websocket(scope, receive, send)
+            return
+        if scope["type"] != "http":
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        self._ensure_pools()
+        try:
+            body = await read_body(receive)
+        except BodyTooLarge:
+            await send_response(send, 413, [(b"content-type", b"text/plain")], b"Request body too large")
+            return
+
+        handler = self.routes.get((scope["method"], scope["path"]))
+        if handler is not None:
+            handled = await handler(scope, body, send)
+            if handled:
+                return
+        await self.call_wsgi(scope, body, send)
+
+    # -- native routes -----------------------------------------------------
+
+    async def websocket(self, scope, receive, send):
+        """Live name scoring: one LiveScore per connection"""
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        if scope["path"] != "/ws/live-score":
+            await send({"type": "websocket.close", "code": 4404})
+            return
+        await send({"type": "websocket.accept"})
+        live = LiveScore()
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            text = message.get("text")
+            if text is None:
+                text = (message.get("bytes") or b"").decode("utf-8", "replace")
+            try:
+                reply = live.apply(json.loads(text))
+            except ValueError as e:
+                reply = {"error": str(e)}
+            await send({"type": "websocket.send", "text": json.dumps(reply)})
+
+    async def name_numbers(self, scope, body, send):
+        """Score batches off the event loop; anything else goes to Flask"""
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return False
+        names = payload.get("names") if isinstance(payload, dict) else None
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            return False
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if "table" in query or "table" in payload:
+            # Tenant tables are resolved by the Flask view
+            return False
+        try:
+            fields = parse_fields(query["fields"][0] if "fields" in query else payload.get("fields"),
+                                  NameResult.FIELDS)
+        except ValueError:
+            # Let the Flask view report the error
+            return False
+        try:
+            results = await self.admit(lambda: self.score_batch(names, fields))
+        except admission.Overloaded as e:
+            await send_overloaded(send, e)
+            return True
+        except KeyError as e:
+            logger.error(f"Unsupported character in name API: {str(e)}")
+            await send_json(send, 400, {"error": "Name contains unsupported characters"})
+            return True
+        if columnar.wants_columns(request_accept(scope)):
+            body = columnar.encode(name_columns(results, fields))
+            await send_response(send, 200, [(b"content-type", columnar.MIMETYPE.encode()),
+                                            (b"content-length", str(len(body)).encode()),
+                                            (b"vary", b"Accept")], body)
+            return True
+        await send_json(send, 200, {"results": results})
+        return True
+
+    async def score_batch(self, names, fields=None):
+        """Score names in chunks on the process pool, bounded by batch_queue"""
+        if len(names) <= INLINE_BATCH:
+            return score_names(names, fields)
+        loop = asyncio.get_running_loop()
+        pool = self._get_process_pool()
+
+        async def run_chunk(chunk):
+            async with self._batch_slots:
+                return await loop.run_in_executor(pool, score_names, chunk, fields)
+
+        chunks = [names[i:i + BATCH_CHUNK] for i in range(0, len(names), BATCH_CHUNK)]
+        results = []
+        for part in await asyncio.gather(*(run_chunk(c) for c in chunks)):
+            results.extend(part)
+        return results
+
+    async def admit(self, factory):
+        """Await factory() through the admission queue, if there is one"""
+        if self.admission is None:
+            return await factory()
+        return await self.admission.run(factory)
+
+    # -- WSGI bridge -------------------------------------------------------
+
+    async def call_wsgi(self, scope, body, send):
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body)
+
+        async def respond():
+            return await loop.run_in_executor(self._thread_pool, run_wsgi, self.wsgi, environ)
+
+        async def start():
+            return await loop.run_in_executor(self._thread_pool, start_wsgi, self.wsgi, environ)
+
+        try:
+            if scope["path"] in COALESCED_PATHS and scope["method"] in ("GET", "POST"):
+                # Shared by every waiting caller, so always buffered
+                key = (scope["method"], scope["path"], scope.get("query_string", b""),
+                       environ.get("CONTENT_TYPE", ""), body)
+                status, headers, payload = await self.single_flight.do(key, lambda: self.admit(respond))
+                await send_response(send, status, headers, payload)
+                return
+            # The admission slot covers the view; the rest of a stream is pulled after it
+            status, headers, payload, result = await self.admit(start)
+        except admission.Overloaded as e:
+            await send_overloaded(send, e)
+            return
+        if result is None:
+            await send_response(send, status, headers, payload)
+            return
+        try:
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            while payload is not None:
+                following = await loop.run_in_executor(self._thread_pool, next, result, None)
+                if payload or following is None:
+                    await send({"type": "http.response.body", "body": payload,
+                                "more_body": following is not None})
+                payload = following
+        finally:
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self._thread_pool, result.close)
+
+
+class BodyTooLarge(Exception):
+    """Raised when a request body exceeds MAX_BODY_BYTES"""
+
+
+async def read_body(receive):
+    """Collect the full request body without blocking a thread"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    path = scope["path"].encode("utf-8")
+    root_path = scope.get("root_path", "").encode("utf-8")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.decode("latin-1"),
+        "PATH_INFO": path.decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "REMOTE_ADDR": client[0],
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def run_wsgi(wsgi, environ):
+    """Call a WSGI app and collect (status, headers, body)"""
+    status, headers, body, result = start_wsgi(wsgi, environ)
+    if result is None:
+        return status, headers, body
+    try:
+        return status, headers, b"".join([body, *result])
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+def start_wsgi(wsgi, environ):
+    """Call a WSGI app and return (status, headers, body, result).
+
+    A response that declares its Content-Length is read whole into body and
+    result is None. Otherwise body is the first chunk (None if there is
+    none) and result an iterator over the rest, which the caller must close.
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: None
+
+    result = wsgi(environ, start_response)
+    try:
+        chunks = iter(result)
+        # An app may call start_response only once iteration begins
+        first = next(chunks, None)
+        headers = response["headers"]
+        if first is None or any(name == b"content-length" for name, _ in headers):
+            body = b"".join([first or b"", *chunks])
+        else:
+            if chunks is not result:
+                chunks = ClosingIterator(chunks, getattr(result, "close", None))
+            return response["status"], headers, first, chunks
+    except BaseException:
+        if hasattr(result, "close"):
+            result.close()
+        raise
+    if hasattr(result, "close"):
+        result.close()
+    return response["status"], headers, body, None
+
+
+def request_accept(scope):
+    """Parsed Accept header of an ASGI request"""
+    for name, value in scope.get("headers", ()):
+        if name == b"accept":
+            return parse_accept_header(value.decode("latin-1"), MIMEAccept)
+    return MIMEAccept()
+
+
+async def send_response(send, status, headers, body):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_overloaded(send, overloaded):
+    await send_response(send, 503, [(b"content-type", b"text/plain"),
+                                    (b"retry-after", str(overloaded.retry_after).encode())],
+                        b"Server busy, please retry")
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send_response(send, status, [(b"content-type", b"application/json"),
+                                       (b"content-length", str(len(body)).encode())], body)
+
+
+app = ASGIApp(wsgi_app)
@@ -0,0 +1,281 @@
+"""Brand name generator: candidates that hit Pythagorean and Chaldean targets.
+
+A candidate is [prefix] + word [+ separator + word ...] + [suffix], built
+from user-supplied lists. Each entry's letter sums are computed once, so a
+combination's totals are just additions.
+
+Reduction is digit summing, so a total's reduced number is fixed by the
+total modulo 9, master numbers aside. That allows a meet-in-the-middle
+search: the last part of the name (suffix, or last word) is bucketed by
+(Pythagorean mod 9, Chaldean mod 9), and every partial name on the left
+joins only the single bucket whose residues complete the targets. No other
+pairing is ever looked at. Master targets (11, 22, 33) are reached by only
+a few exact totals, so for those the buckets are keyed by the exact total
+instead and a left-hand total joins just the buckets that land on one.
+
+Results come out cheapest first (cost = letter count, so shorter names
+first) from a best-first search: left-hand combinations are enumerated
+lazily in cost order, and each is paired with its bucket in cost order, so
+the top k stream out without enumerating the whole product. The search
+gives up after max_steps steps; the iterator's `truncated` flag then tells
+callers that more matches may exist.
+
+    python api/brand_names.py words.txt --prefix Neo --suffix ly \\
+        --pythagorean 8 --chaldean 5 -k 20
+"""
+import argparse
+import bisect
+import heapq
+import itertools
+import json
+import sys
+
+from numerology import MASTER_NUMBERS, calculate_numerology, chaldean, pythagorean, reduce_to_single_digit
+
+REDUCTION_BASE = 9
+TARGETS = tuple(range(1, 10)) + MASTER_NUMBERS
+MAX_STEPS = 100000
+
+
+class Part:
+    """One list entry with its precomputed letter sums"""
+    __slots__ = ('text', 'cost', 'pythagorean', 'chaldean')
+
+    def __init__(self, text):
+        self.text = text
+        self.pythagorean = calculate_numerology(text, pythagorean)
+        self.chaldean = calculate_numerology(text, chaldean)
+        self.cost = sum(1 for c in text if c.isalpha())
+
+
+def prepare(entries):
+    """Deduplicated Parts sorted by cost; blank entries and ones with unsupported letters are skipped"""
+    parts = []
+    for text in dict.fromkeys(e.strip() for e in entries):
+        if not text:
+            continue
+        try:
+            parts.append(Part(text))
+        except KeyError:
+            continue
+    parts.sort(key=lambda part: part.cost)
+    return parts
+
+
+def _cheapest_combinations(lists):
+    """Index tuples over sorted lists, in nondecreasing total cost"""
+    if any(not parts for parts in lists):
+        return
+    start = (0,) * len(lists)
+    heap = [(sum(parts[0].cost for parts in lists), start)]
+    seen = {start}
+    while heap:
+        cost, indexes = heapq.heappop(heap)
+        yield cost, indexes
+        for d, parts in enumerate(lists):
+            i = indexes[d] + 1
+            if i < len(parts):
+                following = indexes[:d] + (i,) + indexes[d + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (cost - parts[i - 1].cost + parts[i].cost, following))
+
+
+def _totals_reducing_to(target, highest):
+    """Sorted totals up to highest whose reduced number is target"""
+    # Digit sums keep the residue mod 9, so only one total in nine can qualify
+    candidates = range(target % REDUCTION_BASE, highest + 1, REDUCTION_BASE)
+    return [n for n in candidates if reduce_to_single_digit(n) == target]
+
+
+class _Key:
+    """Bucket key for one system: ignored, residue mod 9, or exact total"""
+
+    def __init__(self, target, lists, system):
+        self.target = target
+        self.exact = target in MASTER_NUMBERS
+        if self.exact:
+            totals = [getattr(part, system) for part in lists[-1]]
+            # No name can add up to more than the largest entry of every list
+            highest = sum(max(getattr(part, system) for part in parts) for parts in lists)
+            self.reaching = _totals_reducing_to(target, highest)
+            self.low, self.high = min(totals), max(totals)
+
+    def of(self, total):
+        if self.target is None:
+            return 0
+        return total if self.exact else total % REDUCTION_BASE
+
+    def needed(self, total):
+        """Keys of right-hand parts that complete a left-hand total"""
+        if self.target is None:
+            return (0,)
+        if not self.exact:
+            return ((self.target - total) % REDUCTION_BASE,)
+        # Master numbers are reached by few totals: look up exactly those
+        lo = bisect.bisect_left(self.reaching, total + self.low)
+        hi = bisect.bisect_right(self.reaching, total + self.high)
+        return tuple(n - total for n in self.reaching[lo:hi])
+
+
+class Search:
+    """Iterator over generate()'s candidates.
+
+    truncated becomes True once the iterator is exhausted because the
+    search hit max_steps rather than running out of combinations.
+    """
+
+    def __init__(self, candidates):
+        self._candidates = candidates
+        self.truncated = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._candidates)
+        except StopIteration as stop:
+            self.truncated = bool(stop.value)
+            raise
+
+
+def generate(words, prefixes=(), suffixes=(), words_per_name=1, pythagorean_target=None,
+             chaldean_target=None, separator=" ", max_steps=MAX_STEPS):
+    """Candidate names hitting both targets, cheapest first, as a Search.
+
+    words, prefixes and suffixes are lists of strings (or of prepared Parts).
+    Prefixes and suffixes attach without a separator. A target of None
+    accepts any number. Stops after max_steps search steps.
+    """
+    return Search(_search(words, prefixes, suffixes, words_per_name, pythagorean_target,
+                          chaldean_target, separator, max_steps))
+
+
+def _search(words, prefixes, suffixes, words_per_name, pythagorean_target, chaldean_target,
+            separator, max_steps):
+    """Generator behind generate(); returns True if it stopped at max_steps"""
+    for target in (pythagorean_target, chaldean_target):
+        if target is not None and target not in TARGETS:
+            raise ValueError(f"Targets must be one of {', '.join(map(str, TARGETS))}")
+    as_parts = lambda items: items if items and isinstance(items[0], Part) else prepare(items)
+    words = as_parts(list(words))
+    # Lists left empty once blank entries are dropped count as not given
+    prefixes = as_parts(list(prefixes))
+    suffixes = as_parts(list(suffixes))
+    lists = [words] * words_per_name
+    if prefixes:
+        lists.insert(0, prefixes)
+    if suffixes:
+        lists.append(suffixes)
+    if not all(lists):
+        return
+    *left_lists, right = lists
+
+    p_key = _Key(pythagorean_target, lists, "pythagorean")
+    c_key = _Key(chaldean_target, lists, "chaldean")
+
+    # Right-hand parts by key pair, each bucket still in cost order
+    buckets = {}
+    for part in right:
+        buckets.setdefault((p_key.of(part.pythagorean), c_key.of(part.chaldean)), []).append(part)
+
+    lefts = _cheapest_combinations(left_lists)
+    cheapest_right = right[0].cost
+    counter = itertools.count()
+    heap = []
+
+    def pull_left():
+        # A lower bound for every completion of the next left combination
+        following = next(lefts, None)
+        if following is not None:
+            heapq.heappush(heap, (following[0] + cheapest_right, next(counter), following, None, 0))
+
+    pull_left()
+    for _ in range(max_steps):
+        if not heap:
+            return
+        priority, _, (left_cost, indexes), key, position = heapq.heappop(heap)
+        chosen = [parts[i] for parts, i in zip(left_lists, indexes)]
+        p = sum(part.pythagorean for part in chosen)
+        c = sum(part.chaldean for part in chosen)
+        if key is None:
+            # Left combination: pair it only with buckets that can complete it
+            for key in itertools.product(p_key.needed(p), c_key.needed(c)):
+                bucket = buckets.get(key)
+                if bucket:
+                    heapq.heappush(heap, (left_cost + bucket[0].cost, next(counter),
+                                          (left_cost, indexes), key, 0))
+            pull_left()
+            continue
+
+        bucket = buckets[key]
+        if position + 1 < len(bucket):
+            heapq.heappush(heap, (left_cost + bucket[position + 1].cost, next(counter),
+                                  (left_cost, indexes), key, position + 1))
+        last = bucket[position]
+        p_total = p + last.pythagorean
+        c_total = c + last.chaldean
+        p_number = reduce_to_single_digit(p_total)
+        c_number = reduce_to_single_digit(c_total)
+        # Keys match by construction; 2, 4 and 6 still exclude totals that reach 11, 22 or 33
+        if pythagorean_target is not None and p_number != pythagorean_target:
+            continue
+        if chaldean_target is not None and c_number != chaldean_target:
+            continue
+        chosen.append(last)
+        name_words = chosen[1 if prefixes else 0:len(chosen) - (1 if suffixes else 0)]
+        if len({part.text.lower() for part in name_words}) < len(name_words):
+            continue
+        text = separator.join(part.text for part in name_words)
+        if prefixes:
+            text = chosen[0].text + text
+        if suffixes:
+            text += chosen[-1].text
+        yield {
+            "name": text,
+            "pythagorean": p_number,
+            "chaldean": c_number,
+            "pythagorean_total": p_total,
+            "chaldean_total": c_total,
+            "length": priority
+        }
+    return bool(heap)
+
+
+def top_k(k, *args, **kwargs):
+    """The k cheapest candidates (see generate)"""
+    return list(itertools.islice(generate(*args, **kwargs), k))
+
+
+def read_list(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate brand names that hit numerology targets")
+    parser.add_argument("words", help="Word list file, one word per line")
+    parser.add_argument("--prefix", action="append", default=[], help="Prefix (repeatable)")
+    parser.add_argument("--suffix", action="append", default=[], help="Suffix (repeatable)")
+    parser.add_argument("--prefixes", help="File of prefixes")
+    parser.add_argument("--suffixes", help="File of suffixes")
+    parser.add_argument("--words-per-name", type=int, default=1)
+    parser.add_argument("--pythagorean", type=int)
+    parser.add_argument("--chaldean", type=int)
+    parser.add_argument("-k", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    prefixes = args.prefix + (read_list(args.prefixes) if args.prefixes else [])
+    suffixes = args.suffix + (read_list(args.suffixes) if args.suffixes else [])
+    candidates = generate(read_list(args.words), prefixes, suffixes, args.words_per_name,
+                          args.pythagorean, args.chaldean)
+    for candidate in itertools.islice(candidates, args.k):
+        print(json.dumps(candidate), flush=True)
+    if candidates.truncated:
+        print(json.dumps({"truncated": True}), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
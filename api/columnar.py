@@ -0,0 +1,99 @@
+"""Compact columnar binary format for the batch APIs.
+
+Batch clients that send Accept: application/x-numerology-columns get
+fixed-width little-endian arrays instead of JSON:
+
+    magic (8 bytes) | header length (u32) | JSON header | padding
+    | column 0 | padding | column 1 | ...
+
+The header lists each column's name, dtype (numpy notation, e.g. "|u1"),
+shape, byte offset from the start of the column data and byte length, plus
+any endpoint metadata. Column data starts on an 8-byte boundary and so
+does every column, so readers can map each one straight into an array
+without copying.
+
+The column buffers are written out as they are; the only copy is joining
+them into one response body. decode() is the client-side reader and needs
+only this module (numpy is optional there).
+"""
+import json
+import struct
+
+MIMETYPE = "application/x-numerology-columns"
+MAGIC = b"NUMCOL\x00\x01"
+ALIGN = 8
+
+
+def _pad(size):
+    return -size % ALIGN
+
+
+def encode(columns, **meta):
+    """Serialize {name: numpy array} into one bytes body"""
+    import numpy as np
+
+    specs = []
+    buffers = []
+    offset = 0
+    for name, array in columns.items():
+        # A no-op for arrays that are already contiguous and little-endian
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        buffer = memoryview(array.reshape(-1).view(np.uint8))
+        specs.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape),
+                      "offset": offset, "nbytes": len(buffer)})
+        buffers.append(buffer)
+        offset += len(buffer) + _pad(len(buffer))
+    rows = len(next(iter(columns.values()))) if columns else 0
+    header = json.dumps({"rows": rows, "columns": specs, **meta}).encode("utf-8")
+
+    parts = [MAGIC, struct.pack("<I", len(header)), header, b"\0" * _pad(len(MAGIC) + 4 + len(header))]
+    for buffer in buffers:
+        parts.append(buffer)
+        parts.append(b"\0" * _pad(len(buffer)))
+    return b"".join(parts)
+
+
+def decode(data):
+    """Parse a body into (header, {name: column}).
+
+    Columns are numpy arrays viewing data when numpy is installed, and
+    nested lists otherwise.
+    """
+    data = memoryview(data)
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a numerology columns body")
+    (header_len,) = struct.unpack_from("<I", data, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(data[start:start + header_len]))
+    data_start = start + header_len + _pad(start + header_len)
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    columns = {}
+    for spec in header["columns"]:
+        offset = data_start + spec["offset"]
+        raw = data[offset:offset + spec["nbytes"]]
+        if np is not None:
+            columns[spec["name"]] = np.frombuffer(raw, dtype=np.dtype(spec["dtype"])).reshape(spec["shape"])
+        else:
+            columns[spec["name"]] = _to_lists(raw, spec["dtype"], spec["shape"])
+    return header, columns
+
+
+_STRUCT_CODES = {"u1": "B", "i1": "b", "u2": "H", "i2": "h", "u4": "I", "i4": "i",
+                 "u8": "Q", "i8": "q", "f4": "f", "f8": "d", "b1": "?"}
+
+
+def _to_lists(raw, dtype, shape):
+    """Column as (nested) lists, for clients without numpy"""
+    code = _STRUCT_CODES[dtype[1:]]
+    values = list(struct.unpack(f"<{len(raw) // struct.calcsize(code)}{code}", raw))
+    for size in reversed(shape[1:]):
+        values = [values[i:i + size] for i in range(0, len(values), size)]
+    return values
+
+
+def wants_columns(accept_mimetypes):
+    """True when a request's Accept header prefers the columnar format"""
+    return accept_mimetypes.best_match(["application/json", MIMETYPE]) == MIMETYPE
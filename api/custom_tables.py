@@ -0,0 +1,350 @@
+"""Tenant-defined letter tables, versioned and compiled once.
+
+Some tenants score names with their own variant of the Latin letter values
+instead of the built-in Pythagorean and Chaldean mappings. They register
+tables at runtime:
+
+    POST   /api/tenants/<tenant>/tables           {"id": "vedic", "mapping": {"A": 1, ...}}
+    GET    /api/tenants/<tenant>/tables           latest version of each table
+    GET    /api/tenants/<tenant>/tables/<id>      one table (?version=, default latest)
+    DELETE /api/tenants/<tenant>/tables/<id>      every version
+
+and select one when scoring, e.g. {"name": ..., "tenant": "acme",
+"table": "vedic"} for /api/name-numbers (optionally "table_version").
+
+A mapping gives a value from 0 to 255 for each of A-Z, plus optionally
+other letters that no built-in table covers (such as Ø or Þ). Accented
+letters fold to their base letter, and non-Latin scripts keep their
+traditional values, as with the built-in tables. Registering a mapping
+creates the next version. Versions are immutable, and re-registering the
+latest mapping unchanged returns its version.
+
+Tables live in SQLite (NUMEROLOGY_TABLES_DB), so every worker on the node
+sees the same set. Compiling a mapping into its lookup tables takes about
+2 ms against a microsecond to score a name, so each worker compiles a
+mapping once, keyed by its content hash, and keeps up to
+NUMEROLOGY_TABLES_CACHE compiled mappings in an LRU. Requests resolve
+(tenant, table, version) to a compiled entry through a small map. That map
+is dropped whenever the store's generation counter moves, which every
+write bumps; workers check the counter at most every
+NUMEROLOGY_TABLES_RELOAD_MS (default 1000). New versions and deletions
+therefore reach running workers without a restart.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+
+from numerology import calculate_compiled, compile_mapping, letter_value, reduce_to_single_digit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 128
+DEFAULT_RELOAD_INTERVAL = 1.0
+MAX_LETTERS = 256
+# Values fit the bytes.translate() table, so ASCII names take the fast path
+MAX_VALUE = 255
+REQUIRED_LETTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+FIELDS = ("name", "number", "total")
+
+_ID = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+class TableNotFound(LookupError):
+    pass
+
+
+def check_id(value, what):
+    if not isinstance(value, str) or not _ID.fullmatch(value):
+        raise ValueError(f"{what} must be 1-64 letters, digits, '.', '_' or '-'")
+    return value
+
+
+def validate_mapping(mapping):
+    """Normalized copy of a tenant mapping (uppercase letter -> int); ValueError if invalid"""
+    if not isinstance(mapping, dict) or not mapping:
+        raise ValueError("'mapping' must be a non-empty object of letter values")
+    if len(mapping) > MAX_LETTERS:
+        raise ValueError(f"A mapping may have at most {MAX_LETTERS} letters")
+    normalized = {}
+    for key, value in mapping.items():
+        letter = key.upper() if isinstance(key, str) else None
+        if letter is None or len(letter) != 1 or not letter.isalpha():
+            raise ValueError(f"Mapping key {key!r} is not a single letter")
+        if letter_value(letter, {}) is not None:
+            raise ValueError(f"{key!r} belongs to a script with fixed values and cannot be remapped")
+        if unicodedata.normalize("NFKD", letter) != letter:
+            raise ValueError(f"{key!r} is scored as its base letter; map that instead")
+        if type(value) is not int or not 0 <= value <= MAX_VALUE:
+            raise ValueError(f"Value for {key!r} must be an integer from 0 to {MAX_VALUE}")
+        if normalized.get(letter, value) != value:
+            raise ValueError(f"{key!r} is given two different values")
+        normalized[letter] = value
+    missing = REQUIRED_LETTERS - normalized.keys()
+    if missing:
+        raise ValueError(f"Mapping is missing letters: {', '.join(sorted(missing))}")
+    return dict(sorted(normalized.items()))
+
+
+def mapping_digest(mapping):
+    return hashlib.blake2b(json.dumps(mapping, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CustomTable:
+    """A resolved table version and its compiled lookup tables"""
+    __slots__ = ("tenant", "table_id", "version", "digest", "entry")
+
+    def __init__(self, tenant, table_id, version, digest, entry):
+        self.tenant = tenant
+        self.table_id = table_id
+        self.version = version
+        self.digest = digest
+        self.entry = entry
+
+    def score(self, name, fields=None):
+        """{"name", "number" (reduced), "total"}, or just the given fields.
+
+        Raises KeyError for letters no table covers.
+        """
+        total = calculate_compiled(name, self.entry)
+        result = {"name": name, "number": reduce_to_single_digit(total), "total": total}
+        if fields:
+            return {field: result[field] for field in fields}
+        return result
+
+    def describe(self):
+        return {"tenant": self.tenant, "id": self.table_id, "version": self.version}
+
+
+class TableRegistry:
+    """Versioned tenant tables in SQLite, with per-process compiled caching"""
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.compiles = 0
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        # digest -> compiled entry, least recently used first
+        self._compiled = collections.OrderedDict()
+        # (tenant, table_id, version or None) -> CustomTable
+        self._resolved = {}
+        self._generation = None
+        self._checked = 0.0
+        self._conn().executescript(
+            "CREATE TABLE IF NOT EXISTS custom_tables ("
+            " tenant TEXT NOT NULL,"
+            " table_id TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " mapping TEXT NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " description TEXT,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (tenant, table_id, version));"
+            "CREATE TABLE IF NOT EXISTS custom_tables_meta (generation INTEGER NOT NULL);"
+            "INSERT INTO custom_tables_meta (generation)"
+            " SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM custom_tables_meta);"
+        )
+
+    def _conn(self):
+        # Connections must not cross a fork; reopen in each worker process
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._local = threading.local()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql, params):
+        """Run one write and bump the generation in the same transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(sql, params)
+            conn.execute("UPDATE custom_tables_meta SET generation = generation + 1")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._resolved.clear()
+        return cursor
+
+    # -- managing tables ---------------------------------------------------
+
+    def register(self, tenant, table_id, mapping, description=None):
+        """Store mapping as the next version; returns (record, created)"""
+        check_id(tenant, "Tenant")
+        check_id(table_id, "Table id")
+        if description is not None and not isinstance(description, str):
+            raise ValueError("'description' must be a string")
+        mapping = validate_mapping(mapping)
+        digest = mapping_digest(mapping)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            latest = conn.execute(
+                "SELECT version, digest FROM custom_tables WHERE tenant = ? AND table_id = ?"
+                " ORDER BY version DESC LIMIT 1", (tenant, table_id)).fetchone()
+            if latest is not None and latest["digest"] == digest:
+                conn.execute("COMMIT")
+                return self.get(tenant, table_id, latest["version"]), False
+            version = latest["version"] + 1 if latest is not None else 1
+            conn.execute(
+                "INSERT INTO custom_tables (tenant, table_id, version, mapping, digest, description, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tenant, table_id, version, json.dumps(mapping), digest, description, time.time()))
+            conn.execute("UPDATE custom_tables_meta SET generation = generation + 1")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._resolved.clear()
+        logger.info(f"Registered table {tenant}/{table_id} version {version}")
+        return self.get(tenant, table_id, version), True
+
+    def get(self, tenant, table_id, version=None):
+        """Stored record with its mapping, or None"""
+        row = self._row(tenant, table_id, version)
+        if row is None:
+            return None
+        versions = [r[0] for r in self._conn().execute(
+            "SELECT version FROM custom_tables WHERE tenant = ? AND table_id = ? ORDER BY version",
+            (tenant, table_id))]
+        return {"tenant": tenant, "id": table_id, "version": row["version"], "versions": versions,
+                "description": row["description"], "created": row["created"],
+                "mapping": json.loads(row["mapping"])}
+
+    def list(self, tenant):
+        """Latest version of each of a tenant's tables"""
+        rows = self._conn().execute(
+            "SELECT table_id, MAX(version) AS version, COUNT(*) AS versions, MAX(created) AS updated"
+            " FROM custom_tables WHERE tenant = ? GROUP BY table_id ORDER BY table_id", (tenant,))
+        return [{"id": row["table_id"], "version": row["version"], "versions": row["versions"],
+                 "updated": row["updated"]} for row in rows]
+
+    def delete(self, tenant, table_id):
+        """Remove every version of a table; False if there were none"""
+        cursor = self._write("DELETE FROM custom_tables WHERE tenant = ? AND table_id = ?", (tenant, table_id))
+        return cursor.rowcount > 0
+
+    def _row(self, tenant, table_id, version=None):
+        if version is None:
+            return self._conn().execute(
+                "SELECT * FROM custom_tables WHERE tenant = ? AND table_id = ?"
+                " ORDER BY version DESC LIMIT 1", (tenant, table_id)).fetchone()
+        return self._conn().execute(
+            "SELECT * FROM custom_tables WHERE tenant = ? AND table_id = ? AND version = ?",
+            (tenant, table_id, version)).fetchone()
+
+    # -- scoring -----------------------------------------------------------
+
+    def _check_generation(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        generation = self._conn().execute("SELECT generation FROM custom_tables_meta").fetchone()[0]
+        if generation != self._generation:
+            with self._lock:
+                if self._generation is not None:
+                    logger.info(f"Custom tables changed (generation {generation}); reloading")
+                self._generation = generation
+                self._resolved.clear()
+
+    def resolve(self, tenant, table_id, version=None):
+        """CustomTable for a table version (default latest).
+
+        Raises TableNotFound if there is no such table, ValueError for
+        malformed ids.
+        """
+        # Before the cache lookup: ids straight from a request may not even be hashable
+        check_id(tenant, "Tenant")
+        check_id(table_id, "Table id")
+        self._check_generation()
+        key = (tenant, table_id, version)
+        table = self._resolved.get(key)
+        if table is not None:
+            return table
+        row = self._row(tenant, table_id, version)
+        if row is None:
+            raise TableNotFound(f"No table {table_id!r} for tenant {tenant!r}"
+                                + (f" with version {version}" if version is not None else ""))
+        table = CustomTable(tenant, table_id, row["version"], row["digest"], self._entry(row))
+        with self._lock:
+            if len(self._resolved) >= self.cache_size:
+                self._resolved.clear()
+            self._resolved[key] = table
+        return table
+
+    def _entry(self, row):
+        """Compiled lookup tables for a row's mapping, shared by identical mappings"""
+        digest = row["digest"]
+        with self._lock:
+            entry = self._compiled.get(digest)
+            if entry is not None:
+                self._compiled.move_to_end(digest)
+                return entry
+        # Compile outside the lock; a concurrent compile of the same mapping is harmless
+        entry = compile_mapping(json.loads(row["mapping"]))
+        with self._lock:
+            self.compiles += 1
+            self._compiled[digest] = entry
+            self._compiled.move_to_end(digest)
+            while len(self._compiled) > self.cache_size:
+                self._compiled.popitem(last=False)
+        return entry
+
+    def warm(self):
+        """Compile the latest version of the most recently updated tables (up to the cache size)"""
+        rows = self._conn().execute(
+            "SELECT t.* FROM custom_tables t JOIN"
+            " (SELECT tenant, table_id, MAX(version) AS version FROM custom_tables GROUP BY tenant, table_id) latest"
+            " USING (tenant, table_id, version) ORDER BY t.created DESC LIMIT ?", (self.cache_size,)).fetchall()
+        for row in reversed(rows):
+            self._entry(row)
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {"compiled": len(self._compiled), "cache_size": self.cache_size,
+                    "compiles": self.compiles, "resolved": len(self._resolved), "generation": self._generation}
+
+
+def from_env():
+    """Registry in NUMEROLOGY_TABLES_DB (default: a file in the temp dir).
+
+    NUMEROLOGY_TABLES_CACHE bounds the compiled tables kept per process and
+    NUMEROLOGY_TABLES_RELOAD_MS how stale a worker's view may get. Recent
+    tables are compiled at startup, so preforked workers share them.
+    """
+    path = os.environ.get("NUMEROLOGY_TABLES_DB") or os.path.join(tempfile.gettempdir(), "numerology-tables.db")
+    try:
+        registry = TableRegistry(
+            path,
+            cache_size=int(os.environ.get("NUMEROLOGY_TABLES_CACHE", str(DEFAULT_CACHE_SIZE))),
+            reload_interval=float(os.environ.get("NUMEROLOGY_TABLES_RELOAD_MS",
+                                                 str(DEFAULT_RELOAD_INTERVAL * 1000))) / 1000,
+        )
+        warmed = registry.warm()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Could not open table store {path}: {str(e)}")
+        return None
+    if warmed:
+        logger.info(f"Compiled {warmed} custom tables from {path}")
+    return registry
@@ -0,0 +1,497 @@
+"""In-process people directory with numerology-profile search.
+
+Every stored person gets a profile computed once on insert: life path
+number, reduced Pythagorean and Chaldean name numbers, and the set of
+digits present in their Lo Shu grid (a 9-bit mask, bit d-1 for digit d).
+
+Search runs on bitset indexes rather than scanning records. There is one
+bitset (a numpy array of uint64 words, bit i for person i) per attribute
+value, e.g. "life path 7" or "Chaldean 5", and one per Lo Shu digit for
+"digit d is present". A query such as
+
+    directory.query(life_path=7, chaldean=5, missing=[4, 8])
+
+is then alive & life_path[7] & chaldean[5] & ~present[4] & ~present[8],
+a handful of vectorized ANDs over n/64 words, followed by one pass to turn
+the set bits back into ids.
+
+Ids are row numbers and are never reused; removing a person clears their
+bits. Set NUMEROLOGY_PEOPLE_CSV to a CSV file (name, day, month, year
+columns) to load a directory at startup.
+
+The indexes live in each process. So that every worker sees the people
+added and removed through the API, those writes go to a SQLite log
+(NUMEROLOGY_PEOPLE_DB) rather than straight into the local directory.
+Every worker replays the log in order on top of the same preload, so ids
+agree across workers. A worker sees its own writes at once and catches up
+with the others' at most NUMEROLOGY_PEOPLE_RELOAD_MS (default 1000) later.
+A log written on top of a different preload is not replayed; the workers
+then fall back to private directories and say so in the log.
+"""
+import csv
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from numerology import (
+    calculate_numerology, chaldean, generate_lo_shu_grid, is_valid_date, life_path_number,
+    pythagorean, reduce_to_single_digit
+)
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTES = ("life_path", "pythagorean", "chaldean")
+DEFAULT_RELOAD_INTERVAL = 1.0
+DIGITS = range(1, 10)
+_ONE = np.uint64(1)
+
+
+def lo_shu_mask(grid_data):
+    """9-bit mask of the digits present in a Lo Shu grid"""
+    mask = 0
+    for number in grid_data["present_numbers"]:
+        mask |= 1 << (number - 1)
+    return mask
+
+
+def date_profile(day, month, year):
+    """(life path number, Lo Shu mask) for a birth date"""
+    if not is_valid_date(day, month, year):
+        raise ValueError(f"Invalid date: {day}/{month}/{year}")
+    return life_path_number(day, month, year), lo_shu_mask(generate_lo_shu_grid(day, month, year))
+
+
+def name_profile(name):
+    """(Pythagorean, Chaldean) reduced numbers; KeyError for unsupported characters"""
+    return (reduce_to_single_digit(calculate_numerology(name, pythagorean)),
+            reduce_to_single_digit(calculate_numerology(name, chaldean)))
+
+
+def bits_to_ids(bits):
+    """Row numbers of the set bits in a word array"""
+    return np.flatnonzero(np.unpackbits(bits.astype("<u8", copy=False).view(np.uint8), bitorder="little"))
+
+
+def word_counts(bits):
+    """Set bits in each word"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    return np.unpackbits(bits.view(np.uint8)).reshape(len(bits), 64).sum(axis=1)
+
+
+def popcount(bits):
+    return int(word_counts(bits).sum())
+
+
+def page_ids(bits, offset=0, limit=None):
+    """(set bit count, row numbers of set bits offset..offset+limit).
+
+    Only the words holding the page are unpacked, so a page costs the same
+    however many rows match.
+    """
+    cumulative = np.cumsum(word_counts(bits), dtype=np.int64)
+    count = int(cumulative[-1]) if len(cumulative) else 0
+    if offset >= count or (limit is not None and limit <= 0):
+        return count, []
+    first = int(np.searchsorted(cumulative, offset, side="right"))
+    last = len(bits) if limit is None else int(np.searchsorted(cumulative, offset + limit, side="left")) + 1
+    skip = offset - (int(cumulative[first - 1]) if first else 0)
+    ids = bits_to_ids(bits[first:last])[skip:]
+    if limit is not None:
+        ids = ids[:limit]
+    return count, (ids + first * 64).tolist()
+
+
+def _as_values(value):
+    """A single value or an iterable of alternatives, as a tuple"""
+    if isinstance(value, (int, np.integer)):
+        return (int(value),)
+    return tuple(int(v) for v in value)
+
+
+class PeopleDirectory:
+    """People with precomputed profiles and bitset indexes per attribute value"""
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.RLock()
+        self._size = 0
+        self._capacity = 0
+        self._names = []
+        self._dates = np.zeros((0, 3), dtype=np.int32)
+        self._profiles = np.zeros((0, len(ATTRIBUTES)), dtype=np.int16)
+        self._masks = np.zeros(0, dtype=np.uint16)
+        self._alive = np.zeros(0, dtype=np.uint64)
+        self._present = np.zeros((9, 0), dtype=np.uint64)
+        self._index = {attribute: {} for attribute in ATTRIBUTES}
+        self._grow(capacity)
+
+    def __len__(self):
+        return popcount(self._alive)
+
+    @property
+    def next_id(self):
+        """Id the next stored person gets (removed rows keep theirs)"""
+        return self._size
+
+    # -- storage -------------------------------------------------------------
+
+    def _grow(self, needed):
+        """Make room for at least needed rows (capacity doubles)"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 64)
+        capacity = -(-capacity // 64) * 64
+        words = capacity // 64
+        pad_rows = capacity - self._capacity
+        pad_words = words - len(self._alive)
+        self._dates = np.concatenate([self._dates, np.zeros((pad_rows, 3), dtype=np.int32)])
+        self._profiles = np.concatenate([self._profiles, np.zeros((pad_rows, len(ATTRIBUTES)), dtype=np.int16)])
+        self._masks = np.concatenate([self._masks, np.zeros(pad_rows, dtype=np.uint16)])
+        self._alive = np.concatenate([self._alive, np.zeros(pad_words, dtype=np.uint64)])
+        self._present = np.concatenate([self._present, np.zeros((9, pad_words), dtype=np.uint64)], axis=1)
+        for bitsets in self._index.values():
+            for value, bits in bitsets.items():
+                bitsets[value] = np.concatenate([bits, np.zeros(pad_words, dtype=np.uint64)])
+        self._capacity = capacity
+
+    def _bitset(self, attribute, value):
+        bitsets = self._index[attribute]
+        bits = bitsets.get(value)
+        if bits is None:
+            bits = bitsets[value] = np.zeros(len(self._alive), dtype=np.uint64)
+        return bits
+
+    @staticmethod
+    def _set_bits(bits, rows):
+        np.bitwise_or.at(bits, rows >> 6, _ONE << (rows & 63).astype(np.uint64))
+
+    @staticmethod
+    def _clear_bits(bits, rows):
+        np.bitwise_and.at(bits, rows >> 6, ~(_ONE << (rows & 63).astype(np.uint64)))
+
+    # -- writes --------------------------------------------------------------
+
+    def add(self, name, day, month, year):
+        """Store one person and return their id"""
+        return self.add_many([(name, day, month, year)])[0]
+
+    def add_many(self, people):
+        """Store (name, day, month, year) records and return their ids.
+
+        Profiles are computed first, so a bad record (ValueError for an
+        invalid date, KeyError for an unsupported name) stores nothing.
+        """
+        dates_seen = {}
+        names, dates, profiles, masks = [], [], [], []
+        for name, day, month, year in people:
+            date = (int(day), int(month), int(year))
+            if date not in dates_seen:
+                dates_seen[date] = date_profile(*date)
+            life_path, mask = dates_seen[date]
+            names.append(name)
+            dates.append(date)
+            profiles.append((life_path,) + name_profile(name))
+            masks.append(mask)
+        if not names:
+            return []
+
+        with self._lock:
+            start = self._size
+            self._grow(start + len(names))
+            rows = np.arange(start, start + len(names), dtype=np.int64)
+            self._names.extend(names)
+            self._dates[rows] = dates
+            profiles = np.array(profiles, dtype=np.int16)
+            self._profiles[rows] = profiles
+            masks = np.array(masks, dtype=np.uint16)
+            self._masks[rows] = masks
+            self._size += len(names)
+
+            self._set_bits(self._alive, rows)
+            for column, attribute in enumerate(ATTRIBUTES):
+                values = profiles[:, column]
+                for value in np.unique(values):
+                    self._set_bits(self._bitset(attribute, int(value)), rows[values == value])
+            for digit in DIGITS:
+                self._set_bits(self._present[digit - 1], rows[(masks >> (digit - 1)) & 1 == 1])
+            return rows.tolist()
+
+    def remove(self, person_id):
+        """Remove a person; returns False if there was no such person"""
+        with self._lock:
+            if not self._is_alive(person_id):
+                return False
+            rows = np.array([person_id], dtype=np.int64)
+            self._clear_bits(self._alive, rows)
+            for column, attribute in enumerate(ATTRIBUTES):
+                self._clear_bits(self._index[attribute][int(self._profiles[person_id, column])], rows)
+            for digit in DIGITS:
+                self._clear_bits(self._present[digit - 1], rows)
+            self._names[person_id] = None
+            return True
+
+    # -- reads ---------------------------------------------------------------
+
+    def _is_alive(self, person_id):
+        return 0 <= person_id < self._size and bool((int(self._alive[person_id >> 6]) >> (person_id & 63)) & 1)
+
+    def get(self, person_id):
+        """Stored record and profile for an id, or None"""
+        with self._lock:
+            if not self._is_alive(person_id):
+                return None
+            day, month, year = (int(v) for v in self._dates[person_id])
+            life_path, pythagorean_number, chaldean_number = (int(v) for v in self._profiles[person_id])
+            mask = int(self._masks[person_id])
+            return {
+                "id": person_id,
+                "name": self._names[person_id],
+                "day": day,
+                "month": month,
+                "year": year,
+                "life_path": life_path,
+                "pythagorean": pythagorean_number,
+                "chaldean": chaldean_number,
+                "lo_shu_missing": [d for d in DIGITS if not mask >> (d - 1) & 1]
+            }
+
+    def match(self, life_path=None, pythagorean=None, chaldean=None, present=(), missing=()):
+        """Bitset of the people matching every given predicate.
+
+        Attribute predicates take one value or an iterable of alternatives
+        (life_path=[11, 22, 33]); present/missing are Lo Shu digits.
+        """
+        criteria = {"life_path": life_path, "pythagorean": pythagorean, "chaldean": chaldean}
+        with self._lock:
+            bits = self._alive.copy()
+            for attribute, value in criteria.items():
+                if value is None:
+                    continue
+                either = np.zeros_like(bits)
+                for v in _as_values(value):
+                    found = self._index[attribute].get(v)
+                    if found is not None:
+                        either |= found
+                bits &= either
+            for digit in present:
+                bits &= self._present[int(digit) - 1]
+            for digit in missing:
+                bits &= ~self._present[int(digit) - 1]
+            return bits
+
+    def count(self, **criteria):
+        return popcount(self.match(**criteria))
+
+    def query(self, limit=None, offset=0, **criteria):
+        """Ids of matching people in insertion order"""
+        return page_ids(self.match(**criteria), offset, limit)[1]
+
+    def search(self, limit=None, offset=0, **criteria):
+        """(number of matches, one page of their ids), from a single match"""
+        return page_ids(self.match(**criteria), offset, limit)
+
+
+def load_csv(path, directory=None):
+    """Load people from a CSV file with name, day, month and year columns"""
+    directory = directory if directory is not None else PeopleDirectory()
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(f)
+        batch = []
+        for row in rows:
+            batch.append((row["name"], row["day"], row["month"], row["year"]))
+            if len(batch) >= 10000:
+                directory.add_many(batch)
+                batch = []
+        directory.add_many(batch)
+    return directory
+
+
+class SharedDirectory:
+    """A PeopleDirectory whose writes go through a SQLite log shared by every worker"""
+
+    def __init__(self, path, directory, reload_interval=DEFAULT_RELOAD_INTERVAL):
+        self.path = path
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.base = directory.next_id
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._applied = 0
+        self._checked = 0.0
+        conn = self._conn()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS people_log ("
+            " seq INTEGER PRIMARY KEY,"
+            " op TEXT NOT NULL,"
+            " person_id INTEGER NOT NULL,"
+            " name TEXT,"
+            " day INTEGER,"
+            " month INTEGER,"
+            " year INTEGER);"
+            "CREATE TABLE IF NOT EXISTS people_meta (base INTEGER NOT NULL, next_id INTEGER NOT NULL);"
+        )
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = conn.execute("SELECT base FROM people_meta").fetchone()
+            if meta is None:
+                conn.execute("INSERT INTO people_meta (base, next_id) VALUES (?, ?)", (self.base, self.base))
+            elif meta[0] != self.base:
+                if conn.execute("SELECT 1 FROM people_log LIMIT 1").fetchone() is not None:
+                    raise ValueError(f"log was written on top of {meta[0]} preloaded rows, not {self.base}")
+                conn.execute("UPDATE people_meta SET base = ?, next_id = ?", (self.base, self.base))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.sync(force=True)
+
+    def _conn(self):
+        # Connections must not cross a fork; reopen in each worker process
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._local = threading.local()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        self.sync()
+        return len(self.directory)
+
+    # -- replay ------------------------------------------------------------
+
+    def sync(self, force=False):
+        """Apply the log entries this process has not seen yet"""
+        now = time.monotonic()
+        if not force and now - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            self._checked = now
+            rows = self._conn().execute(
+                "SELECT seq, op, person_id, name, day, month, year FROM people_log WHERE seq > ? ORDER BY seq",
+                (self._applied,)).fetchall()
+            added = []
+            for seq, op, person_id, *record in rows:
+                if op == "add":
+                    added.append((person_id, tuple(record)))
+                    continue
+                self._apply(added)
+                added = []
+                self.directory.remove(person_id)
+            self._apply(added)
+            if rows:
+                self._applied = rows[-1][0]
+
+    def _apply(self, added):
+        if not added:
+            return
+        try:
+            ids = self.directory.add_many([record for _, record in added])
+        except (KeyError, ValueError) as e:
+            # Only if the letter tables changed since the entries were logged
+            logger.error(f"Could not replay {len(added)} logged people: {str(e)}")
+            return
+        if ids != [person_id for person_id, _ in added]:
+            logger.error(f"Logged people got ids {ids[0]}.. here instead of {added[0][0]}..")
+
+    # -- writes ------------------------------------------------------------
+
+    def add(self, name, day, month, year):
+        return self.add_many([(name, day, month, year)])[0]
+
+    def add_many(self, people):
+        """Validate records, append them to the log and return their ids.
+
+        As with PeopleDirectory.add_many, a bad record stores nothing.
+        """
+        dates_seen = {}
+        records = []
+        for name, day, month, year in people:
+            date = (int(day), int(month), int(year))
+            if date not in dates_seen:
+                dates_seen[date] = date_profile(*date)
+            name_profile(name)
+            records.append((name,) + date)
+        if not records:
+            return []
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (first,) = conn.execute("SELECT next_id FROM people_meta").fetchone()
+            ids = list(range(first, first + len(records)))
+            conn.executemany(
+                "INSERT INTO people_log (op, person_id, name, day, month, year) VALUES ('add', ?, ?, ?, ?, ?)",
+                [(person_id,) + record for person_id, record in zip(ids, records)])
+            conn.execute("UPDATE people_meta SET next_id = ?", (first + len(records),))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.sync(force=True)
+        return ids
+
+    def remove(self, person_id):
+        """Remove a person everywhere; returns False if there was no such person"""
+        self.sync(force=True)
+        if self.directory.get(person_id) is None:
+            return False
+        conn = self._conn()
+        conn.execute("INSERT INTO people_log (op, person_id) VALUES ('remove', ?)", (person_id,))
+        self.sync(force=True)
+        return True
+
+    # -- reads -------------------------------------------------------------
+
+    def get(self, person_id):
+        self.sync()
+        return self.directory.get(person_id)
+
+    def match(self, **criteria):
+        self.sync()
+        return self.directory.match(**criteria)
+
+    def count(self, **criteria):
+        self.sync()
+        return self.directory.count(**criteria)
+
+    def query(self, limit=None, offset=0, **criteria):
+        self.sync()
+        return self.directory.query(limit, offset, **criteria)
+
+    def search(self, limit=None, offset=0, **criteria):
+        self.sync()
+        return self.directory.search(limit, offset, **criteria)
+
+
+def from_env():
+    """Directory for the app, preloaded from NUMEROLOGY_PEOPLE_CSV when set.
+
+    Writes are shared through the log in NUMEROLOGY_PEOPLE_DB (default: a
+    file in the temp dir). If the log cannot be used, the directory stays
+    private to this process.
+    """
+    path = os.environ.get("NUMEROLOGY_PEOPLE_CSV")
+    directory = PeopleDirectory()
+    if path:
+        load_csv(path, directory)
+        logger.info(f"Loaded {len(directory)} people from {path}")
+    log_path = os.environ.get("NUMEROLOGY_PEOPLE_DB") or os.path.join(tempfile.gettempdir(), "numerology-people.db")
+    try:
+        return SharedDirectory(
+            log_path, directory,
+            reload_interval=float(os.environ.get("NUMEROLOGY_PEOPLE_RELOAD_MS",
+                                                 str(DEFAULT_RELOAD_INTERVAL * 1000))) / 1000,
+        )
+    except (OSError, sqlite3.Error, ValueError) as e:
+        logger.error(f"Could not use people log {log_path}: {str(e)}; API writes stay in this process")
+        return directory
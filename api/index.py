@@ -1,26 +1,36 @@
-from flask import Flask, request, render_template_string
-from datetime import datetime
+from flask import Flask, Response, request, jsonify, send_file
+import io
+import itertools
+import json
 import logging
+import os
+
+import numpy as np
+
+import brand_names
+import columnar
+import custom_tables
+import directory
+import jobs
+import js_engine
+import lo_shu_bulk
+import lo_shu_bundle
+import memory_diagnostics
+import name_stats
+import result_cache
+import tracing
+from numerology import (
+    pythagorean, chaldean, calculate_numerology, reduce_to_single_digit,
+    is_valid_date, generate_lo_shu_grid, LO_SHU_POSITIONS, NameResult, LoShuResult,
+    parse_fields
+)
+from tracing import span
 
 app = Flask(__name__)
 
 # Enable logging for debugging
 logging.basicConfig(level=logging.DEBUG)
 
-# Pythagorean numerology mapping
-pythagorean = {
-    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'H': 8, 'I': 9,
-    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'O': 6, 'P': 7, 'Q': 8, 'R': 9,
-    'S': 1, 'T': 2, 'U': 3, 'V': 4, 'W': 5, 'X': 6, 'Y': 7, 'Z': 8
-}
-
-# Chaldean numerology mapping
-chaldean = {
-    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 8, 'G': 3, 'H': 5, 'I': 1,
-    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'O': 7, 'P': 8, 'Q': 1, 'R': 2,
-    'S': 3, 'T': 4, 'U': 6, 'V': 6, 'W': 6, 'X': 5, 'Y': 1, 'Z': 7
-}
-
 # Base CSS styles for consistent theming across pages
 BASE_STYLES = """
         :root {
@@ -168,6 +178,146 @@ THEME_SCRIPT = """
     </script>
 """
 
+# Client-side engine generated from the letter tables (js_engine.py), served
+# under a content-hashed URL so browsers can cache it indefinitely
+ENGINE_SOURCE = js_engine.build_source()
+ENGINE_VERSION = js_engine.source_hash(ENGINE_SOURCE)
+ENGINE_SCRIPT = f"""
+    <script src="/numerology-engine.{ENGINE_VERSION}.js"></script>
+"""
+
+# JavaScript for live scoring while typing. Names are scored in the browser by
+# the client-side engine; names it cannot score (characters beyond its tables)
+# go to the /ws/live-score WebSocket, which needs the ASGI server (asgi.py).
+# Without either, the form works as before.
+LIVE_SCORE_SCRIPT = """
+    <script>
+        (function() {
+            const input = document.querySelector('input[name="name"]');
+            const panel = document.getElementById('live-results');
+            if (!input || !panel) return;
+            
+            const engine = window.NumerologyEngine;
+            let socket = null;
+            let serverText = '';
+            let remote = false;
+            
+            function show(result, length) {
+                document.getElementById('live-pythagorean').textContent = result === null ? '–' : result.pythagorean;
+                document.getElementById('live-chaldean').textContent = result === null ? '–' : result.chaldean;
+                panel.hidden = length === 0;
+            }
+            
+            function send(message) {
+                if (socket && socket.readyState === WebSocket.OPEN) {
+                    socket.send(JSON.stringify(message));
+                    return true;
+                }
+                return false;
+            }
+            
+            function connect() {
+                if (socket || !window.WebSocket) return;
+                const scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+                socket = new WebSocket(scheme + location.host + '/ws/live-score');
+                socket.onopen = function() {
+                    serverText = input.value;
+                    send({op: 'reset', text: serverText});
+                };
+                socket.onmessage = function(event) {
+                    if (!remote) return;
+                    const delta = JSON.parse(event.data);
+                    if ('pythagorean' in delta) {
+                        document.getElementById('live-pythagorean').textContent = delta.pythagorean === null ? '–' : delta.pythagorean;
+                    }
+                    if ('chaldean' in delta) {
+                        document.getElementById('live-chaldean').textContent = delta.chaldean === null ? '–' : delta.chaldean;
+                    }
+                    if ('length' in delta) panel.hidden = delta.length === 0;
+                };
+            }
+            
+            function sendDelta(current) {
+                let sent;
+                if (current.startsWith(serverText)) {
+                    sent = send({op: 'append', text: current.slice(serverText.length)});
+                } else if (serverText.startsWith(current)) {
+                    sent = send({op: 'delete', count: [...serverText].length - [...current].length});
+                } else {
+                    sent = send({op: 'reset', text: current});
+                }
+                if (sent) serverText = current;
+            }
+            
+            function update() {
+                const current = input.value;
+                const result = engine ? engine.score(current) : undefined;
+                remote = result === undefined;
+                if (remote) {
+                    connect();
+                    sendDelta(current);
+                } else {
+                    show(result, current.length);
+                }
+            }
+            
+            input.addEventListener('input', update);
+            if (input.value) update();
+        })();
+    </script>
+"""
+
+# JavaScript that answers form submissions in the browser when the client-side
+# engine can score the name; otherwise the form posts to the server as usual
+CLIENT_RESULTS_SCRIPT = """
+    <script>
+        (function() {
+            const engine = window.NumerologyEngine;
+            const form = document.querySelector('form');
+            const input = document.querySelector('input[name="name"]');
+            if (!engine || !form || !input) return;
+            
+            function item(label, value) {
+                const row = document.createElement('div');
+                row.className = 'result-item';
+                const labelSpan = document.createElement('span');
+                labelSpan.className = 'result-label';
+                labelSpan.textContent = label + ' ';
+                const valueSpan = document.createElement('span');
+                valueSpan.className = 'result-value';
+                valueSpan.textContent = value;
+                row.append(labelSpan, valueSpan);
+                return row;
+            }
+            
+            form.addEventListener('submit', function(event) {
+                const name = input.value.trim();
+                const result = engine.score(name);
+                if (!name || result === undefined) return;
+                event.preventDefault();
+                
+                const previous = document.querySelector('.results');
+                if (previous) previous.remove();
+                // Unsupported letters: the server shows no results either
+                if (result === null) return;
+                
+                const results = document.createElement('div');
+                results.className = 'results';
+                const heading = document.createElement('h2');
+                heading.textContent = 'Your Numerology Results:';
+                const note = document.createElement('p');
+                note.style.cssText = 'margin-top: 15px; font-size: 14px; color: var(--text-muted);';
+                const strong = document.createElement('strong');
+                strong.textContent = 'Input:';
+                note.append(strong, ' "' + name + '"');
+                results.append(heading, item('Pythagorean Numerology:', result.pythagorean),
+                               item('Chaldean Numerology:', result.chaldean), note);
+                form.after(results);
+            });
+        })();
+    </script>
+"""
+
 # Home page template
 HOME_TEMPLATE = f"""
 <!DOCTYPE html>
@@ -388,6 +538,16 @@ NAME_CALC_TEMPLATE = f"""
         .results p {{
             color: var(--text-muted);
         }}
+
+        .live-results {{
+            margin: -5px 0 15px 0;
+            color: var(--text-muted);
+            font-size: 14px;
+        }}
+
+        .live-results strong {{
+            color: var(--accent-color);
+        }}
     </style>
 </head>
 <body data-theme="light">
@@ -407,6 +567,9 @@ NAME_CALC_TEMPLATE = f"""
         <form method="post">
             <label>Enter a name or word:</label>
             <input type="text" name="name" required placeholder="Enter your name here..." value="{{{{ input_name }}}}">
+            <div id="live-results" class="live-results" hidden>
+                Pythagorean <strong id="live-pythagorean">–</strong> · Chaldean <strong id="live-chaldean">–</strong>
+            </div>
             <input type="submit" value="Calculate Numerology">
         </form>
 
@@ -429,10 +592,173 @@ NAME_CALC_TEMPLATE = f"""
     </div>
     
     {THEME_SCRIPT}
+    {ENGINE_SCRIPT}
+    {LIVE_SCORE_SCRIPT}
+    {CLIENT_RESULTS_SCRIPT}
 </body>
 </html>
 """
 
+# Lo Shu Grid result section, rendered inside LO_SHU_TEMPLATE when grid_data is set.
+# Kept separate so the pre-rendered bundle (lo_shu_bundle.py) can render it alone.
+LO_SHU_RESULT_TEMPLATE = """
+            <div class="grid-section">
+                <h3 style="color: var(--accent-color); text-align: center; margin-bottom: 20px;">
+                    🌟 Your Personal Lo Shu Grid 🌟
+                </h3>
+                
+                <div class="grid-container">
+                    <div class="lo-shu-grid">
+                        {% for i in range(9) %}
+                            <div class="grid-cell {{ 'empty' if not grid_data.grid[i] else '' }}" 
+                                 title="Position {{ [4,9,2,3,5,7,8,1,6][i] }}: {{ ['Planning & Organization', 'Fame & Recognition', 'Knowledge & Wisdom', 'Patience & Hard Work', 'Mental Strength', 'Love & Care', 'Communication', 'Money & Material', 'Health & Harmony'][i] }}">
+                                <span class="grid-numbers">{{ grid_data.grid[i] if grid_data.grid[i] else '○' }}</span>
+                            </div>
+                        {% endfor %}
+                    </div>
+                </div>
+
+                <div class="grid-legend">
+                    <h4 style="text-align: center; margin-bottom: 15px; color: var(--accent-color);">Grid Position Meanings</h4>
+                    <div class="legend-row">
+                        <span class="legend-position">4 - Planning</span>
+                        <span class="legend-position">9 - Fame</span>
+                        <span class="legend-position">2 - Knowledge</span>
+                    </div>
+                    <div class="legend-row">
+                        <span class="legend-position">3 - Patience</span>
+                        <span class="legend-position">5 - Mental Strength</span>
+                        <span class="legend-position">7 - Love</span>
+                    </div>
+                    <div class="legend-row">
+                        <span class="legend-position">8 - Money</span>
+                        <span class="legend-position">1 - Communication</span>
+                        <span class="legend-position">6 - Health</span>
+                    </div>
+                </div>
+
+                <div class="analysis">
+                    <div class="analysis-card">
+                        <h3><span class="icon">📊</span> Your Statistics</h3>
+                        <div class="stat-grid">
+                            <div class="stat-item">
+                                <span class="stat-number">{{ grid_data.date_string }}</span>
+                                <span class="stat-label">Birth Date</span>
+                            </div>
+                            <div class="stat-item">
+                                <span class="stat-number">{{ grid_data.present_numbers|length }}</span>
+                                <span class="stat-label">Active Numbers</span>
+                            </div>
+                            <div class="stat-item">
+                                <span class="stat-number">{{ grid_data.missing_numbers|length }}</span>
+                                <span class="stat-label">Growth Areas</span>
+                            </div>
+                            <div class="stat-item">
+                                <span class="stat-number">{{ grid_data.total_count }}</span>
+                                <span class="stat-label">Total Digits</span>
+                            </div>
+                        </div>
+                    </div>
+
+                    <div class="analysis-card">
+                        <h3><span class="icon">💪</span> Your Strengths</h3>
+                        <div class="analysis-section">
+                            <p>These numbers appear in your birth date and represent your natural talents:</p>
+                            <div class="number-list">
+                                {% for num in grid_data.present_numbers %}
+                                    <span class="number-tag" title="Number {{ num }} strength">{{ num }}</span>
+                                {% endfor %}
+                            </div>
+                            {% if not grid_data.present_numbers %}
+                                <p style="color: var(--text-muted); font-style: italic;">No specific strengths identified from birth date digits.</p>
+                            {% endif %}
+                        </div>
+                    </div>
+
+                    <div class="analysis-card">
+                        <h3><span class="icon">🎯</span> Growth Opportunities</h3>
+                        <div class="analysis-section">
+                            <p>These missing numbers represent areas for personal development:</p>
+                            <div class="number-list">
+                                {% for num in grid_data.missing_numbers %}
+                                    <span class="number-tag missing-tag" title="Number {{ num }} - area for growth">{{ num }}</span>
+                                {% endfor %}
+                            </div>
+                            {% if not grid_data.missing_numbers %}
+                                <p style="color: var(--accent-color); font-weight: bold;">Amazing! All numbers are present in your birth date.</p>
+                            {% endif %}
+                        </div>
+                    </div>
+                </div>
+
+                <div class="meanings-section">
+                    <h4>🔍 Number Meanings & Life Areas</h4>
+                    <div class="meaning-item">
+                        <div class="meaning-number">1</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Communication & Leadership</div>
+                            <div class="meaning-desc">Expression, speaking ability, leadership qualities, and social connections.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">2</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Knowledge & Intuition</div>
+                            <div class="meaning-desc">Learning capacity, wisdom, intuitive abilities, and emotional intelligence.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">3</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Patience & Hard Work</div>
+                            <div class="meaning-desc">Perseverance, dedication, ability to work through challenges systematically.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">4</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Planning & Organization</div>
+                            <div class="meaning-desc">Systematic thinking, organizational skills, and structured approach to life.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">5</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Mental Strength & Focus</div>
+                            <div class="meaning-desc">Mental resilience, concentration, ability to handle stress and pressure.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">6</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Health & Family Harmony</div>
+                            <div class="meaning-desc">Physical wellbeing, family relationships, nurturing, and caring nature.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">7</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Love & Relationships</div>
+                            <div class="meaning-desc">Emotional connections, romantic relationships, empathy, and compassion.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">8</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Money & Material Success</div>
+                            <div class="meaning-desc">Financial acumen, business sense, material achievements, and practical skills.</div>
+                        </div>
+                    </div>
+                    <div class="meaning-item">
+                        <div class="meaning-number">9</div>
+                        <div class="meaning-content">
+                            <div class="meaning-title">Fame & Recognition</div>
+                            <div class="meaning-desc">Public recognition, reputation, spiritual growth, and humanitarian nature.</div>
+                        </div>
+                    </div>
+                </div>
+            </div>"""
+
 # Lo Shu Grid template - Enhanced with better visuals and numerology meanings
 LO_SHU_TEMPLATE = f"""
 <!DOCTYPE html>
@@ -860,163 +1186,7 @@ LO_SHU_TEMPLATE = f"""
             </div>
         {{% endif %}}
 
-        {{% if grid_data %}}
-            <div class="grid-section">
-                <h3 style="color: var(--accent-color); text-align: center; margin-bottom: 20px;">
-                    🌟 Your Personal Lo Shu Grid 🌟
-                </h3>
-                
-                <div class="grid-container">
-                    <div class="lo-shu-grid">
-                        {{% for i in range(9) %}}
-                            <div class="grid-cell {{{{ 'empty' if not grid_data.grid[i] else '' }}}}" 
-                                 title="Position {{{{ [4,9,2,3,5,7,8,1,6][i] }}}}: {{{{ ['Planning & Organization', 'Fame & Recognition', 'Knowledge & Wisdom', 'Patience & Hard Work', 'Mental Strength', 'Love & Care', 'Communication', 'Money & Material', 'Health & Harmony'][i] }}}}">
-                                <span class="grid-numbers">{{{{ grid_data.grid[i] if grid_data.grid[i] else '○' }}}}</span>
-                            </div>
-                        {{% endfor %}}
-                    </div>
-                </div>
-
-                <div class="grid-legend">
-                    <h4 style="text-align: center; margin-bottom: 15px; color: var(--accent-color);">Grid Position Meanings</h4>
-                    <div class="legend-row">
-                        <span class="legend-position">4 - Planning</span>
-                        <span class="legend-position">9 - Fame</span>
-                        <span class="legend-position">2 - Knowledge</span>
-                    </div>
-                    <div class="legend-row">
-                        <span class="legend-position">3 - Patience</span>
-                        <span class="legend-position">5 - Mental Strength</span>
-                        <span class="legend-position">7 - Love</span>
-                    </div>
-                    <div class="legend-row">
-                        <span class="legend-position">8 - Money</span>
-                        <span class="legend-position">1 - Communication</span>
-                        <span class="legend-position">6 - Health</span>
-                    </div>
-                </div>
-
-                <div class="analysis">
-                    <div class="analysis-card">
-                        <h3><span class="icon">📊</span> Your Statistics</h3>
-                        <div class="stat-grid">
-                            <div class="stat-item">
-                                <span class="stat-number">{{{{ grid_data.date_string }}}}</span>
-                                <span class="stat-label">Birth Date</span>
-                            </div>
-                            <div class="stat-item">
-                                <span class="stat-number">{{{{ grid_data.present_numbers|length }}}}</span>
-                                <span class="stat-label">Active Numbers</span>
-                            </div>
-                            <div class="stat-item">
-                                <span class="stat-number">{{{{ grid_data.missing_numbers|length }}}}</span>
-                                <span class="stat-label">Growth Areas</span>
-                            </div>
-                            <div class="stat-item">
-                                <span class="stat-number">{{{{ grid_data.total_count }}}}</span>
-                                <span class="stat-label">Total Digits</span>
-                            </div>
-                        </div>
-                    </div>
-
-                    <div class="analysis-card">
-                        <h3><span class="icon">💪</span> Your Strengths</h3>
-                        <div class="analysis-section">
-                            <p>These numbers appear in your birth date and represent your natural talents:</p>
-                            <div class="number-list">
-                                {{% for num in grid_data.present_numbers %}}
-                                    <span class="number-tag" title="Number {{{{ num }}}} strength">{{{{ num }}}}</span>
-                                {{% endfor %}}
-                            </div>
-                            {{% if not grid_data.present_numbers %}}
-                                <p style="color: var(--text-muted); font-style: italic;">No specific strengths identified from birth date digits.</p>
-                            {{% endif %}}
-                        </div>
-                    </div>
-
-                    <div class="analysis-card">
-                        <h3><span class="icon">🎯</span> Growth Opportunities</h3>
-                        <div class="analysis-section">
-                            <p>These missing numbers represent areas for personal development:</p>
-                            <div class="number-list">
-                                {{% for num in grid_data.missing_numbers %}}
-                                    <span class="number-tag missing-tag" title="Number {{{{ num }}}} - area for growth">{{{{ num }}}}</span>
-                                {{% endfor %}}
-                            </div>
-                            {{% if not grid_data.missing_numbers %}}
-                                <p style="color: var(--accent-color); font-weight: bold;">Amazing! All numbers are present in your birth date.</p>
-                            {{% endif %}}
-                        </div>
-                    </div>
-                </div>
-
-                <div class="meanings-section">
-                    <h4>🔍 Number Meanings & Life Areas</h4>
-                    <div class="meaning-item">
-                        <div class="meaning-number">1</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Communication & Leadership</div>
-                            <div class="meaning-desc">Expression, speaking ability, leadership qualities, and social connections.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">2</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Knowledge & Intuition</div>
-                            <div class="meaning-desc">Learning capacity, wisdom, intuitive abilities, and emotional intelligence.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">3</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Patience & Hard Work</div>
-                            <div class="meaning-desc">Perseverance, dedication, ability to work through challenges systematically.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">4</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Planning & Organization</div>
-                            <div class="meaning-desc">Systematic thinking, organizational skills, and structured approach to life.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">5</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Mental Strength & Focus</div>
-                            <div class="meaning-desc">Mental resilience, concentration, ability to handle stress and pressure.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">6</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Health & Family Harmony</div>
-                            <div class="meaning-desc">Physical wellbeing, family relationships, nurturing, and caring nature.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">7</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Love & Relationships</div>
-                            <div class="meaning-desc">Emotional connections, romantic relationships, empathy, and compassion.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">8</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Money & Material Success</div>
-                            <div class="meaning-desc">Financial acumen, business sense, material achievements, and practical skills.</div>
-                        </div>
-                    </div>
-                    <div class="meaning-item">
-                        <div class="meaning-number">9</div>
-                        <div class="meaning-content">
-                            <div class="meaning-title">Fame & Recognition</div>
-                            <div class="meaning-desc">Public recognition, reputation, spiritual growth, and humanitarian nature.</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
+        {{% if grid_data %}}{LO_SHU_RESULT_TEMPLATE}
         {{% endif %}}
     </div>
     
@@ -1025,85 +1195,132 @@ LO_SHU_TEMPLATE = f"""
 </html>
 """
 
-def calculate_numerology(name, mapping):
-    """Calculate numerology value for a name using the given mapping"""
-    total = 0
-    for char in name:
-        if char.isalpha():
-            total += mapping[char.upper()]
-    return total
-
-def reduce_to_single_digit(number):
-    """Reduce number to single digit (1-9) except for master numbers 11, 22, 33"""
-    if number in [11, 22, 33]:
-        return number
-    while number >= 10:
-        number = sum(int(digit) for digit in str(number))
-        if number in [11, 22, 33]:
-            return number
-    return number
-
-def is_valid_date(day, month, year):
-    """Validate if the given date is valid"""
-    try:
-        datetime(year, month, day)
-        return True
-    except ValueError:
-        return False
-
-def generate_lo_shu_grid(day, month, year):
-    """Generate Lo Shu Grid from birth date"""
-    try:
-        # Validate the date first
-        if not is_valid_date(day, month, year):
-            raise ValueError("Invalid date")
-        
-        # Combine all digits from the birth date
-        date_string = f"{day:02d}{month:02d}{year}"
-        all_digits = [int(d) for d in date_string if d != '0']  # Remove zeros
-        
-        # Count occurrences of each number 1-9
-        number_counts = {}
-        for i in range(1, 10):
-            number_counts[i] = all_digits.count(i)
-        
-        # Create the grid (Lo Shu magic square positions)
-        # Traditional Lo Shu square:
-        # 4 9 2
-        # 3 5 7
-        # 8 1 6
-        lo_shu_positions = [4, 9, 2, 3, 5, 7, 8, 1, 6]
-        
-        # Fill grid based on number counts
-        grid = []
-        for pos in lo_shu_positions:
-            count = number_counts[pos]
-            if count > 0:
-                grid.append(str(pos) * count)  # Repeat number based on count
-            else:
-                grid.append('')  # Empty if not present
-        
-        # Analyze the grid
-        present_numbers = [i for i in range(1, 10) if number_counts[i] > 0]
-        missing_numbers = [i for i in range(1, 10) if number_counts[i] == 0]
-        
-        return {
-            'grid': grid,
-            'present_numbers': present_numbers,
-            'missing_numbers': missing_numbers,
-            'total_count': len(all_digits),
-            'date_string': f"{day}/{month}/{year}",
-            'number_counts': number_counts
-        }
-    except Exception as e:
-        app.logger.error(f"Error generating Lo Shu grid: {str(e)}")
-        raise
+# Compile the page templates once at import time. Flask's render_template_string
+# recompiles its source on every call; compiling here also means a preloading
+# server (see gunicorn.conf.py) builds them once in the master process.
+NAME_CALC_PAGE = app.jinja_env.from_string(NAME_CALC_TEMPLATE)
+LO_SHU_PAGE = app.jinja_env.from_string(LO_SHU_TEMPLATE)
+
+# Pre-rendered Lo Shu result pages, when a bundle built from these templates exists
+LO_SHU_BUNDLE = lo_shu_bundle.load(
+    os.environ.get("NUMEROLOGY_LO_SHU_BUNDLE", lo_shu_bundle.DEFAULT_PATH),
+    lo_shu_bundle.template_hash(LO_SHU_TEMPLATE, LO_SHU_RESULT_TEMPLATE)
+)
+
+def render_page(template, **context):
+    """Render a precompiled page template with Flask's template context"""
+    with span("render_template"):
+        app.update_template_context(context)
+        return template.render(context)
+
+# Cache shared by every lookup below (memory LRU, plus SQLite when configured)
+RESULT_CACHE = result_cache.from_env()
+
+# People directory searched by /api/people (see directory.py)
+DIRECTORY = directory.from_env()
+
+# Background jobs for very large batches (see jobs.py)
+JOBS = jobs.from_env()
+
+# Tenant letter tables, compiled once per worker (see custom_tables.py)
+TABLES = custom_tables.from_env()
+
+def name_cache_key(name):
+    """Cache key for a name: only letters count, and ASCII letters ignore case"""
+    letters = "".join(filter(str.isalpha, name))
+    return "name:" + (letters.upper() if letters.isascii() else letters)
+
+def lookup_name_numbers(name):
+    """Reduced Pythagorean and Chaldean numbers for a name, via the result cache"""
+    with span("normalize"):
+        key = name_cache_key(name)
+    with span("cache_lookup") as lookup:
+        result = RESULT_CACHE.get(key)
+        if lookup is not None:
+            lookup.attributes["cache.hit"] = result is not None
+    if result is None:
+        result = {}
+        for system, table in (("pythagorean", pythagorean), ("chaldean", chaldean)):
+            with span("calculate_numerology", system=system):
+                total = calculate_numerology(name, table)
+            with span("reduce_to_single_digit", system=system):
+                result[system] = reduce_to_single_digit(total)
+        RESULT_CACHE.set(key, result)
+    return result
+
+def lookup_lo_shu_grid(day, month, year):
+    """Lo Shu grid for a valid date, via the result cache"""
+    key = f"lo-shu:{day}-{month}-{year}"
+    with span("cache_lookup") as lookup:
+        grid_data = RESULT_CACHE.get(key)
+        if lookup is not None:
+            lookup.attributes["cache.hit"] = grid_data is not None
+    if grid_data is None:
+        with span("generate_lo_shu_grid"):
+            grid_data = generate_lo_shu_grid(day, month, year)
+        RESULT_CACHE.set(key, grid_data)
+    return grid_data
+
+def score_name(name):
+    """Return the reduced Pythagorean and Chaldean numbers for a name"""
+    return {"name": name, **lookup_name_numbers(name)}
+
+def score_names(names, fields=None):
+    """Score a batch of names, returning one result dict per name.
+
+    With fields, only those fields are computed (and the cache is skipped:
+    computing one number is cheaper than a cache lookup).
+    """
+    # One span per batch: a span per name would cost more than scoring it
+    with span("score_names", names=len(names)):
+        if fields:
+            return [NameResult(name).to_dict(fields) for name in names]
+        keys = [name_cache_key(name) for name in names]
+        cached = RESULT_CACHE.get_many(set(keys))
+        computed = {}
+        results = []
+        for name, key in zip(names, keys):
+            numbers = cached.get(key) or computed.get(key)
+            if numbers is None:
+                numbers = computed[key] = {
+                    "pythagorean": reduce_to_single_digit(calculate_numerology(name, pythagorean)),
+                    "chaldean": reduce_to_single_digit(calculate_numerology(name, chaldean))
+                }
+            results.append({"name": name, **numbers})
+        if computed:
+            RESULT_CACHE.set_many(computed)
+        return results
+
+def name_columns(results, fields=None):
+    """Batch results as numeric columns for the binary format (rows follow the input)"""
+    columns = {}
+    for field in fields or ("pythagorean", "chaldean"):
+        if field != "name":
+            dtype = np.uint32 if field.endswith("_total") else np.uint8
+            columns[field] = np.fromiter((r[field] for r in results), dtype=dtype, count=len(results))
+    return columns
+
+def columns_response(columns, **meta):
+    """Binary columnar response (see columnar.py)"""
+    response = Response(columnar.encode(columns, **meta), mimetype=columnar.MIMETYPE)
+    response.vary.add("Accept")
+    return response
 
 @app.route("/")
 def home():
     """Home page route"""
     return HOME_TEMPLATE
 
+@app.route("/numerology-engine.<version>.js")
+def engine_script(version):
+    """Client-side engine; immutable under its current content hash"""
+    response = Response(ENGINE_SOURCE, mimetype="text/javascript")
+    if version == ENGINE_VERSION:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route("/name-calculator", methods=["GET", "POST"])
 def name_calculator():
     """Name calculator route"""
@@ -1112,25 +1329,17 @@ def name_calculator():
     
     try:
         if request.method == "POST":
-            name = request.form.get("name", "").strip()
+            with span("parse_form"):
+                name = request.form.get("name", "").strip()
             if name:
                 input_name = name
-                pythagorean_result = calculate_numerology(name, pythagorean)
-                chaldean_result = calculate_numerology(name, chaldean)
-                
-                # Reduce to single digits (with master number exceptions)
-                pythagorean_reduced = reduce_to_single_digit(pythagorean_result)
-                chaldean_reduced = reduce_to_single_digit(chaldean_result)
-                
-                result = {
-                    "pythagorean": pythagorean_reduced,
-                    "chaldean": chaldean_reduced
-                }
+                # Reduced to single digits (with master number exceptions)
+                result = lookup_name_numbers(name)
     except Exception as e:
         app.logger.error(f"Error in name calculator: {str(e)}")
         # Continue with empty result to show form
     
-    return render_template_string(NAME_CALC_TEMPLATE, result=result, input_name=input_name)
+    return render_page(NAME_CALC_PAGE, result=result, input_name=input_name)
 
 @app.route("/lo-shu-grid", methods=["GET", "POST"])
 def lo_shu_grid():
@@ -1142,9 +1351,10 @@ def lo_shu_grid():
     try:
         if request.method == "POST":
             try:
-                day = int(request.form.get("day", ""))
-                month = int(request.form.get("month", ""))
-                year = int(request.form.get("year", ""))
+                with span("parse_form"):
+                    day = int(request.form.get("day", ""))
+                    month = int(request.form.get("month", ""))
+                    year = int(request.form.get("year", ""))
                 
                 # Validate date ranges
                 if not (1 <= day <= 31 and 1 <= month <= 12 and 1900 <= year <= 2100):
@@ -1152,7 +1362,12 @@ def lo_shu_grid():
                 elif not is_valid_date(day, month, year):
                     error_message = "Please enter a valid date (e.g., February 29th only exists in leap years)"
                 else:
-                    grid_data = generate_lo_shu_grid(day, month, year)
+                    if LO_SHU_BUNDLE is not None:
+                        with span("bundle_lookup"):
+                            page = LO_SHU_BUNDLE.page(day, month, year)
+                        if page is not None:
+                            return page
+                    grid_data = lookup_lo_shu_grid(day, month, year)
                     
             except (ValueError, TypeError) as e:
                 app.logger.error(f"Invalid input in Lo Shu grid: {str(e)}")
@@ -1166,8 +1381,8 @@ def lo_shu_grid():
         app.logger.error(f"Unexpected error in Lo Shu grid: {str(e)}")
         error_message = "An unexpected error occurred. Please try again."
     
-    return render_template_string(
-        LO_SHU_TEMPLATE, 
+    return render_page(
+        LO_SHU_PAGE, 
         grid_data=grid_data, 
         day=day, 
         month=month, 
@@ -1175,6 +1390,399 @@ def lo_shu_grid():
         error_message=error_message
     )
 
+@app.route("/api/name-numbers", methods=["POST"])
+def api_name_numbers():
+    """JSON API: score one name ({"name": ...}) or a batch ({"names": [...]}).
+
+    ?fields=chaldean (or "fields" in the body) limits what is computed and
+    returned; see NameResult.FIELDS. "tenant" and "table" select a custom
+    letter table instead (see custom_name_numbers).
+    """
+    with span("parse_json"):
+        payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object with 'name' or 'names'"), 400
+    if request.args.get("table", payload.get("table")) is not None:
+        return custom_name_numbers(payload)
+    try:
+        fields = parse_fields(request.args.get("fields", payload.get("fields")), NameResult.FIELDS)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    try:
+        if "names" in payload:
+            names = payload["names"]
+            if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+                return jsonify(error="'names' must be a list of strings"), 400
+            if columnar.wants_columns(request.accept_mimetypes):
+                return columns_response(name_columns(score_names(names, fields), fields))
+            return jsonify(results=score_names(names, fields))
+        name = payload.get("name")
+        if not isinstance(name, str) or not name.strip():
+            return jsonify(error="'name' must be a non-empty string"), 400
+        if fields:
+            return jsonify(NameResult(name.strip()).to_dict(fields))
+        return jsonify(score_name(name.strip()))
+    except KeyError as e:
+        app.logger.error(f"Unsupported character in name API: {str(e)}")
+        return jsonify(error="Name contains unsupported characters"), 400
+
+def custom_name_numbers(payload):
+    """/api/name-numbers scored with a tenant's table.
+
+    "tenant", "table" and optionally "table_version" (query string or body)
+    pick the table; results carry "number" (reduced) and "total", and
+    "fields" may limit them to custom_tables.FIELDS.
+    """
+    if TABLES is None:
+        return jsonify(error="Custom tables are not available"), 503
+    option = lambda key: request.args.get(key, payload.get(key))
+    version = option("table_version")
+    try:
+        version = int(version) if version is not None else None
+    except (ValueError, TypeError, OverflowError):
+        return jsonify(error="'table_version' must be an integer"), 400
+    try:
+        fields = parse_fields(option("fields"), custom_tables.FIELDS)
+        table = TABLES.resolve(option("tenant"), option("table"), version)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except custom_tables.TableNotFound as e:
+        return jsonify(error=str(e)), 404
+    try:
+        if "names" in payload:
+            names = payload["names"]
+            if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+                return jsonify(error="'names' must be a list of strings"), 400
+            with span("score_names", names=len(names), table=table.table_id):
+                results = [table.score(name, fields) for name in names]
+            return jsonify(table=table.describe(), results=results)
+        name = payload.get("name")
+        if not isinstance(name, str) or not name.strip():
+            return jsonify(error="'name' must be a non-empty string"), 400
+        with span("calculate_numerology", system="custom", table=table.table_id):
+            result = table.score(name.strip(), fields)
+        return jsonify(table=table.describe(), **result)
+    except KeyError as e:
+        app.logger.error(f"Unsupported character in name API: {str(e)}")
+        return jsonify(error="Name contains unsupported characters"), 400
+
+@app.route("/api/lo-shu", methods=["POST"])
+def api_lo_shu():
+    """JSON API: Lo Shu grid for {"day": .., "month": .., "year": ..}
+
+    ?fields=missing_numbers (or "fields" in the body) limits what is
+    computed and returned; see LoShuResult.FIELDS.
+    """
+    with span("parse_json"):
+        payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object with 'day', 'month' and 'year'"), 400
+    try:
+        fields = parse_fields(request.args.get("fields", payload.get("fields")), LoShuResult.FIELDS)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    try:
+        day = int(payload.get("day"))
+        month = int(payload.get("month"))
+        year = int(payload.get("year"))
+    except (ValueError, TypeError, OverflowError):
+        return jsonify(error="Please enter valid numbers for day, month, and year"), 400
+    try:
+        # Validates the date once for both paths; nothing is computed until asked for
+        result = LoShuResult(day, month, year)
+    except ValueError:
+        return jsonify(error="Invalid date"), 400
+    if fields:
+        return jsonify(result.to_dict(fields))
+    return jsonify(lookup_lo_shu_grid(day, month, year))
+
+@app.route("/api/lo-shu/bulk", methods=["POST"])
+def api_lo_shu_bulk():
+    """Lo Shu grids for many dates: JSON ({"dates": [[d, m, y], ...]}) or CSV (day,month,year)
+
+    Results line up with the input rows (null for invalid rows, which are
+    listed in "errors"). Clients accepting columnar.MIMETYPE get status and
+    digit count columns instead.
+    """
+    try:
+        if request.mimetype in ("text/csv", "text/plain"):
+            rows = lo_shu_bulk.rows_from_csv(request.get_data(as_text=True))
+            fields = request.args.get("fields")
+        else:
+            payload = request.get_json(silent=True)
+            rows = lo_shu_bulk.rows_from_json(payload)
+            fields = request.args.get("fields", payload.get("fields"))
+        fields = parse_fields(fields, LoShuResult.FIELDS)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if len(rows) > lo_shu_bulk.MAX_ROWS:
+        return jsonify(error=f"At most {lo_shu_bulk.MAX_ROWS} dates per request"), 400
+    if columnar.wants_columns(request.accept_mimetypes):
+        return columns_response(lo_shu_bulk.lo_shu_columns(rows), positions=list(LO_SHU_POSITIONS))
+    return Response(lo_shu_bulk.lo_shu_json(rows, fields), mimetype="application/json")
+
+@app.route("/api/brand-names", methods=["POST"])
+def api_brand_names():
+    """Generate names from word lists that hit Pythagorean/Chaldean targets.
+
+    Body: {"words": [...], "prefixes": [...], "suffixes": [...],
+    "words_per_name": 1, "pythagorean": 8, "chaldean": 5, "limit": 20}.
+    Candidates stream back as JSON lines, shortest first. If the search
+    gives up before finding 'limit' names, a final {"truncated": true} line
+    says that more may exist.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object with 'words'"), 400
+    lists = {}
+    for key, limit in (("words", 100000), ("prefixes", 1000), ("suffixes", 1000)):
+        values = payload.get(key, [])
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values) or len(values) > limit:
+            return jsonify(error=f"'{key}' must be a list of at most {limit} strings"), 400
+        lists[key] = values
+    try:
+        words_per_name = int(payload.get("words_per_name", 1))
+        limit = int(payload.get("limit", 20))
+        targets = [None if payload.get(s) is None else int(payload[s]) for s in ("pythagorean", "chaldean")]
+        if not 1 <= words_per_name <= 3:
+            raise ValueError("'words_per_name' must be 1, 2 or 3")
+        if not 1 <= limit <= 1000:
+            raise ValueError("'limit' must be between 1 and 1000")
+        candidates = brand_names.generate(lists["words"], lists["prefixes"], lists["suffixes"],
+                                          words_per_name, *targets)
+        first = next(candidates, None)
+    except (ValueError, TypeError) as e:
+        return jsonify(error=str(e)), 400
+
+    def lines():
+        if first is not None:
+            for candidate in itertools.islice(itertools.chain([first], candidates), limit):
+                yield json.dumps(candidate) + "\n"
+        if candidates.truncated:
+            yield json.dumps({"truncated": True}) + "\n"
+
+    return Response(lines(), mimetype="application/x-ndjson")
+
+def name_filter_from_args(args):
+    """NameFilter from query parameters (prefix, first_letter, min_length, max_length)"""
+    return name_stats.NameFilter(
+        prefix=args.get("prefix") or None,
+        first_letter=args.get("first_letter") or None,
+        min_length=args.get("min_length", type=int),
+        max_length=args.get("max_length", type=int)
+    )
+
+@app.route("/api/name-stats", methods=["POST"])
+def api_name_stats():
+    """Distribution of name numbers over a corpus.
+
+    The body is either JSON ({"names": [...]}) or plain text with one name
+    per line; plain text is read as a stream, so the corpus is never held
+    in memory. Filters come from the query string.
+    """
+    name_filter = name_filter_from_args(request.args) or None
+    if request.mimetype == "application/json":
+        payload = request.get_json(silent=True)
+        names = payload.get("names") if isinstance(payload, dict) else None
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            return jsonify(error="Expected a JSON object with 'names', or one name per line as text/plain"), 400
+    else:
+        names = (line.strip() for line in io.TextIOWrapper(request.stream, encoding="utf-8", errors="replace"))
+        names = (name for name in names if name)
+    result = name_stats.distribution(names, name_filter).to_dict()
+    result["filter"] = name_filter.to_dict() if name_filter else None
+    return jsonify(result)
+
+def parse_numbers(value):
+    """Comma-separated numbers from a query parameter"""
+    return [int(n) for n in value.split(",") if n.strip()] if value else []
+
+def parse_digits(value):
+    """Comma-separated Lo Shu digits from a query parameter"""
+    digits = parse_numbers(value)
+    if not all(1 <= d <= 9 for d in digits):
+        raise ValueError("Lo Shu digits must be between 1 and 9")
+    return digits
+
+@app.route("/api/people", methods=["POST"])
+def api_add_people():
+    """Add one person ({"name", "day", "month", "year"}) or a batch ({"people": [...]}).
+
+    Additions go through the shared people log, so every worker finds them
+    (see directory.py).
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object with a person or 'people'"), 400
+    people = payload["people"] if "people" in payload else [payload]
+    if not isinstance(people, list) or not all(isinstance(p, dict) for p in people):
+        return jsonify(error="'people' must be a list of objects"), 400
+    try:
+        records = [(p["name"], int(p["day"]), int(p["month"]), int(p["year"])) for p in people]
+        if not all(isinstance(name, str) and name.strip() for name, *_ in records):
+            return jsonify(error="Every person needs a non-empty 'name'"), 400
+        ids = DIRECTORY.add_many(records)
+    except (KeyError, ValueError, TypeError, OverflowError) as e:
+        app.logger.error(f"Invalid person in directory API: {str(e)}")
+        return jsonify(error="Every person needs a supported name and a valid day, month and year"), 400
+    return jsonify(ids=ids), 201
+
+@app.route("/api/people/search", methods=["GET"])
+def api_search_people():
+    """Search by profile, e.g. ?life_path=7&chaldean=5&missing=4,8&limit=50"""
+    try:
+        criteria = {
+            attribute: parse_numbers(request.args[attribute]) or None
+            for attribute in directory.ATTRIBUTES if attribute in request.args
+        }
+        criteria["present"] = parse_digits(request.args.get("present"))
+        criteria["missing"] = parse_digits(request.args.get("missing"))
+        limit = max(min(request.args.get("limit", 100, type=int), 1000), 0)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    count, ids = DIRECTORY.search(limit=limit, offset=offset, **criteria)
+    people = [DIRECTORY.get(person_id) for person_id in ids]
+    return jsonify(count=count, people=[p for p in people if p is not None])
+
+@app.route("/api/people/<int:person_id>", methods=["GET", "DELETE"])
+def api_person(person_id):
+    """Fetch or remove one person (removals reach every worker through the people log)"""
+    if request.method == "DELETE":
+        if not DIRECTORY.remove(person_id):
+            return jsonify(error="No such person"), 404
+        return "", 204
+    person = DIRECTORY.get(person_id)
+    if person is None:
+        return jsonify(error="No such person"), 404
+    return jsonify(person)
+
+def job_rows():
+    """(kind, rows, fields) for a job submission.
+
+    JSON bodies carry {"names": [...]} or {"dates": [...]}; text/plain is one
+    name per line and text/csv is day,month,year rows. Text bodies are read
+    as a stream and spooled straight to disk.
+    """
+    if request.mimetype == "application/json":
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object with 'names' or 'dates'")
+        fields = request.args.get("fields", payload.get("fields"))
+        if "names" in payload:
+            names = payload["names"]
+            if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+                raise ValueError("'names' must be a list of strings")
+            kind, rows = "names", (name.strip() for name in names)
+        else:
+            kind, rows = "lo-shu", lo_shu_bulk.rows_from_json(payload)
+    else:
+        fields = request.args.get("fields")
+        lines = io.TextIOWrapper(request.stream, encoding="utf-8", errors="replace")
+        if request.mimetype == "text/csv":
+            kind, rows = "lo-shu", lo_shu_bulk.iter_csv_rows(lines)
+        else:
+            kind, rows = "names", (line.strip() for line in lines)
+    allowed = NameResult.FIELDS if kind == "names" else LoShuResult.FIELDS
+    fields = parse_fields(fields, allowed)
+    if kind == "names":
+        rows = (name for name in rows if name)
+    return kind, rows, fields
+
+@app.route("/api/jobs", methods=["POST"])
+def api_submit_job():
+    """Queue a large batch; poll /api/jobs/<id> and fetch /api/jobs/<id>/results"""
+    if JOBS is None:
+        return jsonify(error="Background jobs are not available"), 503
+    try:
+        kind, rows, fields = job_rows()
+        job = JOBS.submit(kind, rows, fields)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    job["results"] = f"/api/jobs/{job['id']}/results"
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return response
+
+@app.route("/api/jobs/<job_id>", methods=["GET", "DELETE"])
+def api_job(job_id):
+    """Job status and progress, or cancel and remove a job"""
+    if JOBS is None:
+        return jsonify(error="Background jobs are not available"), 503
+    if request.method == "DELETE":
+        if not JOBS.store.delete(job_id):
+            return jsonify(error="No such job"), 404
+        return "", 204
+    job = JOBS.store.status(job_id)
+    if job is None:
+        return jsonify(error="No such job"), 404
+    if job["status"] in ("queued", "running"):
+        # Make sure a dispatcher is alive in this process (e.g. after a restart)
+        JOBS.runner.start()
+    job["results"] = f"/api/jobs/{job_id}/results"
+    return jsonify(job)
+
+@app.route("/api/jobs/<job_id>/results", methods=["GET"])
+def api_job_results(job_id):
+    """NDJSON results, one line per input row; supports Range requests"""
+    if JOBS is None:
+        return jsonify(error="Background jobs are not available"), 503
+    job = JOBS.store.status(job_id)
+    if job is None:
+        return jsonify(error="No such job"), 404
+    if job["status"] != "done":
+        return jsonify(error=f"Job is {job['status']}", status=job["status"], done=job["done"],
+                       total=job["total"]), 409
+    return send_file(JOBS.store.results_path(job_id), mimetype="application/x-ndjson", conditional=True,
+                     download_name=f"{job_id}.ndjson")
+
+@app.route("/api/tenants/<tenant>/tables", methods=["GET", "POST"])
+def api_tenant_tables(tenant):
+    """List a tenant's tables, or register a new version of one"""
+    if TABLES is None:
+        return jsonify(error="Custom tables are not available"), 503
+    if request.method == "GET":
+        return jsonify(tenant=tenant, tables=TABLES.list(tenant))
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Expected a JSON object with 'id' and 'mapping'"), 400
+    try:
+        record, created = TABLES.register(tenant, payload.get("id"), payload.get("mapping"),
+                                          payload.get("description"))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    response = jsonify(record)
+    response.status_code = 201 if created else 200
+    response.headers["Location"] = f"/api/tenants/{tenant}/tables/{record['id']}?version={record['version']}"
+    return response
+
+@app.route("/api/tenants/<tenant>/tables/<table_id>", methods=["GET", "DELETE"])
+def api_tenant_table(tenant, table_id):
+    """One table version with its mapping (?version=, default latest), or delete every version"""
+    if TABLES is None:
+        return jsonify(error="Custom tables are not available"), 503
+    if request.method == "DELETE":
+        if not TABLES.delete(tenant, table_id):
+            return jsonify(error="No such table"), 404
+        return "", 204
+    record = TABLES.get(tenant, table_id, request.args.get("version", type=int))
+    if record is None:
+        return jsonify(error="No such table"), 404
+    return jsonify(record)
+
+# Request tracing and the slow-request log (see tracing.py)
+TRACER = tracing.from_env()
+if TRACER is not None:
+    tracing.install(app, TRACER)
+
+# Memory diagnostics (NUMEROLOGY_MEMORY_DIAGNOSTICS=1, see memory_diagnostics.py)
+if memory_diagnostics.enabled():
+    memory_diagnostics.install(app, {
+        name: value for name, value in globals().items()
+        if name.isupper() and isinstance(value, (str, bytes, dict, list, tuple))
+    })
+
 @app.errorhandler(500)
 def internal_error(error):
     """Handle internal server errors"""
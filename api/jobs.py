@@ -0,0 +1,430 @@
+"""Background jobs for very large batch scoring.
+
+Uploads too large to answer inside one request are submitted as jobs:
+
+    POST /api/jobs               -> 202 {"id": ..., "status": "queued", ...}
+    GET  /api/jobs/<id>          -> status and progress
+    GET  /api/jobs/<id>/results  -> NDJSON, one line per input row (Range supported)
+    DELETE /api/jobs/<id>
+
+Everything lives in one directory (NUMEROLOGY_JOBS_DIR): a SQLite database
+of jobs in WAL mode, plus per job the spooled input (JSON lines) and the
+results file. No broker is needed, and every web worker process on the node
+shares the same queue.
+
+Each process runs a dispatcher thread that claims one job at a time and
+scores it in chunks on a local process pool, bounded to a few chunks in
+flight. Chunks are appended to the results file in input order. After each
+one the file is fsynced and the job's row count and committed byte offset
+are recorded in the same update that renews the job's lease. If a worker
+dies, its lease runs out and any dispatcher reclaims the job. That
+dispatcher truncates the results file back to the last committed offset and
+continues from the next row, so a restart loses at most the chunks that
+were in flight.
+"""
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lo_shu_bulk import lo_shu_grids
+from numerology import NameResult
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("names", "lo-shu")
+CHUNK_SIZE = 5000
+MAX_ROWS = 10000000
+LEASE_SECONDS = 30.0
+POLL_INTERVAL = 1.0
+RETENTION_SECONDS = 24 * 3600
+# A job whose chunks keep killing pool processes (e.g. OOM) fails after this many pools
+MAX_POOL_CRASHES = 3
+UNSUPPORTED_NAME = "Name contains unsupported characters"
+
+
+def score_chunk(kind, rows, fields=None):
+    """NDJSON lines (bytes) for one chunk of input rows"""
+    lines = []
+    if kind == "names":
+        for name in rows:
+            try:
+                line = NameResult(name).to_dict(fields)
+            except KeyError:
+                line = {"name": name, "error": UNSUPPORTED_NAME}
+            lines.append(json.dumps(line))
+    else:
+        results, errors = lo_shu_grids([tuple(row) if isinstance(row, list) else row for row in rows])
+        errors = {error["row"]: error["error"] for error in errors}
+        for i, result in enumerate(results):
+            if result is None:
+                line = {"error": errors[i]}
+            elif fields:
+                line = {field: result[field] for field in fields}
+            else:
+                line = result
+            lines.append(json.dumps(line, sort_keys=True))
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+
+class JobStore:
+    """Jobs table and spool files in one directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "jobs.db")
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._conn().executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " fields TEXT,"
+            " total INTEGER NOT NULL,"
+            " done INTEGER NOT NULL DEFAULT 0,"
+            " result_bytes INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " owner TEXT,"
+            " lease_until REAL,"
+            " created REAL NOT NULL,"
+            " updated REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);"
+        )
+
+    def _conn(self):
+        # Connections must not cross a fork; reopen in each worker process
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._local = threading.local()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def input_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.input")
+
+    def results_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.ndjson")
+
+    # -- submitting --------------------------------------------------------
+
+    def create(self, kind, rows, fields=None):
+        """Spool rows (strings for names, [day, month, year] for lo-shu) and queue a job"""
+        if kind not in KINDS:
+            raise ValueError(f"Job kind must be one of {', '.join(KINDS)}")
+        job_id = uuid.uuid4().hex
+        total = 0
+        fd, spool = tempfile.mkstemp(dir=self.directory, suffix=".upload")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for row in rows:
+                    total += 1
+                    if total > MAX_ROWS:
+                        raise ValueError(f"Jobs are limited to {MAX_ROWS} rows")
+                    f.write(json.dumps(row))
+                    f.write("\n")
+            if not total:
+                raise ValueError("No rows to score")
+            os.replace(spool, self.input_path(job_id))
+        except BaseException:
+            if os.path.exists(spool):
+                os.unlink(spool)
+            raise
+        open(self.results_path(job_id), "wb").close()
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, fields, total, created, updated) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(list(fields)) if fields else None, total, now, now))
+        return self.get(job_id)
+
+    # -- reading -----------------------------------------------------------
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def status(self, job_id):
+        """Public view of a job, or None"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return {
+            "id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "total": job["total"],
+            "done": job["done"],
+            "progress": job["done"] / job["total"] if job["total"] else 1.0,
+            "result_bytes": job["result_bytes"],
+            "error": job["error"],
+            "created": job["created"],
+            "updated": job["updated"],
+        }
+
+    def read_input(self, job_id, start=0):
+        """Input rows from row number start on"""
+        with open(self.input_path(job_id), encoding="utf-8") as f:
+            for line in itertools.islice(f, start, None):
+                yield json.loads(line)
+
+    # -- running -----------------------------------------------------------
+
+    def claim(self, owner):
+        """Take the oldest queued job, or a running one whose lease has expired"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY created LIMIT 1", (now,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, updated = ? WHERE id = ?",
+                         (owner, now + LEASE_SECONDS, now, row["id"]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def commit_progress(self, job_id, owner, done, result_bytes):
+        """Record committed output and renew the lease; False if the job was lost or deleted"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET done = ?, result_bytes = ?, lease_until = ?, updated = ?"
+            " WHERE id = ? AND owner = ? AND status = 'running'",
+            (done, result_bytes, now + LEASE_SECONDS, now, job_id, owner))
+        return cursor.rowcount == 1
+
+    def finish(self, job_id, owner, error=None):
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated = ?"
+            " WHERE id = ? AND owner = ? AND status = 'running'",
+            ("failed" if error else "done", error, time.time(), job_id, owner))
+
+    def release(self, job_id, owner):
+        """Put a running job back in the queue; it resumes from its last committed row"""
+        self._conn().execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated = ?"
+            " WHERE id = ? AND owner = ? AND status = 'running'",
+            (time.time(), job_id, owner))
+
+    def delete(self, job_id):
+        """Remove a job and its files; a dispatcher running it stops at its next chunk"""
+        cursor = self._conn().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        for path in (self.input_path(job_id), self.results_path(job_id)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        return cursor.rowcount == 1
+
+    def purge(self, older_than):
+        """Delete finished jobs last updated before a timestamp"""
+        rows = self._conn().execute(
+            "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (older_than,)).fetchall()
+        for row in rows:
+            self.delete(row["id"])
+        return len(rows)
+
+    def has_unfinished(self):
+        return self._conn().execute(
+            "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1").fetchone() is not None
+
+
+class JobRunner:
+    """Dispatcher thread plus a process pool that score claimed jobs"""
+
+    def __init__(self, store, workers=None, chunk_size=CHUNK_SIZE, retention=RETENTION_SECONDS):
+        self.store = store
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.retention = retention
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # job id -> pools lost while running it, in this process
+        self._pool_crashes = {}
+
+    def start(self):
+        """Start the dispatcher in this process (idempotent, fork-aware)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._pool = None
+            self._stop.clear()
+            self.owner = f"{socket.gethostname()}:{self._pid}:{uuid.uuid4().hex[:8]}"
+            self._thread = threading.Thread(target=self._loop, name="jobs", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def notify(self):
+        """Wake the dispatcher, e.g. after a submit"""
+        self._wake.set()
+
+    def _loop(self):
+        last_purge = 0.0
+        while not self._stop.is_set():
+            try:
+                job = self.store.claim(self.owner)
+                if job is not None:
+                    self.run(job)
+                    continue
+                if time.time() - last_purge > 60:
+                    last_purge = time.time()
+                    self.store.purge(time.time() - self.retention)
+            except Exception as e:
+                logger.error(f"Job dispatcher error: {str(e)}")
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def _discard_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Forking a process that already runs threads can deadlock children
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def run(self, job):
+        """Score a claimed job from its last committed row to the end"""
+        job_id = job["id"]
+        fields = tuple(json.loads(job["fields"])) if job["fields"] else None
+        done = job["done"]
+        if done:
+            logger.info(f"Resuming job {job_id} at row {done} of {job['total']}")
+        try:
+            rows = self.store.read_input(job_id, done)
+            chunks = iter(lambda: list(itertools.islice(rows, self.chunk_size)), [])
+            with open(self.store.results_path(job_id), "r+b") as out:
+                # Drop anything written after the last commit
+                out.truncate(job["result_bytes"])
+                out.seek(job["result_bytes"])
+                for chunk_rows, data in self._scored(job["kind"], chunks, fields):
+                    out.write(data)
+                    out.flush()
+                    os.fsync(out.fileno())
+                    done += chunk_rows
+                    if not self.store.commit_progress(job_id, self.owner, done, out.tell()):
+                        logger.info(f"Job {job_id} was deleted or reclaimed; stopping")
+                        return
+        except FileNotFoundError:
+            # Deleted while running
+            return
+        except BrokenProcessPool as e:
+            # A pool process died (e.g. OOM killed); the pool is unusable, the job is not
+            self._discard_pool()
+            crashes = self._pool_crashes[job_id] = self._pool_crashes.get(job_id, 0) + 1
+            if crashes < MAX_POOL_CRASHES:
+                logger.warning(f"Job {job_id} lost its process pool ({str(e)}); requeued at row {done}")
+                self.store.release(job_id, self.owner)
+                return
+            logger.error(f"Job {job_id} failed: process pool died {crashes} times")
+            del self._pool_crashes[job_id]
+            self.store.finish(job_id, self.owner, error=f"Scoring processes died {crashes} times: {str(e)}")
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self.store.finish(job_id, self.owner, error=str(e))
+            return
+        self._pool_crashes.pop(job_id, None)
+        self.store.finish(job_id, self.owner)
+
+    def _scored(self, kind, chunks, fields):
+        """(row count, NDJSON bytes) per chunk, in input order"""
+        if self.workers <= 0:
+            for rows in chunks:
+                yield len(rows), score_chunk(kind, rows, fields)
+            return
+        pool = self._get_pool()
+        in_flight = deque()
+        for rows in chunks:
+            in_flight.append((len(rows), pool.submit(score_chunk, kind, rows, fields)))
+            if len(in_flight) >= 2 * self.workers:
+                count, future = in_flight.popleft()
+                yield count, future.result()
+        while in_flight:
+            count, future = in_flight.popleft()
+            yield count, future.result()
+
+
+class Jobs:
+    """Store and runner for the app"""
+
+    def __init__(self, directory, workers=None):
+        self.store = JobStore(directory)
+        self.runner = JobRunner(self.store, workers)
+
+    def submit(self, kind, rows, fields=None):
+        job = self.store.create(kind, rows, fields)
+        self.runner.start()
+        self.runner.notify()
+        return self.store.status(job["id"])
+
+    def resume(self):
+        """Start the dispatcher if unfinished jobs are waiting.
+
+        Call this from serving processes only (a gunicorn worker, the ASGI
+        lifespan): importing the app must not start threads, since the
+        gunicorn master forks after import and spawned pool children
+        import the app too.
+        """
+        try:
+            if not self.store.has_unfinished():
+                return False
+        except sqlite3.Error as e:
+            logger.error(f"Could not check for unfinished jobs: {str(e)}")
+            return False
+        self.runner.start()
+        return True
+
+
+def from_env():
+    """Jobs in NUMEROLOGY_JOBS_DIR (default: a directory under the temp dir).
+
+    NUMEROLOGY_JOBS_WORKERS sets the process pool size (0 scores in the
+    dispatcher thread). No dispatcher is started here; see Jobs.resume().
+    """
+    directory = os.environ.get("NUMEROLOGY_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "numerology-jobs")
+    workers = os.environ.get("NUMEROLOGY_JOBS_WORKERS")
+    try:
+        jobs = Jobs(directory, int(workers) if workers else None)
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Could not open job store {directory}: {str(e)}")
+        return None
+    return jobs
@@ -0,0 +1,138 @@
+"""Client-side numerology engine, generated from the Python tables.
+
+The browser gets the same compiled letter tables the server uses
+(numerology.letter_table for every code point below TABLE_SIZE, which
+already includes accent folding and the other scripts), plus the master
+numbers for reduction. Tables are run-length encoded: runs of zeros
+(non-letters) become one negative number, and letters no table covers are
+null.
+
+The module defines window.NumerologyEngine with:
+
+    score(name)     -> {pythagorean, chaldean}, null if a letter is
+                       unsupported, or undefined if the name has characters
+                       beyond the tables (ask the server)
+    calculate(name, system), reduce(number)
+
+Because it is generated from the Python tables, it cannot drift from them;
+tools/engine_check.py runs it under node against the Python engine.
+
+    python api/js_engine.py --output numerology-engine.js
+"""
+import argparse
+import hashlib
+import json
+import sys
+
+from numerology import MASTER_NUMBERS, TABLE_SIZE, chaldean, letter_table, pythagorean
+
+SYSTEMS = {"pythagorean": pythagorean, "chaldean": chaldean}
+
+ENGINE_TEMPLATE = """(function (root) {
+  'use strict';
+  var SIZE = %(size)d;
+  var MASTER = %(master)s;
+  var ENCODED = %(tables)s;
+
+  function expand(encoded) {
+    var table = [];
+    for (var i = 0; i < encoded.length; i++) {
+      var v = encoded[i];
+      if (v !== null && v < 0) { for (var n = 0; n < -v; n++) table.push(0); }
+      else table.push(v);
+    }
+    return table;
+  }
+
+  var TABLES = {};
+  for (var system in ENCODED) TABLES[system] = expand(ENCODED[system]);
+
+  // Letter total for a name: null if a letter is unsupported, undefined if
+  // a character is outside the tables
+  function calculate(name, system) {
+    var table = TABLES[system];
+    var total = 0;
+    for (var ch of name) {
+      var code = ch.codePointAt(0);
+      if (code >= SIZE) return undefined;
+      var value = table[code];
+      if (value === null) return null;
+      total += value;
+    }
+    return total;
+  }
+
+  // Digit-sum reduction, stopping at master numbers
+  function reduce(number) {
+    if (MASTER.indexOf(number) >= 0) return number;
+    while (number >= 10) {
+      var sum = 0;
+      for (var digit of String(number)) sum += +digit;
+      number = sum;
+      if (MASTER.indexOf(number) >= 0) return number;
+    }
+    return number;
+  }
+
+  function score(name) {
+    var result = {};
+    for (var system in TABLES) {
+      var total = calculate(name, system);
+      if (total === undefined || total === null) return total;
+      result[system] = reduce(total);
+    }
+    return result;
+  }
+
+  var engine = {calculate: calculate, reduce: reduce, score: score, systems: Object.keys(TABLES)};
+  if (typeof module === 'object' && module.exports) module.exports = engine;
+  else root.NumerologyEngine = engine;
+})(this);
+"""
+
+
+def encode_table(table):
+    """Run-length encode zeros: [0, 0, 0, 5, None] -> [-3, 5, None]"""
+    encoded = []
+    for value in table:
+        if value == 0:
+            if encoded and encoded[-1] is not None and encoded[-1] < 0:
+                encoded[-1] -= 1
+            else:
+                encoded.append(-1)
+        else:
+            encoded.append(value)
+    return encoded
+
+
+def build_source():
+    """JavaScript source of the engine"""
+    tables = {name: encode_table(letter_table(mapping)) for name, mapping in SYSTEMS.items()}
+    return ENGINE_TEMPLATE % {
+        "size": TABLE_SIZE,
+        "master": json.dumps(list(MASTER_NUMBERS)),
+        "tables": json.dumps(tables, separators=(",", ":")),
+    }
+
+
+def source_hash(source):
+    """Short content hash, for cache-busting script URLs"""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the client-side numerology engine")
+    parser.add_argument("--output", default="-", help="File to write (default: stdout)")
+    args = parser.parse_args(argv)
+    source = build_source()
+    if args.output == "-":
+        sys.stdout.write(source)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(source)
+        print(f"Wrote {len(source.encode('utf-8'))} bytes to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
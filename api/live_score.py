@@ -0,0 +1,95 @@
+"""Incremental name scoring for as-you-type updates.
+
+A LiveScore keeps the running Pythagorean and Chaldean totals for one
+input field plus a stack of per-character values. Typing or deleting at the
+end of the field is O(1): push or pop one character's values and adjust the
+totals, then reduce only the new totals. Anything else (a paste in the
+middle, a selection replaced) is sent as a reset and rescored in full.
+
+Client messages are JSON objects:
+
+    {"op": "append", "text": "an"}
+    {"op": "delete", "count": 1}
+    {"op": "reset", "text": "Anna"}
+
+Each reply is a delta holding only the fields that changed since the last
+reply, plus a sequence number.
+"""
+from numerology import calculate_numerology, chaldean, pythagorean, reduce_to_single_digit
+
+MAX_LENGTH = 1000
+
+
+class LiveScore:
+    """Running per-system sums for one input field"""
+
+    def __init__(self):
+        self.pythagorean_total = 0
+        self.chaldean_total = 0
+        self.unsupported = 0
+        self._values = []
+        self._last = {}
+        self._seq = 0
+
+    def _push(self, char):
+        try:
+            values = (calculate_numerology(char, pythagorean), calculate_numerology(char, chaldean))
+        except KeyError:
+            values = None
+            self.unsupported += 1
+        else:
+            self.pythagorean_total += values[0]
+            self.chaldean_total += values[1]
+        self._values.append(values)
+
+    def _pop(self):
+        values = self._values.pop()
+        if values is None:
+            self.unsupported -= 1
+        else:
+            self.pythagorean_total -= values[0]
+            self.chaldean_total -= values[1]
+
+    def append(self, text):
+        if len(self._values) + len(text) > MAX_LENGTH:
+            raise ValueError(f"Input longer than {MAX_LENGTH} characters")
+        for char in text:
+            self._push(char)
+
+    def delete(self, count):
+        for _ in range(min(count, len(self._values))):
+            self._pop()
+
+    def reset(self, text):
+        if len(text) > MAX_LENGTH:
+            raise ValueError(f"Input longer than {MAX_LENGTH} characters")
+        self._values = []
+        self.pythagorean_total = self.chaldean_total = self.unsupported = 0
+        self.append(text)
+
+    def state(self):
+        if self.unsupported:
+            return {"length": len(self._values), "pythagorean": None, "chaldean": None}
+        return {
+            "length": len(self._values),
+            "pythagorean": reduce_to_single_digit(self.pythagorean_total),
+            "chaldean": reduce_to_single_digit(self.chaldean_total)
+        }
+
+    def apply(self, message):
+        """Apply one client message and return the delta to send back"""
+        op = message.get("op") if isinstance(message, dict) else None
+        if op == "append" and isinstance(message.get("text"), str):
+            self.append(message["text"])
+        elif op == "delete" and isinstance(message.get("count"), int) and message["count"] >= 0:
+            self.delete(message["count"])
+        elif op == "reset" and isinstance(message.get("text"), str):
+            self.reset(message["text"])
+        else:
+            raise ValueError("Unknown or malformed operation")
+        state = self.state()
+        delta = {key: value for key, value in state.items() if self._last.get(key, object()) != value}
+        self._last = state
+        self._seq += 1
+        delta["seq"] = self._seq
+        return delta
@@ -0,0 +1,209 @@
+"""Lo Shu grids for many dates at once.
+
+generate_lo_shu_grid validates each date by constructing a datetime and
+counts digits in a formatted string. For thousands of rows this module
+does both with array arithmetic instead:
+
+- validity from month lengths and the Gregorian leap-year rule
+  (year 1-9999, as datetime allows)
+- digit counts from the eight date digits (day and month as two digits
+  each, year as four; padding zeros are never counted, so they do not
+  change the result)
+
+Rows are turned back into dicts identical to generate_lo_shu_grid's.
+Only a few hundred distinct count patterns occur across all dates, so the
+grid and the present/missing lists are built once per pattern and copied
+per row; for JSON responses each pattern is encoded once and spliced in.
+"""
+import csv
+import io
+import json
+
+import numpy as np
+
+from numerology import LO_SHU_POSITIONS, LoShuResult
+
+INVALID_DATE = "Invalid date"
+INVALID_NUMBERS = "Please enter valid numbers for day, month, and year"
+MAX_ROWS = 100000
+STATUS_OK, STATUS_INVALID_DATE, STATUS_INVALID_NUMBERS = 0, 1, 2
+
+_MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int64)
+_NUMBERS = np.arange(1, 10, dtype=np.int64)
+_INT_LIMIT = 2 ** 31
+
+
+def parse_rows(rows):
+    """(day, month, year) columns as int64 arrays, plus a mask of rows that parsed.
+
+    Values are converted like int() in the single-date API; rows that do not
+    convert are masked out.
+    """
+    rows = list(rows)
+    try:
+        table = np.array(rows, dtype=np.int64).reshape(len(rows), 3)
+        parsed = np.ones(len(rows), dtype=bool)
+    except (ValueError, TypeError, OverflowError):
+        table = np.zeros((len(rows), 3), dtype=np.int64)
+        parsed = np.zeros(len(rows), dtype=bool)
+        for i, row in enumerate(rows):
+            try:
+                values = [int(v) for v in row]
+            except (ValueError, TypeError, OverflowError):
+                continue
+            if len(values) != 3:
+                continue
+            # Far out of range is simply an invalid date
+            table[i] = [v if -_INT_LIMIT < v < _INT_LIMIT else 0 for v in values]
+            parsed[i] = True
+    return table[:, 0], table[:, 1], table[:, 2], parsed
+
+
+def valid_dates(days, months, years):
+    """Boolean mask of the rows that are real calendar dates"""
+    month_ok = (months >= 1) & (months <= 12)
+    leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    month_days = _MONTH_DAYS[np.where(month_ok, months, 0)] + (month_ok & (months == 2) & leap)
+    return month_ok & (years >= 1) & (years <= 9999) & (days >= 1) & (days <= month_days)
+
+
+def digit_counts(days, months, years):
+    """(n, 9) array: occurrences of digits 1-9 in each date"""
+    digits = np.stack([
+        days // 10, days % 10,
+        months // 10, months % 10,
+        years // 1000, years // 100 % 10, years // 10 % 10, years % 10,
+    ], axis=1)
+    return (digits[:, :, None] == _NUMBERS).sum(axis=1, dtype=np.uint8)
+
+
+def _pattern(counts):
+    """Grid, present and missing numbers for one count pattern"""
+    grid = [str(pos) * counts[pos - 1] for pos in LO_SHU_POSITIONS]
+    present = [n for n in range(1, 10) if counts[n - 1]]
+    missing = [n for n in range(1, 10) if not counts[n - 1]]
+    return grid, present, missing, sum(counts), dict(zip(range(1, 10), counts))
+
+
+def _analyze(rows):
+    """(error, counts, day, month, year) per row; error is None for valid dates"""
+    days, months, years, parsed = parse_rows(rows)
+    valid = parsed & valid_dates(days, months, years)
+    counts = digit_counts(days, months, years)
+    errors = np.where(valid, None, np.where(parsed, INVALID_DATE, INVALID_NUMBERS))
+    return zip(errors.tolist(), map(tuple, counts.tolist()), days.tolist(), months.tolist(), years.tolist())
+
+
+def lo_shu_grids(rows):
+    """Lo Shu results for many (day, month, year) rows.
+
+    Returns (results, errors): results[i] equals generate_lo_shu_grid for
+    valid rows and is None otherwise; errors lists {"row", "error"} for
+    each invalid row.
+    """
+    patterns = {}
+    results = []
+    errors = []
+    for i, (error, counts, day, month, year) in enumerate(_analyze(rows)):
+        if error is not None:
+            results.append(None)
+            errors.append({"row": i, "error": error})
+            continue
+        pattern = patterns.get(counts)
+        if pattern is None:
+            pattern = patterns[counts] = _pattern(counts)
+        grid, present, missing, total, number_counts = pattern
+        results.append({
+            'grid': grid[:],
+            'present_numbers': present[:],
+            'missing_numbers': missing[:],
+            'total_count': total,
+            'date_string': f"{day}/{month}/{year}",
+            'number_counts': number_counts.copy()
+        })
+    return results, errors
+
+
+def lo_shu_json(rows, fields=None):
+    """The JSON document {"errors": [...], "results": [...]} for many rows.
+
+    Same content as serializing lo_shu_grids() with sorted keys (limited to
+    fields when given), but each count pattern is encoded once and reused,
+    so no per-row dicts are built.
+    """
+    fields = set(fields or LoShuResult.FIELDS)
+    with_date = "date_string" in fields
+    fragments = {}
+    parts = []
+    errors = []
+    for i, (error, counts, day, month, year) in enumerate(_analyze(rows)):
+        if error is not None:
+            parts.append("null")
+            errors.append({"row": i, "error": error})
+            continue
+        fragment = fragments.get(counts)
+        if fragment is None:
+            grid, present, missing, total, number_counts = _pattern(counts)
+            # Everything after "date_string" in sorted key order
+            fragment = fragments[counts] = json.dumps({field: value for field, value in (
+                ('grid', grid),
+                ('missing_numbers', missing),
+                ('number_counts', number_counts),
+                ('present_numbers', present),
+                ('total_count', total)
+            ) if field in fields}, sort_keys=True, separators=(",", ":"))[1:]
+        if not with_date:
+            parts.append("{" + fragment)
+        elif fragment == "}":
+            parts.append(f'{{"date_string":"{day}/{month}/{year}"}}')
+        else:
+            parts.append(f'{{"date_string":"{day}/{month}/{year}",{fragment}')
+    return ('{"errors":' + json.dumps(errors, separators=(",", ":"))
+            + ',"results":[' + ",".join(parts) + "]}")
+
+
+def lo_shu_columns(rows):
+    """Columnar results for the binary format.
+
+    status: 0 for a valid date, 1 for an invalid date, 2 for values that
+    are not numbers; counts: occurrences of digits 1-9 per row (zeros for
+    invalid rows). Grids and present/missing numbers follow from counts.
+    """
+    days, months, years, parsed = parse_rows(rows)
+    valid = parsed & valid_dates(days, months, years)
+    counts = digit_counts(days, months, years)
+    counts[~valid] = 0
+    status = np.where(valid, STATUS_OK, np.where(parsed, STATUS_INVALID_DATE, STATUS_INVALID_NUMBERS))
+    return {"status": status.astype(np.uint8), "counts": counts}
+
+
+def rows_from_json(payload):
+    """Rows from {"dates": [[d, m, y], ...]} or [{"day", "month", "year"}, ...]"""
+    dates = payload.get("dates") if isinstance(payload, dict) else None
+    if not isinstance(dates, list):
+        raise ValueError("Expected a JSON object with a 'dates' list")
+    rows = []
+    for row in dates:
+        if isinstance(row, dict):
+            rows.append((row.get("day"), row.get("month"), row.get("year")))
+        elif isinstance(row, list):
+            rows.append(tuple(row) if len(row) == 3 else (None, None, None))
+        else:
+            rows.append((None, None, None))
+    return rows
+
+
+def rows_from_csv(text):
+    """Rows from CSV text: day,month,year columns, with or without a header"""
+    return list(iter_csv_rows(io.StringIO(text)))
+
+
+def iter_csv_rows(lines):
+    """Rows from an iterable of CSV lines, read lazily (see rows_from_csv)"""
+    reader = csv.reader(lines)
+    for i, row in enumerate(reader):
+        if not row:
+            continue
+        if i == 0 and [c.strip().lower() for c in row] == ["day", "month", "year"]:
+            continue
+        yield tuple(c.strip() for c in row) if len(row) == 3 else (None, None, None)
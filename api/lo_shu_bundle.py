@@ -0,0 +1,185 @@
+"""Pre-rendered Lo Shu result pages.
+
+A Lo Shu page depends only on (day, month, year), and the form accepts
+years 1900-2100, so every successful page can be rendered ahead of time.
+The build step renders the result section for all ~73k dates and writes a
+single bundle file:
+
+    magic (8 bytes) | header length (u32) | JSON header | zlib dictionary
+    | offsets: (count + 1) little-endian u64 | compressed fragments
+
+Fragments are compressed one by one against a shared dictionary (a sample
+fragment), so each compresses to a few hundred bytes but can still be
+inflated on its own. The header holds the page shell split around the
+day/month/year/result slots and a hash of the templates it was built from.
+
+At runtime the file is memory-mapped (and so shared by every worker via the
+page cache); serving a page is one offset lookup, one inflate and a string
+join, without running Jinja.
+
+    python api/lo_shu_bundle.py [--output api/lo_shu.bundle]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LOSHU\x00\x01\x00"
+FIRST_DATE = datetime.date(1900, 1, 1)
+LAST_DATE = datetime.date(2100, 12, 31)
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lo_shu.bundle")
+SLOTS = ("day", "month", "year", "result")
+SLOT_PATTERN = re.compile("@@(" + "|".join(SLOTS) + ")@@")
+
+
+def template_hash(*sources):
+    """Fingerprint of the templates a bundle was rendered from"""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(source.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class LoShuBundle:
+    """Read-only view over a memory-mapped bundle file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{path} is not a Lo Shu bundle")
+        (header_len,) = struct.unpack_from("<I", self._mm, 8)
+        header = json.loads(self._mm[12:12 + header_len])
+        self.first_ordinal = header["first_ordinal"]
+        self.count = header["count"]
+        self.template_hash = header["template_hash"]
+        shell = header["shell"]
+        self._texts = shell[0::2]
+        self._slots = shell[1::2]
+        zdict_start = 12 + header_len
+        self._zdict = bytes(self._mm[zdict_start:zdict_start + header["zdict_len"]])
+        self._index_start = zdict_start + header["zdict_len"]
+
+    def __contains__(self, date):
+        day, month, year = date
+        try:
+            ordinal = datetime.date(year, month, day).toordinal()
+        except ValueError:
+            return False
+        return 0 <= ordinal - self.first_ordinal < self.count
+
+    def fragment(self, day, month, year):
+        """Rendered result section for a date, or None if not in the bundle"""
+        i = datetime.date(year, month, day).toordinal() - self.first_ordinal
+        if not 0 <= i < self.count:
+            return None
+        start, end = struct.unpack_from("<QQ", self._mm, self._index_start + 8 * i)
+        inflater = zlib.decompressobj(zdict=self._zdict)
+        return inflater.decompress(self._mm[start:end]).decode("utf-8")
+
+    def page(self, day, month, year):
+        """Full result page for a valid date, or None if not in the bundle"""
+        fragment = self.fragment(day, month, year)
+        if fragment is None:
+            return None
+        values = {"day": str(day), "month": str(month), "year": str(year), "result": fragment}
+        parts = [self._texts[0]]
+        for slot, text in zip(self._slots, self._texts[1:]):
+            parts.append(values[slot])
+            parts.append(text)
+        return "".join(parts)
+
+    def close(self):
+        self._mm.close()
+
+
+def load(path, expected_hash):
+    """Open a bundle if it exists and matches the current templates"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        bundle = LoShuBundle(path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not load Lo Shu bundle {path}: {str(e)}")
+        return None
+    if bundle.template_hash != expected_hash:
+        logger.warning(f"Ignoring stale Lo Shu bundle {path}; rebuild it with lo_shu_bundle.py")
+        bundle.close()
+        return None
+    logger.info(f"Serving Lo Shu pages from {path} ({bundle.count} dates)")
+    return bundle
+
+
+def build(path):
+    """Render every date in range and write the bundle file"""
+    import index
+
+    fragment_template = index.app.jinja_env.from_string(index.LO_SHU_RESULT_TEMPLATE)
+    shell_template = index.app.jinja_env.from_string(
+        index.LO_SHU_TEMPLATE.replace(index.LO_SHU_RESULT_TEMPLATE, "@@result@@"))
+    shell_html = shell_template.render(grid_data=True, day="@@day@@", month="@@month@@",
+                                       year="@@year@@", error_message=None)
+    shell = SLOT_PATTERN.split(shell_html)
+
+    def render(date):
+        grid_data = index.generate_lo_shu_grid(date.day, date.month, date.year)
+        return fragment_template.render(grid_data=grid_data).encode("utf-8")
+
+    zdict = render(datetime.date(2000, 1, 1))[-32768:]
+    first = FIRST_DATE.toordinal()
+    count = LAST_DATE.toordinal() - first + 1
+    header = json.dumps({
+        "first_ordinal": first,
+        "count": count,
+        "template_hash": template_hash(index.LO_SHU_TEMPLATE, index.LO_SHU_RESULT_TEMPLATE),
+        "shell": shell,
+        "zdict_len": len(zdict),
+    }).encode("utf-8")
+
+    data_start = 12 + len(header) + len(zdict) + 8 * (count + 1)
+    offsets = [data_start]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(zdict)
+        f.seek(data_start)
+        for i in range(count):
+            deflater = zlib.compressobj(9, zdict=zdict)
+            blob = deflater.compress(render(datetime.date.fromordinal(first + i))) + deflater.flush()
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+        f.seek(12 + len(header) + len(zdict))
+        f.write(struct.pack(f"<{count + 1}Q", *offsets))
+    os.replace(tmp_path, path)
+    return count, offsets[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the pre-rendered Lo Shu page bundle")
+    parser.add_argument("--output", default=os.environ.get("NUMEROLOGY_LO_SHU_BUNDLE", DEFAULT_PATH),
+                        help="Bundle file to write (default: api/lo_shu.bundle)")
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    count, size = build(args.output)
+    print(f"Wrote {count} pages to {args.output} ({size / 1024 / 1024:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Memory diagnostics for the request path.
+
+Off by default: tracing every allocation slows Python down considerably.
+With NUMEROLOGY_MEMORY_DIAGNOSTICS=1 the app starts tracemalloc (keeping
+NUMEROLOGY_TRACEMALLOC_FRAMES frames per allocation, default 1) and adds:
+
+    GET  /debug/memory                 RSS, traced memory, per-route counters,
+                                       sizes of large long-lived objects
+    POST /debug/memory/snapshot        take a baseline snapshot; returns the
+                                       top allocation sites (?limit=, ?group=)
+    GET  /debug/memory/diff            growth since the baseline, by site
+
+Per-route counters record, for each request, the peak traced memory above
+what was allocated when the request started, the response body size, and the
+memory still allocated when it finished apart from the body (retained:
+caches filling up, or leaks). tracemalloc's peak is process-wide, so with
+concurrent requests a route's peak also includes whatever other threads
+allocated at the time; serve with one thread (or use tools/alloc_bench.py)
+for exact figures. Streaming response bodies are produced after the counters
+are recorded.
+"""
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+from flask import g, jsonify, request
+
+DEFAULT_LIMIT = 25
+GROUPS = ("lineno", "filename", "traceback")
+
+
+def enabled():
+    return os.environ.get("NUMEROLOGY_MEMORY_DIAGNOSTICS", "").lower() in ("1", "true", "yes")
+
+
+def rss_bytes():
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class RouteCounters:
+    """Per-route request count, peak and retained allocation totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, peak, retained, body):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {"requests": 0, "peak_max": 0, "peak_total": 0,
+                                               "retained_total": 0, "body_total": 0}
+            stats["requests"] += 1
+            stats["peak_max"] = max(stats["peak_max"], peak)
+            stats["peak_total"] += peak
+            stats["retained_total"] += retained
+            stats["body_total"] += body
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                route: {
+                    "requests": stats["requests"],
+                    "peak_bytes_max": stats["peak_max"],
+                    "peak_bytes_mean": stats["peak_total"] / stats["requests"],
+                    "body_bytes_mean": stats["body_total"] / stats["requests"],
+                    "retained_bytes_mean": stats["retained_total"] / stats["requests"],
+                    "retained_bytes_total": stats["retained_total"],
+                }
+                for route, stats in sorted(self._routes.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def top_stats(snapshot, group="lineno", limit=DEFAULT_LIMIT, baseline=None):
+    """Largest allocation sites of a snapshot, or largest changes since a baseline"""
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    snapshot = snapshot.filter_traces(ignore)
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline.filter_traces(ignore), group)
+        return [{"site": str(stat.traceback), "size": stat.size, "size_diff": stat.size_diff,
+                 "count": stat.count, "count_diff": stat.count_diff} for stat in stats[:limit]]
+    stats = snapshot.statistics(group)
+    return [{"site": str(stat.traceback), "size": stat.size, "count": stat.count} for stat in stats[:limit]]
+
+
+def install(app, objects=None):
+    """Start tracemalloc and add the counters and /debug/memory routes to app.
+
+    objects maps names to long-lived values (templates, tables) whose sizes
+    the summary reports.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(int(os.environ.get("NUMEROLOGY_TRACEMALLOC_FRAMES", "1")))
+    counters = RouteCounters()
+    state = {"baseline": None, "baseline_time": None}
+    objects = dict(objects or {})
+
+    @app.before_request
+    def start_memory_counters():
+        g.memory_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    @app.after_request
+    def measure_response_body(response):
+        # The buffered body is still alive at teardown; it is not retained by the app
+        g.memory_body = 0 if response.is_streamed else sys.getsizeof(response.get_data())
+        return response
+
+    @app.teardown_request
+    def record_memory_counters(error=None):
+        start = g.pop("memory_start", None)
+        if start is None:
+            return
+        body = g.pop("memory_body", 0)
+        current, peak = tracemalloc.get_traced_memory()
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        counters.record(f"{request.method} {route}", max(0, peak - start), current - start - body, body)
+
+    def query_options():
+        group = request.args.get("group", "lineno")
+        if group not in GROUPS:
+            raise ValueError(f"group must be one of {', '.join(GROUPS)}")
+        return group, request.args.get("limit", DEFAULT_LIMIT, type=int)
+
+    @app.route("/debug/memory", methods=["GET"])
+    def debug_memory():
+        """Memory summary; ?reset=1 clears the route counters"""
+        current, peak = tracemalloc.get_traced_memory()
+        summary = {
+            "rss_bytes": rss_bytes(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "allocated_blocks": sys.getallocatedblocks(),
+            "routes": counters.to_dict(),
+            # Largest first
+            "objects": sorted(([name, sys.getsizeof(value)] for name, value in objects.items()),
+                              key=lambda item: -item[1]),
+            "baseline_time": state["baseline_time"],
+        }
+        if request.args.get("reset"):
+            counters.reset()
+        return jsonify(summary)
+
+    @app.route("/debug/memory/snapshot", methods=["POST"])
+    def debug_memory_snapshot():
+        """Take a baseline snapshot and return its top allocation sites"""
+        try:
+            group, limit = query_options()
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        state["baseline"] = tracemalloc.take_snapshot()
+        state["baseline_time"] = time.time()
+        return jsonify(traced_bytes=tracemalloc.get_traced_memory()[0],
+                       top=top_stats(state["baseline"], group, limit))
+
+    @app.route("/debug/memory/diff", methods=["GET"])
+    def debug_memory_diff():
+        """Allocation sites that grew the most since the baseline snapshot"""
+        if state["baseline"] is None:
+            return jsonify(error="No baseline; POST /debug/memory/snapshot first"), 409
+        try:
+            group, limit = query_options()
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        return jsonify(baseline_time=state["baseline_time"],
+                       top=top_stats(tracemalloc.take_snapshot(), group, limit, baseline=state["baseline"]))
+
+    return counters
@@ -0,0 +1,231 @@
+"""Name-number distributions over large name corpora.
+
+A NameDistribution holds fixed-size count arrays for one pass over a set
+of names:
+
+- raw Pythagorean and Chaldean totals (0 .. TOTAL_BINS - 2, plus one
+  overflow bin)
+- reduced numbers (1-9, 11, 22, 33), indexed by the number itself
+- the joint distribution of both, for raw totals and for reduced numbers
+
+Memory is the same for ten names or ten million. Distributions merge by
+adding their arrays, so a corpus can be split into chunks, counted in
+separate processes and combined (map/reduce):
+
+    python api/name_stats.py names.txt --workers 8 --prefix AN
+
+Names a mapping cannot score are counted as unsupported and left out of
+the arrays.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from numerology import calculate_numerology, chaldean, pythagorean, reduce_to_single_digit
+
+# Raw totals at or above TOTAL_BINS - 1 share the last (overflow) bin
+TOTAL_BINS = 256
+REDUCED_BINS = 34
+CHUNK_SIZE = 10000
+SYSTEMS = ("pythagorean", "chaldean")
+
+
+class NameFilter:
+    """Which names to count: by prefix, letter count and first letter.
+
+    Matching ignores case and anything that is not a letter, the same way
+    names are scored.
+    """
+
+    def __init__(self, prefix=None, min_length=None, max_length=None, first_letter=None):
+        self.prefix = _letters(prefix).upper() if prefix else None
+        self.min_length = min_length
+        self.max_length = max_length
+        self.first_letter = _letters(first_letter)[:1].upper() if first_letter else None
+
+    def __bool__(self):
+        return any(v is not None for v in (self.prefix, self.min_length, self.max_length, self.first_letter))
+
+    def matches(self, name):
+        letters = _letters(name).upper()
+        if self.prefix is not None and not letters.startswith(self.prefix):
+            return False
+        if self.first_letter is not None and letters[:1] != self.first_letter:
+            return False
+        if self.min_length is not None and len(letters) < self.min_length:
+            return False
+        if self.max_length is not None and len(letters) > self.max_length:
+            return False
+        return True
+
+    def to_dict(self):
+        return {"prefix": self.prefix, "min_length": self.min_length,
+                "max_length": self.max_length, "first_letter": self.first_letter}
+
+
+def _letters(text):
+    return "".join(filter(str.isalpha, text))
+
+
+class NameDistribution:
+    """Fixed-size count arrays for one or more passes over names"""
+
+    def __init__(self):
+        self.count = 0
+        self.unsupported = 0
+        self.filtered = 0
+        self.totals = np.zeros((2, TOTAL_BINS), dtype=np.int64)
+        self.reduced = np.zeros((2, REDUCED_BINS), dtype=np.int64)
+        self.joint_totals = np.zeros((TOTAL_BINS, TOTAL_BINS), dtype=np.int64)
+        self.joint_reduced = np.zeros((REDUCED_BINS, REDUCED_BINS), dtype=np.int64)
+
+    def add(self, names, name_filter=None):
+        """Count a batch of names (any iterable; consumed once)"""
+        totals = ([], [])
+        for name in names:
+            if name_filter and not name_filter.matches(name):
+                self.filtered += 1
+                continue
+            try:
+                p = calculate_numerology(name, pythagorean)
+                c = calculate_numerology(name, chaldean)
+            except KeyError:
+                self.unsupported += 1
+                continue
+            totals[0].append(p)
+            totals[1].append(c)
+        if not totals[0]:
+            return self
+        raw = np.array(totals, dtype=np.int64)
+        reduced = np.array([[reduce_to_single_digit(v) for v in row] for row in totals], dtype=np.int64)
+        binned = np.minimum(raw, TOTAL_BINS - 1)
+        for i in range(2):
+            self.totals[i] += np.bincount(binned[i], minlength=TOTAL_BINS)
+            self.reduced[i] += np.bincount(reduced[i], minlength=REDUCED_BINS)
+        # Joint counts as one flat bincount over row-major cell indexes
+        self.joint_totals += np.bincount(binned[0] * TOTAL_BINS + binned[1],
+                                         minlength=TOTAL_BINS * TOTAL_BINS).reshape(TOTAL_BINS, TOTAL_BINS)
+        self.joint_reduced += np.bincount(reduced[0] * REDUCED_BINS + reduced[1],
+                                          minlength=REDUCED_BINS * REDUCED_BINS).reshape(REDUCED_BINS, REDUCED_BINS)
+        self.count += raw.shape[1]
+        return self
+
+    def merge(self, other):
+        """Add another distribution's counts into this one"""
+        self.count += other.count
+        self.unsupported += other.unsupported
+        self.filtered += other.filtered
+        self.totals += other.totals
+        self.reduced += other.reduced
+        self.joint_totals += other.joint_totals
+        self.joint_reduced += other.joint_reduced
+        return self
+
+    __iadd__ = merge
+
+    def to_dict(self):
+        """JSON-friendly summary; only non-empty bins are listed"""
+        result = {"count": self.count, "unsupported": self.unsupported, "filtered": self.filtered}
+        for i, system in enumerate(SYSTEMS):
+            result[system] = {
+                "totals": _sparse(self.totals[i]),
+                "reduced": _sparse(self.reduced[i]),
+                "mean_total": _mean(self.totals[i]),
+            }
+        result["joint_totals"] = _sparse_joint(self.joint_totals)
+        result["joint_reduced"] = _sparse_joint(self.joint_reduced)
+        result["total_overflow"] = TOTAL_BINS - 1
+        return result
+
+
+def _sparse(counts):
+    return {int(i): int(counts[i]) for i in np.flatnonzero(counts)}
+
+
+def _sparse_joint(counts):
+    rows, cols = np.nonzero(counts)
+    return [[int(p), int(c), int(counts[p, c])] for p, c in zip(rows, cols)]
+
+
+def _mean(counts):
+    """Mean raw total (overflowed totals count at the overflow bin)"""
+    n = counts.sum()
+    return round(float(np.dot(np.arange(len(counts)), counts) / n), 3) if n else None
+
+
+def count_chunk(names, name_filter=None):
+    """Distribution of one chunk (the map step; runs in worker processes)"""
+    return NameDistribution().add(names, name_filter)
+
+
+def chunked(names, size=CHUNK_SIZE):
+    """Split any iterable of names into lists of at most size names"""
+    iterator = iter(names)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def distribution(names, name_filter=None, workers=1, chunk_size=CHUNK_SIZE):
+    """Distribution of a stream of names in one pass.
+
+    With workers > 1 chunks are counted in a process pool and merged as
+    they finish; at most two chunks per worker are in flight, so memory
+    stays bounded however long the stream is.
+    """
+    total = NameDistribution()
+    if workers <= 1:
+        for chunk in chunked(names, chunk_size):
+            total.add(chunk, name_filter)
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = set()
+        for chunk in chunked(names, chunk_size):
+            pending.add(pool.submit(count_chunk, chunk, name_filter))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total.merge(future.result())
+        for future in pending:
+            total.merge(future.result())
+    return total
+
+
+def read_names(paths):
+    """Names from text files, one per line (blank lines skipped)"""
+    for path in paths:
+        with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+            for line in f:
+                name = line.strip()
+                if name:
+                    yield name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Name-number distributions for a name corpus")
+    parser.add_argument("files", nargs="+", help="Text files with one name per line ('-' for stdin)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--prefix")
+    parser.add_argument("--first-letter")
+    parser.add_argument("--min-length", type=int)
+    parser.add_argument("--max-length", type=int)
+    args = parser.parse_args(argv)
+
+    name_filter = NameFilter(args.prefix, args.min_length, args.max_length, args.first_letter)
+    result = distribution(read_names(args.files), name_filter or None, args.workers, args.chunk_size)
+    print(json.dumps(result.to_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
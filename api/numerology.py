@@ -0,0 +1,393 @@
+"""Numerology engine: letter tables, name scoring and the Lo Shu grid.
+
+Latin letters use the Pythagorean or Chaldean mapping. Other scripts use
+their own traditional letter values in both systems:
+
+- Cyrillic: the Russian alphabet numbered 1-9 in order, as in Russian
+  Pythagorean numerology
+- Greek: isopsephy (alpha = 1 ... omega = 800)
+- Hebrew: standard gematria (aleph = 1 ... tav = 400)
+- Devanagari: katapayadi consonant values (vowels count 0)
+
+Each mapping is compiled once into two lookup tables: a bytes.translate()
+table for ASCII names and a list indexed by code point for everything else,
+so script detection costs one isascii()/max() per string rather than a
+branch per character.
+
+reference.py holds straightforward versions of the scoring functions;
+tools/engine_check.py checks these optimized ones against them.
+"""
+import logging
+import unicodedata
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Pythagorean numerology mapping
+pythagorean = {
+    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'H': 8, 'I': 9,
+    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'O': 6, 'P': 7, 'Q': 8, 'R': 9,
+    'S': 1, 'T': 2, 'U': 3, 'V': 4, 'W': 5, 'X': 6, 'Y': 7, 'Z': 8
+}
+
+# Chaldean numerology mapping
+chaldean = {
+    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 8, 'G': 3, 'H': 5, 'I': 1,
+    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'O': 7, 'P': 8, 'Q': 1, 'R': 2,
+    'S': 3, 'T': 4, 'U': 6, 'V': 6, 'W': 6, 'X': 5, 'Y': 1, 'Z': 7
+}
+
+# Cyrillic (Russian alphabet), numbered 1-9 in alphabetical order
+cyrillic = {
+    letter: i % 9 + 1
+    for i, letter in enumerate('АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ')
+}
+
+# Greek isopsephy, including the archaic numerals stigma/digamma, koppa and sampi
+greek_isopsephy = {
+    'Α': 1, 'Β': 2, 'Γ': 3, 'Δ': 4, 'Ε': 5, 'Ϛ': 6, 'Ϝ': 6, 'Ζ': 7, 'Η': 8,
+    'Θ': 9, 'Ι': 10, 'Κ': 20, 'Λ': 30, 'Μ': 40, 'Ν': 50, 'Ξ': 60, 'Ο': 70,
+    'Π': 80, 'Ϙ': 90, 'Ϟ': 90, 'Ρ': 100, 'Σ': 200, 'ς': 200, 'Τ': 300,
+    'Υ': 400, 'Φ': 500, 'Χ': 600, 'Ψ': 700, 'Ω': 800, 'Ϡ': 900
+}
+
+# Hebrew gematria (mispar hechrachi); final forms keep the base letter's value
+hebrew_gematria = {
+    'א': 1, 'ב': 2, 'ג': 3, 'ד': 4, 'ה': 5, 'ו': 6, 'ז': 7, 'ח': 8, 'ט': 9,
+    'י': 10, 'כ': 20, 'ל': 30, 'מ': 40, 'נ': 50, 'ס': 60, 'ע': 70, 'פ': 80,
+    'צ': 90, 'ק': 100, 'ר': 200, 'ש': 300, 'ת': 400,
+    'ך': 20, 'ם': 40, 'ן': 50, 'ף': 80, 'ץ': 90
+}
+
+# Devanagari katapayadi: consonants by varga, independent vowels count 0
+devanagari_katapayadi = {
+    'क': 1, 'ख': 2, 'ग': 3, 'घ': 4, 'ङ': 5, 'च': 6, 'छ': 7, 'ज': 8, 'झ': 9, 'ञ': 0,
+    'ट': 1, 'ठ': 2, 'ड': 3, 'ढ': 4, 'ण': 5, 'त': 6, 'थ': 7, 'द': 8, 'ध': 9, 'न': 0,
+    'प': 1, 'फ': 2, 'ब': 3, 'भ': 4, 'म': 5,
+    'य': 1, 'र': 2, 'ल': 3, 'व': 4, 'श': 5, 'ष': 6, 'स': 7, 'ह': 8, 'ळ': 9,
+    'अ': 0, 'आ': 0, 'इ': 0, 'ई': 0, 'उ': 0, 'ऊ': 0, 'ऋ': 0, 'ॠ': 0, 'ऌ': 0,
+    'ए': 0, 'ऐ': 0, 'ओ': 0, 'औ': 0
+}
+
+# Non-Latin scores shared by every mapping
+SCRIPT_TABLES = (cyrillic, greek_isopsephy, hebrew_gematria, devanagari_katapayadi)
+
+# Letter values for every non-Latin script, upper and lower case
+_NATIVE_VALUES = {}
+for _script in SCRIPT_TABLES:
+    for _letter, _value in _script.items():
+        _NATIVE_VALUES[_letter] = _value
+        _NATIVE_VALUES[_letter.lower()] = _value
+
+def _fold(char):
+    """Strip diacritics and compatibility forms: 'é' -> 'e', 'ﬁ' -> 'fi'"""
+    decomposed = unicodedata.normalize('NFKD', char)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+def letter_value(char, mapping):
+    """Value of a single letter, or None if no table covers it.
+
+    Latin letters (including accented forms, which fold to their base
+    letters) take their value from mapping; other scripts from SCRIPT_TABLES.
+    """
+    if char in _NATIVE_VALUES:
+        return _NATIVE_VALUES[char]
+    folded = _fold(char)
+    if folded in _NATIVE_VALUES:
+        return _NATIVE_VALUES[folded]
+    folded = folded.upper()
+    if folded and all(c in mapping for c in folded):
+        return sum(mapping[c] for c in folded)
+    return None
+
+# Compiled letter tables cover code points below this (up to the end of Devanagari)
+TABLE_SIZE = 0x0980
+
+_compiled_tables = {}
+
+def compile_ascii_table(mapping):
+    """bytes.translate() table giving each ASCII byte its letter value.
+
+    Returns None when the mapping lacks a letter or has values outside
+    0-255; such mappings use the per-character loop instead.
+    """
+    table = bytearray(256)
+    for code in range(128):
+        char = chr(code)
+        if char.isalpha():
+            value = mapping.get(char.upper())
+            if not isinstance(value, int) or not 0 <= value <= 255:
+                return None
+            table[code] = value
+    return bytes(table)
+
+def compile_letter_table(mapping):
+    """Build a list indexed by code point holding each character's value.
+
+    Non-letters are 0; letters no table covers are None.
+    """
+    table = [0] * TABLE_SIZE
+    for code in range(TABLE_SIZE):
+        char = chr(code)
+        if char.isalpha():
+            table[code] = letter_value(char, mapping)
+    return table
+
+def compile_mapping(mapping):
+    """(mapping, ascii table, letter table) for calculate_compiled()"""
+    return (mapping, compile_ascii_table(mapping), compile_letter_table(mapping))
+
+def _compiled(mapping):
+    """compile_mapping(mapping), compiled on first use.
+
+    Mappings are treated as immutable once used. Callers holding many
+    mappings (see custom_tables.py) keep their own compiled entries.
+    """
+    entry = _compiled_tables.get(id(mapping))
+    if entry is None or entry[0] is not mapping:
+        if len(_compiled_tables) >= 64:
+            _compiled_tables.clear()
+        entry = compile_mapping(mapping)
+        _compiled_tables[id(mapping)] = entry
+    return entry
+
+def letter_table(mapping):
+    """Compiled code point table for a mapping (see compile_letter_table)"""
+    return _compiled(mapping)[2]
+
+# Compile the built-in systems at import time (shared by preforked workers)
+letter_table(pythagorean)
+letter_table(chaldean)
+
+def calculate_numerology(name, mapping):
+    """Calculate numerology value for a name using the given mapping"""
+    return calculate_compiled(name, _compiled(mapping))
+
+def calculate_compiled(name, entry):
+    """calculate_numerology() with a mapping already compiled by compile_mapping()"""
+    mapping, ascii_table, table = entry
+    if name.isascii():
+        if ascii_table is not None:
+            # Map every byte to its letter value in C, then add them up
+            return sum(name.encode('ascii').translate(ascii_table))
+        total = 0
+        for char in name:
+            if char.isalpha():
+                total += mapping[char.upper()]
+        return total
+    return _calculate_extended(name, mapping, table)
+
+def _calculate_extended(name, mapping, table):
+    """Score a name with non-ASCII characters through a compiled letter table"""
+    if ord(max(name)) < TABLE_SIZE:
+        # Every character falls inside the table: no bounds checks needed
+        try:
+            return sum(map(table.__getitem__, map(ord, name)))
+        except TypeError:
+            raise KeyError(next(c for c in name if table[ord(c)] is None)) from None
+    total = 0
+    for char in name:
+        code = ord(char)
+        if code < TABLE_SIZE:
+            value = table[code]
+        elif char.isalpha():
+            value = letter_value(char, mapping)
+        else:
+            continue
+        if value is None:
+            raise KeyError(char)
+        total += value
+    return total
+
+MASTER_NUMBERS = (11, 22, 33)
+
+def _reduce_by_digit_sums(number):
+    if number in MASTER_NUMBERS:
+        return number
+    while number >= 10:
+        number = sum(int(digit) for digit in str(number))
+        if number in MASTER_NUMBERS:
+            return number
+    return number
+
+# Precomputed reductions for the totals names actually produce
+REDUCE_TABLE_SIZE = 10000
+_REDUCED = [_reduce_by_digit_sums(n) for n in range(REDUCE_TABLE_SIZE)]
+
+def reduce_to_single_digit(number):
+    """Reduce number to single digit (1-9) except for master numbers 11, 22, 33"""
+    if type(number) is int and 0 <= number < REDUCE_TABLE_SIZE:
+        return _REDUCED[number]
+    return _reduce_by_digit_sums(number)
+
+def life_path_number(day, month, year):
+    """Life path number: every digit of the birth date added up and reduced"""
+    return reduce_to_single_digit(sum(map(int, f"{day}{month}{year}")))
+
+def is_valid_date(day, month, year):
+    """Validate if the given date is valid"""
+    try:
+        datetime(year, month, day)
+        return True
+    except (ValueError, OverflowError):
+        return False
+
+LO_SHU_POSITIONS = (4, 9, 2, 3, 5, 7, 8, 1, 6)
+_DIGITS = tuple(zip(range(1, 10), '123456789'))
+_GRID_CELLS = tuple((pos, str(pos)) for pos in LO_SHU_POSITIONS)
+
+def generate_lo_shu_grid(day, month, year):
+    """Generate Lo Shu Grid from birth date"""
+    try:
+        # Validate the date first
+        if not is_valid_date(day, month, year):
+            raise ValueError("Invalid date")
+        
+        # Combine all digits from the birth date; zeros are never counted
+        date_string = f"{day:02d}{month:02d}{year}"
+        
+        # Count occurrences of each number 1-9
+        number_counts = {number: date_string.count(digit) for number, digit in _DIGITS}
+        
+        # Create the grid (Lo Shu magic square positions)
+        # Traditional Lo Shu square:
+        # 4 9 2
+        # 3 5 7
+        # 8 1 6
+        # Each cell repeats its number once per occurrence (empty if absent)
+        grid = [digit * number_counts[pos] for pos, digit in _GRID_CELLS]
+        
+        # Analyze the grid
+        present_numbers = []
+        missing_numbers = []
+        for number, count in number_counts.items():
+            (present_numbers if count else missing_numbers).append(number)
+        
+        return {
+            'grid': grid,
+            'present_numbers': present_numbers,
+            'missing_numbers': missing_numbers,
+            'total_count': len(date_string) - date_string.count('0'),
+            'date_string': f"{day}/{month}/{year}",
+            'number_counts': number_counts
+        }
+    except Exception as e:
+        logger.error(f"Error generating Lo Shu grid: {str(e)}")
+        raise
+
+class NameResult:
+    """Numerology numbers for one name, each computed on first access.
+
+    Use this when only some numbers are needed; accessing a number for a
+    name with unsupported characters raises KeyError.
+    """
+    __slots__ = ('name', '_pythagorean_total', '_chaldean_total')
+
+    FIELDS = ('name', 'pythagorean', 'chaldean', 'pythagorean_total', 'chaldean_total')
+    DEFAULT_FIELDS = ('name', 'pythagorean', 'chaldean')
+
+    def __init__(self, name):
+        self.name = name
+        self._pythagorean_total = None
+        self._chaldean_total = None
+
+    @property
+    def pythagorean_total(self):
+        if self._pythagorean_total is None:
+            self._pythagorean_total = calculate_numerology(self.name, pythagorean)
+        return self._pythagorean_total
+
+    @property
+    def chaldean_total(self):
+        if self._chaldean_total is None:
+            self._chaldean_total = calculate_numerology(self.name, chaldean)
+        return self._chaldean_total
+
+    @property
+    def pythagorean(self):
+        return reduce_to_single_digit(self.pythagorean_total)
+
+    @property
+    def chaldean(self):
+        return reduce_to_single_digit(self.chaldean_total)
+
+    def to_dict(self, fields=None):
+        """The requested fields (by default name, pythagorean and chaldean)"""
+        return {field: getattr(self, field) for field in fields or self.DEFAULT_FIELDS}
+
+class LoShuResult:
+    """Lo Shu analysis of one date, each part computed on first access.
+
+    The date is validated up front (ValueError if invalid); to_dict() with
+    no fields equals generate_lo_shu_grid().
+    """
+    __slots__ = ('day', 'month', 'year', '_counts', '_grid', '_present_numbers', '_missing_numbers')
+
+    FIELDS = ('grid', 'present_numbers', 'missing_numbers', 'total_count', 'date_string', 'number_counts')
+
+    def __init__(self, day, month, year):
+        if not is_valid_date(day, month, year):
+            raise ValueError("Invalid date")
+        self.day = day
+        self.month = month
+        self.year = year
+        self._counts = self._grid = self._present_numbers = self._missing_numbers = None
+
+    @property
+    def counts(self):
+        """Occurrences of digits 1-9, as a tuple"""
+        if self._counts is None:
+            date_string = f"{self.day:02d}{self.month:02d}{self.year}"
+            self._counts = tuple(date_string.count(digit) for _, digit in _DIGITS)
+        return self._counts
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            counts = self.counts
+            self._grid = [digit * counts[pos - 1] for pos, digit in _GRID_CELLS]
+        return self._grid
+
+    @property
+    def present_numbers(self):
+        if self._present_numbers is None:
+            self._present_numbers = [n for n, count in enumerate(self.counts, 1) if count]
+        return self._present_numbers
+
+    @property
+    def missing_numbers(self):
+        if self._missing_numbers is None:
+            self._missing_numbers = [n for n, count in enumerate(self.counts, 1) if not count]
+        return self._missing_numbers
+
+    @property
+    def total_count(self):
+        return sum(self.counts)
+
+    @property
+    def date_string(self):
+        return f"{self.day}/{self.month}/{self.year}"
+
+    @property
+    def number_counts(self):
+        return dict(zip(range(1, 10), self.counts))
+
+    def to_dict(self, fields=None):
+        """The requested fields (by default all of them)"""
+        return {field: getattr(self, field) for field in fields or self.FIELDS}
+
+def parse_fields(value, allowed):
+    """Field names from a comma-separated string or a list; None means all.
+
+    Raises ValueError for names not in allowed.
+    """
+    if value is None or value == "":
+        return None
+    fields = value.split(",") if isinstance(value, str) else value
+    if not isinstance(fields, (list, tuple)) or not all(isinstance(f, str) for f in fields):
+        raise ValueError("'fields' must be a comma-separated string or a list of names")
+    fields = tuple(dict.fromkeys(f.strip() for f in fields if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (choose from {', '.join(allowed)})")
+    return fields or None
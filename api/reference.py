@@ -0,0 +1,121 @@
+"""Reference implementations of the numerology engine.
+
+These are the plain, obviously-correct versions of the scoring functions:
+one character, one digit, one dict entry at a time. They define the
+expected output. The optimized versions in numerology.py (and any engine
+built on top of them) must match these exactly; tools/engine_check.py
+fuzzes them against each other and benchmarks them.
+
+Do not optimize this module. Only change it when the intended results
+change, and change the engines with it.
+"""
+import unicodedata
+from datetime import datetime
+
+from numerology import SCRIPT_TABLES
+
+
+def letter_value(char, mapping):
+    """Value of a single letter, or None if no table covers it"""
+    for candidate in (char, strip_marks(char)):
+        for script in SCRIPT_TABLES:
+            for letter, value in script.items():
+                if candidate == letter or candidate == letter.lower():
+                    return value
+    folded = strip_marks(char).upper()
+    if not folded:
+        return None
+    total = 0
+    for c in folded:
+        if c not in mapping:
+            return None
+        total += mapping[c]
+    return total
+
+
+def strip_marks(char):
+    decomposed = unicodedata.normalize('NFKD', char)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def calculate_numerology(name, mapping):
+    """Calculate numerology value for a name using the given mapping"""
+    total = 0
+    for char in name:
+        if char.isalpha():
+            if char.isascii():
+                total += mapping[char.upper()]
+                continue
+            value = letter_value(char, mapping)
+            if value is None:
+                raise KeyError(char)
+            total += value
+    return total
+
+
+def reduce_to_single_digit(number):
+    """Reduce number to single digit (1-9) except for master numbers 11, 22, 33"""
+    if number in [11, 22, 33]:
+        return number
+    while number >= 10:
+        number = sum(int(digit) for digit in str(number))
+        if number in [11, 22, 33]:
+            return number
+    return number
+
+
+def life_path_number(day, month, year):
+    """Life path number: every digit of the birth date added up and reduced"""
+    total = 0
+    for part in (day, month, year):
+        for digit in str(part):
+            total += int(digit)
+    return reduce_to_single_digit(total)
+
+
+def is_valid_date(day, month, year):
+    """Validate if the given date is valid"""
+    try:
+        datetime(year, month, day)
+        return True
+    except (ValueError, OverflowError):
+        return False
+
+
+def generate_lo_shu_grid(day, month, year):
+    """Generate Lo Shu Grid from birth date"""
+    # Validate the date first
+    if not is_valid_date(day, month, year):
+        raise ValueError("Invalid date")
+
+    # Combine all digits from the birth date
+    date_string = f"{day:02d}{month:02d}{year}"
+    all_digits = [int(d) for d in date_string if d != '0']  # Remove zeros
+
+    # Count occurrences of each number 1-9
+    number_counts = {}
+    for i in range(1, 10):
+        number_counts[i] = all_digits.count(i)
+
+    # Fill grid based on number counts, in Lo Shu magic square order
+    lo_shu_positions = [4, 9, 2, 3, 5, 7, 8, 1, 6]
+    grid = []
+    for pos in lo_shu_positions:
+        count = number_counts[pos]
+        if count > 0:
+            grid.append(str(pos) * count)  # Repeat number based on count
+        else:
+            grid.append('')  # Empty if not present
+
+    # Analyze the grid
+    present_numbers = [i for i in range(1, 10) if number_counts[i] > 0]
+    missing_numbers = [i for i in range(1, 10) if number_counts[i] == 0]
+
+    return {
+        'grid': grid,
+        'present_numbers': present_numbers,
+        'missing_numbers': missing_numbers,
+        'total_count': len(all_digits),
+        'date_string': f"{day}/{month}/{year}",
+        'number_counts': number_counts
+    }
@@ -0,0 +1,280 @@
+"""Sharded remote result cache shared across nodes.
+
+ShardedCacheClient spreads keys over N cache nodes with a consistent-hash
+ring, so adding or removing a node only moves ~1/N of the keys. Each node
+has a small connection pool; a batch lookup sends one pipelined MGET per
+node. Every network call has a short timeout, and a node that fails is
+skipped for a few seconds, so callers just see misses and compute locally.
+A call that finds every pooled connection busy is also a miss, but it
+does not mark the node down.
+
+A tiny cache server speaking the same protocol is included for local
+testing and small deployments:
+
+    python api/remote_cache.py --port 11311
+
+Protocol (one command per line, values are length-prefixed):
+
+    MGET <key> [<key> ...]      ->  per key: "VALUE <len>" + data line, or "MISS"
+    SET <key> <len> + data line ->  "OK"
+
+Values are JSON; dicts keyed by digit strings (Lo Shu number counts) are
+restored with int keys.
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+from result_cache import MemoryCache
+
+logger = logging.getLogger(__name__)
+
+
+def encode_value(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _restore_int_keys(obj):
+    if obj and all(k.isdigit() for k in obj):
+        return {int(k): v for k, v in obj.items()}
+    return obj
+
+
+def decode_value(data):
+    return json.loads(data, object_hook=_restore_int_keys)
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, nodes, vnodes=160):
+        self._points = []
+        self._owners = []
+        ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        for point, node in ring:
+            self._points.append(point)
+            self._owners.append(node)
+
+    def node_for(self, key):
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[i]
+
+
+class PoolExhausted(Exception):
+    """Every connection to a node is busy; the node itself may be fine"""
+
+
+class NodeConnection:
+    """One connection to a cache node"""
+
+    def __init__(self, address, timeout):
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class NodePool:
+    """Bounded pool of connections to one node, with a cool-down after failures"""
+
+    def __init__(self, node, size, timeout, retry_after):
+        host, _, port = node.rpartition(":")
+        self.address = (host, int(port))
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.down_until = 0.0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolExhausted(f"all connections to {self.address[0]}:{self.address[1]} are busy")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return NodeConnection(self.address, self.timeout)
+            except OSError:
+                self._slots.release()
+                raise
+
+    def release(self, conn, healthy=True):
+        if healthy:
+            self._idle.put(conn)
+        else:
+            conn.close()
+            self.down_until = time.monotonic() + self.retry_after
+        self._slots.release()
+
+
+class ShardedCacheClient:
+    """Cache tier that shards keys over remote nodes"""
+
+    def __init__(self, nodes, pool_size=4, timeout=0.05, retry_after=5.0, vnodes=160):
+        self.ring = HashRing(nodes, vnodes)
+        self.pools = {node: NodePool(node, pool_size, timeout, retry_after) for node in nodes}
+        self.exhausted = 0
+
+    def _group(self, keys):
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.ring.node_for(key), []).append(key)
+        return groups
+
+    def _call(self, node, fn):
+        pool = self.pools[node]
+        if not pool.available():
+            return None
+        try:
+            conn = pool.acquire()
+        except PoolExhausted:
+            # More callers than connections: a miss for this call, not a node failure
+            self.exhausted += 1
+            return None
+        except OSError as e:
+            logger.warning(f"Cache node {node} unavailable: {str(e)}")
+            pool.down_until = time.monotonic() + pool.retry_after
+            return None
+        try:
+            result = fn(conn)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache node {node} failed: {str(e)}")
+            pool.release(conn, healthy=False)
+            return None
+        pool.release(conn)
+        return result
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys found; one round trip per node"""
+        found = {}
+        for node, node_keys in self._group(keys).items():
+            def mget(conn, node_keys=node_keys):
+                conn.sock.sendall(("MGET " + " ".join(quote(k) for k in node_keys) + "\n").encode("ascii"))
+                values = {}
+                for key in node_keys:
+                    header = conn.reader.readline().split()
+                    if not header:
+                        raise ValueError("connection closed")
+                    if header[0] == b"VALUE":
+                        data = conn.reader.read(int(header[1]) + 1)[:-1]
+                        values[key] = decode_value(data)
+                    elif header[0] != b"MISS":
+                        raise ValueError(f"unexpected reply {header[0]!r}")
+                return values
+            values = self._call(node, mget)
+            if values:
+                found.update(values)
+        return found
+
+    def set_many(self, items):
+        """Store {key: value}; writes to each node are pipelined"""
+        for node, node_keys in self._group(items).items():
+            def mset(conn, node_keys=node_keys):
+                out = []
+                for key in node_keys:
+                    data = encode_value(items[key])
+                    out.append(f"SET {quote(key)} {len(data)}\n".encode("ascii") + data + b"\n")
+                conn.sock.sendall(b"".join(out))
+                for _ in node_keys:
+                    if conn.reader.readline().strip() != b"OK":
+                        raise ValueError("SET not acknowledged")
+            self._call(node, mset)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+
+def from_env():
+    """Client for NUMEROLOGY_CACHE_NODES, or None when no nodes are configured"""
+    nodes = [n.strip() for n in os.environ.get("NUMEROLOGY_CACHE_NODES", "").split(",") if n.strip()]
+    if not nodes:
+        return None
+    timeout = float(os.environ.get("NUMEROLOGY_CACHE_TIMEOUT_MS", "50")) / 1000
+    pool_size = int(os.environ.get("NUMEROLOGY_CACHE_POOL_SIZE", "4"))
+    return ShardedCacheClient(nodes, pool_size=pool_size, timeout=timeout)
+
+
+# -- local cache server ----------------------------------------------------
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            if not parts:
+                continue
+            command = parts[0].upper()
+            if command == b"MGET":
+                out = []
+                for key in parts[1:]:
+                    value = store.get(key)
+                    if value is None:
+                        out.append(b"MISS\n")
+                    else:
+                        out.append(b"VALUE %d\n%s\n" % (len(value), value))
+                self.wfile.write(b"".join(out))
+            elif command == b"SET" and len(parts) == 3:
+                data = self.rfile.read(int(parts[2]) + 1)[:-1]
+                store.set(parts[1], data)
+                self.wfile.write(b"OK\n")
+            else:
+                self.wfile.write(b"ERROR\n")
+                return
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, max_entries):
+        super().__init__(address, CacheRequestHandler)
+        self.store = MemoryCache(max_entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local numerology cache server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11311)
+    parser.add_argument("--max-entries", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    server = CacheServer((args.host, args.port), args.max_entries)
+    logger.info(f"Cache server listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
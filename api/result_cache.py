@@ -0,0 +1,265 @@
+"""Result caches for name scores and Lo Shu grids.
+
+Up to three tiers sit under the lookup functions in index.py:
+
+- MemoryCache: a bounded LRU private to each worker process.
+- SQLiteCache: an optional file shared by every worker on the node. It runs
+  in WAL mode so readers never block the writer, buffers writes and flushes
+  them in batches, evicts the oldest rows once the file passes a size
+  budget, and survives restarts so a fresh deploy starts warm.
+- remote_cache.ShardedCacheClient: optional cache nodes shared by every
+  node in the deployment.
+
+TieredCache checks the tiers in order and back-fills faster tiers on a hit.
+Values are pickled in the SQLite tier; the cache file must only be writable
+by the service account.
+"""
+import atexit
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """Thread-safe LRU cache holding at most max_entries values"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Persistent cache in a SQLite file shared across processes"""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, batch_size=256, flush_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._pid = os.getpid()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " written REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_written ON results (written)")
+        conn.commit()
+        atexit.register(self.flush)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self):
+        # Connections must not cross a fork; reopen in each worker process
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._local = threading.local()
+            with self._pending_lock:
+                self._pending = {}
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def get(self, key):
+        with self._pending_lock:
+            value = self._pending.get(key)
+        if value is not None:
+            return value
+        try:
+            row = self._conn().execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache read failed: {str(e)}")
+            return None
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            return None
+
+    def set(self, key, value):
+        with self._pending_lock:
+            self._pending[key] = value
+            due = (len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered entries in one transaction, then enforce the size budget"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        now = time.time()
+        rows = [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now)
+                for key, value in pending.items()]
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO results (key, value, written) VALUES (?, ?, ?)", rows)
+            conn.execute("COMMIT")
+            self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache write failed: {str(e)}")
+            try:
+                self._conn().execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def used_bytes(self, conn=None):
+        conn = conn or self._conn()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self, conn):
+        used = self.used_bytes(conn)
+        if used <= self.max_bytes:
+            return
+        # Drop the oldest rows in proportion to the overshoot, plus 10% headroom
+        total = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        drop = max(1, int(total * ((used - self.max_bytes) / used + 0.1)))
+        conn.execute("DELETE FROM results WHERE key IN "
+                     "(SELECT key FROM results ORDER BY written LIMIT ?)", (drop,))
+
+    def recent(self, limit):
+        """Yield (key, value) for the most recently written entries"""
+        rows = self._conn().execute(
+            "SELECT key, value FROM results ORDER BY written DESC LIMIT ?", (limit,))
+        for key, blob in rows:
+            try:
+                yield key, pickle.loads(blob)
+            except Exception:
+                continue
+
+
+class TieredCache:
+    """Looks keys up tier by tier, back-filling faster tiers on a hit"""
+
+    def __init__(self, *tiers):
+        self.tiers = list(tiers)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys found in any tier"""
+        found = {}
+        missing = list(keys)
+        for i, tier in enumerate(self.tiers):
+            if not missing:
+                break
+            if hasattr(tier, "get_many"):
+                values = tier.get_many(missing)
+            else:
+                values = {}
+                for key in missing:
+                    value = tier.get(key)
+                    if value is not None:
+                        values[key] = value
+            if values:
+                for faster in self.tiers[:i]:
+                    for key, value in values.items():
+                        faster.set(key, value)
+                found.update(values)
+                missing = [key for key in missing if key not in values]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found
+
+    def set_many(self, items):
+        for tier in self.tiers:
+            if hasattr(tier, "set_many"):
+                tier.set_many(items)
+            else:
+                for key, value in items.items():
+                    tier.set(key, value)
+
+    def warm(self, limit):
+        """Fill the first tier from the most recent entries of a persistent tier"""
+        loaded = 0
+        for tier in self.tiers[1:]:
+            if not hasattr(tier, "recent"):
+                continue
+            for key, value in tier.recent(limit - loaded):
+                self.tiers[0].set(key, value)
+                loaded += 1
+            if loaded >= limit:
+                break
+        return loaded
+
+
+def from_env():
+    """Build the cache configured by NUMEROLOGY_CACHE_* environment variables"""
+    import remote_cache
+
+    memory = MemoryCache(int(os.environ.get("NUMEROLOGY_CACHE_SIZE", "10000")))
+    cache = TieredCache(memory)
+    path = os.environ.get("NUMEROLOGY_CACHE_DB")
+    if path:
+        max_mb = float(os.environ.get("NUMEROLOGY_CACHE_DB_MAX_MB", "256"))
+        try:
+            cache.tiers.append(SQLiteCache(path, max_bytes=int(max_mb * 1024 * 1024)))
+        except sqlite3.Error as e:
+            logger.error(f"Could not open result cache {path}: {str(e)}")
+        else:
+            warm = int(os.environ.get("NUMEROLOGY_CACHE_WARM", str(memory.max_entries)))
+            if warm:
+                loaded = cache.warm(min(warm, memory.max_entries))
+                logger.info(f"Result cache warmed with {loaded} entries from {path}")
+    remote = remote_cache.from_env()
+    if remote is not None:
+        cache.tiers.append(remote)
+    return cache
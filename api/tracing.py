@@ -0,0 +1,378 @@
+"""Per-request tracing with stage spans and a slow-request log.
+
+Every request gets a trace ID. It is taken from a W3C traceparent header
+or an X-Request-ID header of 32 hex digits, and generated otherwise. The ID
+is returned in the X-Request-ID response header. Code on the request path
+marks its stages with span():
+
+    with span("calculate_numerology", system="chaldean"):
+        total = calculate_numerology(name, chaldean)
+
+Spans nest, and outside a traced request span() is a shared no-op. The
+last NUMEROLOGY_TRACE_BUFFER finished traces (default 1000) are kept in a
+ring buffer. A request slower than NUMEROLOGY_TRACE_SLOW_MS (default 250)
+is logged as a warning with its stage breakdown. Its full trace is
+appended as one line of OTLP/JSON (the OpenTelemetry protocol's JSON
+encoding, as the collector's file exporter writes it) to
+NUMEROLOGY_TRACE_FILE, which defaults to numerology-slow-traces.jsonl in
+the temp directory. NUMEROLOGY_TRACING=0 turns tracing off.
+
+Span attributes record sizes and choices, never the names or dates being
+scored. With NUMEROLOGY_TRACE_ENDPOINTS=1 the buffer can be read over HTTP:
+
+    GET /debug/traces               recent traces, newest first
+                                    (?slow=1, ?limit=)
+    GET /debug/traces/<trace_id>    one trace as OTLP/JSON
+"""
+import collections
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+from flask import g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "numerology"
+DEFAULT_BUFFER = 1000
+DEFAULT_SLOW_MS = 250.0
+DEFAULT_LIMIT = 50
+# Spans past this many in one trace are counted, not recorded
+MAX_SPANS = 256
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_TRACE_ID = re.compile(r"[0-9a-f]{32}")
+_TRACEPARENT = re.compile(r"[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}")
+
+_current = contextvars.ContextVar("numerology_trace", default=None)
+
+
+def enabled():
+    return os.environ.get("NUMEROLOGY_TRACING", "1").lower() not in ("0", "false", "no")
+
+
+def new_id(size):
+    """Random hex ID of size bytes (IDs need to be unique, not unguessable)"""
+    return f"{random.getrandbits(size * 8):0{size * 2}x}"
+
+
+class Span:
+    __slots__ = ("name", "parent", "kind", "start", "end", "attributes", "error", "_span_id")
+
+    def __init__(self, name, parent, kind, attributes):
+        self.name = name
+        # The parent Span, or for the root the caller's span ID (or None)
+        self.parent = parent
+        self.kind = kind
+        self.attributes = attributes
+        self.error = None
+        self._span_id = None
+        self.start = time.perf_counter_ns()
+        self.end = None
+
+    @property
+    def span_id(self):
+        # Only exported spans need an ID
+        if self._span_id is None:
+            self._span_id = new_id(8)
+        return self._span_id
+
+    @property
+    def parent_id(self):
+        return self.parent.span_id if isinstance(self.parent, Span) else self.parent
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e6
+
+
+class _NoSpan:
+    """Stands in for a span when there is no trace to record it in"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _SpanScope:
+    __slots__ = ("trace", "name", "attributes", "span")
+
+    def __init__(self, trace, name, attributes):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.span = self.trace.open(self.name, self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.close(self.span, exc)
+        return False
+
+
+class Trace:
+    """The spans of one request; the first span is the request itself"""
+
+    def __init__(self, name, trace_id=None, parent_id=None, attributes=None):
+        self.trace_id = trace_id or new_id(16)
+        # Spans are timed with the monotonic clock and exported in wall time
+        self.epoch_offset = time.time_ns() - time.perf_counter_ns()
+        self.spans = []
+        self.dropped = 0
+        self._stack = []
+        self.root = Span(name, parent_id, SPAN_KIND_SERVER, attributes or {})
+        self.spans.append(self.root)
+        self._stack.append(self.root)
+
+    def span(self, name, attributes):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return NO_SPAN
+        return _SpanScope(self, name, attributes)
+
+    def open(self, name, attributes):
+        span = Span(name, self._stack[-1], SPAN_KIND_INTERNAL, attributes)
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def close(self, span, error=None):
+        span.end = time.perf_counter_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if self._stack and self._stack[-1] is span:
+            self._stack.pop()
+
+    def finish(self, **attributes):
+        self.root.attributes.update(attributes)
+        now = time.perf_counter_ns()
+        for span in self.spans:
+            if span.end is None:
+                span.end = now
+        self._stack.clear()
+
+    @property
+    def duration_ms(self):
+        return self.root.duration_ms
+
+    def breakdown(self):
+        """Total milliseconds per stage name, in order of first appearance"""
+        totals = {}
+        for span in self.spans[1:]:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return totals
+
+    def summary(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": (self.root.start + self.epoch_offset) / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.root.attributes.get("http.response.status_code"),
+            "spans": len(self.spans),
+            "stages": {name: round(ms, 3) for name, ms in self.breakdown().items()},
+        }
+
+    def to_otlp(self):
+        """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+        return {"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": f"{SERVICE_NAME}.tracing"},
+                "spans": [self._otlp_span(span) for span in self.spans],
+            }],
+        }]}
+
+    def _otlp_span(self, span):
+        attributes = dict(span.attributes)
+        if span is self.root and self.dropped:
+            attributes["numerology.dropped_spans"] = self.dropped
+        status = {"code": STATUS_UNSET}
+        if span.error is not None:
+            status = {"code": STATUS_ERROR, "message": span.error}
+        return {
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "kind": span.kind,
+            # int64 values are strings in OTLP/JSON
+            "startTimeUnixNano": str(span.start + self.epoch_offset),
+            "endTimeUnixNano": str(span.end + self.epoch_offset),
+            "attributes": otlp_attributes(attributes),
+            "status": status,
+        }
+
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_attributes(attributes):
+    return [{"key": key, "value": otlp_value(value)} for key, value in attributes.items()]
+
+
+def span(name, **attributes):
+    """Context manager recording a stage of the current request, if traced"""
+    trace = _current.get()
+    if trace is None:
+        return NO_SPAN
+    return trace.span(name, attributes)
+
+
+def current_trace():
+    return _current.get()
+
+
+class Tracer:
+    """Ring buffer of finished traces, plus the slow-request log"""
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER, slow_ms=DEFAULT_SLOW_MS, export_path=None):
+        self.slow_ms = slow_ms
+        self.export_path = export_path
+        self.traces = collections.deque(maxlen=buffer_size)
+        self.slow = 0
+        self._lock = threading.Lock()
+
+    def start(self, name, trace_id=None, parent_id=None, attributes=None):
+        """Begin a trace and make it current; returns (trace, token)"""
+        trace = Trace(name, trace_id, parent_id, attributes)
+        return trace, _current.set(trace)
+
+    def finish(self, trace, token, **attributes):
+        _current.reset(token)
+        trace.finish(**attributes)
+        self.traces.append(trace)
+        if trace.duration_ms >= self.slow_ms:
+            self.record_slow(trace)
+
+    def record_slow(self, trace):
+        stages = ", ".join(f"{name} {ms:.1f} ms" for name, ms in trace.breakdown().items())
+        logger.warning(f"Slow request {trace.root.name} took {trace.duration_ms:.1f} ms "
+                       f"(trace {trace.trace_id}): {stages or 'no stages recorded'}")
+        with self._lock:
+            self.slow += 1
+            if self.export_path is None:
+                return
+            try:
+                with open(self.export_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_otlp(), separators=(",", ":")) + "\n")
+            except OSError as e:
+                logger.error(f"Could not write slow trace to {self.export_path}: {e}")
+
+    def recent(self, slow_only=False, limit=DEFAULT_LIMIT):
+        """Summaries of the newest buffered traces"""
+        traces = list(self.traces)
+        traces.reverse()
+        if slow_only:
+            traces = [trace for trace in traces if trace.duration_ms >= self.slow_ms]
+        return [trace.summary() for trace in traces[:limit]]
+
+    def find(self, trace_id):
+        for trace in list(self.traces):
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+
+
+def incoming_ids(environ):
+    """(trace ID, parent span ID) from traceparent or X-Request-ID, if valid"""
+    traceparent = environ.get("HTTP_TRACEPARENT")
+    if traceparent:
+        match = _TRACEPARENT.fullmatch(traceparent.strip().lower())
+        if match:
+            return match.group(1), match.group(2)
+    request_id = environ.get("HTTP_X_REQUEST_ID")
+    if request_id:
+        request_id = request_id.strip().lower()
+        if _TRACE_ID.fullmatch(request_id):
+            return request_id, None
+    return None, None
+
+
+def from_env():
+    """Tracer configured by NUMEROLOGY_TRACE_* variables (None when tracing is off)"""
+    if not enabled():
+        return None
+    export_path = os.environ.get("NUMEROLOGY_TRACE_FILE",
+                                 os.path.join(tempfile.gettempdir(), "numerology-slow-traces.jsonl"))
+    return Tracer(
+        buffer_size=int(os.environ.get("NUMEROLOGY_TRACE_BUFFER", str(DEFAULT_BUFFER))),
+        slow_ms=float(os.environ.get("NUMEROLOGY_TRACE_SLOW_MS", str(DEFAULT_SLOW_MS))),
+        export_path=export_path or None,
+    )
+
+
+def install(app, tracer):
+    """Trace every request handled by app, and add /debug/traces if enabled"""
+
+    @app.before_request
+    def start_trace():
+        trace_id, parent_id = incoming_ids(request.environ)
+        g.trace, g.trace_token = tracer.start(f"{request.method} {request.path}", trace_id, parent_id, {
+            "http.request.method": request.method,
+            "url.path": request.path,
+        })
+
+    @app.after_request
+    def add_request_id(response):
+        trace = g.get("trace")
+        if trace is not None:
+            response.headers["X-Request-ID"] = trace.trace_id
+            trace.root.attributes["http.response.status_code"] = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_trace(error=None):
+        trace = g.pop("trace", None)
+        if trace is None:
+            return
+        if request.url_rule is not None:
+            trace.root.name = f"{request.method} {request.url_rule.rule}"
+            trace.root.attributes["http.route"] = request.url_rule.rule
+        if error is not None:
+            trace.root.error = f"{type(error).__name__}: {error}"
+        tracer.finish(trace, g.pop("trace_token"))
+
+    if os.environ.get("NUMEROLOGY_TRACE_ENDPOINTS", "").lower() not in ("1", "true", "yes"):
+        return tracer
+
+    @app.route("/debug/traces", methods=["GET"])
+    def debug_traces():
+        """Buffered traces, newest first; ?slow=1 for slow ones only"""
+        limit = request.args.get("limit", DEFAULT_LIMIT, type=int)
+        return jsonify(slow_ms=tracer.slow_ms, slow_logged=tracer.slow, buffered=len(tracer.traces),
+                       traces=tracer.recent(bool(request.args.get("slow")), limit))
+
+    @app.route("/debug/traces/<trace_id>", methods=["GET"])
+    def debug_trace(trace_id):
+        """One buffered trace as OTLP/JSON"""
+        trace = tracer.find(trace_id.lower())
+        if trace is None:
+            return jsonify(error="Trace not found (it may have left the buffer)"), 404
+        return jsonify(trace.to_otlp())
+
+    return tracer
@@ -0,0 +1,62 @@
+"""Production server configuration.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app), so the letter tables,
+compiled page templates and anything else built at import time live in
+pages that the forked workers share copy-on-write. After loading, the
+master moves every object into the GC's permanent generation so collections
+in the workers do not write to (and un-share) those pages.
+
+Memory per worker is logged at startup; for a live breakdown run
+`python tools/worker_rss.py <master pid>`.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from worker_rss import read_memory  # noqa: E402
+
+pythonpath = os.path.join(ROOT, "api")
+wsgi_app = "index:app"
+preload_app = True
+
+bind = os.environ.get("NUMEROLOGY_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("NUMEROLOGY_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get("NUMEROLOGY_THREADS", "1"))
+worker_class = "gthread" if threads > 1 else "sync"
+max_requests = int(os.environ.get("NUMEROLOGY_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+pidfile = os.environ.get("NUMEROLOGY_PIDFILE")
+loglevel = os.environ.get("NUMEROLOGY_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers fork"""
+    gc.collect()
+    gc.freeze()
+    stats = read_memory(os.getpid())
+    server.log.info("Master ready: rss=%.1fMB, %d objects frozen",
+                    stats.get("rss_kb", 0) / 1024, gc.get_freeze_count())
+
+
+def post_worker_init(worker):
+    # Resume unfinished background jobs in the worker, never in the forking master
+    from index import JOBS
+    if JOBS is not None:
+        JOBS.resume()
+    stats = read_memory(worker.pid)
+    worker.log.info("Worker %s: rss=%.1fMB pss=%.1fMB private=%.1fMB",
+                    worker.pid, stats.get("rss_kb", 0) / 1024, stats.get("pss_kb", 0) / 1024,
+                    (stats.get("private_clean_kb", 0) + stats.get("private_dirty_kb", 0)) / 1024)
+
+
+def worker_exit(server, worker):
+    stats = read_memory(worker.pid)
+    server.log.info("Worker %s exiting: rss=%.1fMB pss=%.1fMB",
+                    worker.pid, stats.get("rss_kb", 0) / 1024, stats.get("pss_kb", 0) / 1024)
@@ -0,0 +1,160 @@
+"""Allocations per request for each route, plus the biggest long-lived objects.
+
+Runs the app in-process with memory diagnostics on (see
+api/memory_diagnostics.py). Each scenario first warms up (filling caches),
+then sends --requests requests, cycling through a pool of inputs. The
+figures come from the app's own per-route counters:
+
+- peak: the most memory allocated at once while handling a request
+- retained: memory still allocated after it (cache growth, leaks)
+- body: the response body
+
+The core functions are measured the same way per call, and long-lived
+strings are listed with their size and bytes per character. A single
+character outside Latin-1, such as an emoji, makes CPython store the whole
+string at 4 bytes per character.
+
+    python tools/alloc_bench.py
+    python tools/alloc_bench.py --requests 500 --json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tracemalloc
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(TOOLS_DIR), "api")
+sys.path.insert(0, API_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+from loadtest import random_name  # noqa: E402
+
+
+def random_date(rng):
+    return rng.randint(1, 28), rng.randint(1, 12), rng.randint(1900, 2100)
+
+
+def scenarios(rng, pool):
+    """(label, method, path, request kwargs per input) for each route"""
+    names = [random_name(rng) for _ in range(pool)]
+    dates = [random_date(rng) for _ in range(pool)]
+    batches = [[random_name(rng) for _ in range(100)] for _ in range(pool)]
+    date_batches = [[list(random_date(rng)) for _ in range(100)] for _ in range(pool)]
+    return [
+        ("home", "GET", "/", [{}]),
+        ("name page", "POST", "/name-calculator", [{"data": {"name": n}} for n in names]),
+        ("Lo Shu page", "POST", "/lo-shu-grid",
+         [{"data": {"day": str(d), "month": str(m), "year": str(y)}} for d, m, y in dates]),
+        ("name API", "POST", "/api/name-numbers", [{"json": {"name": n}} for n in names]),
+        ("name API, 100 names", "POST", "/api/name-numbers", [{"json": {"names": b}} for b in batches]),
+        ("Lo Shu API", "POST", "/api/lo-shu", [{"json": {"day": d, "month": m, "year": y}} for d, m, y in dates]),
+        ("bulk Lo Shu, 100 dates", "POST", "/api/lo-shu/bulk", [{"json": {"dates": b}} for b in date_batches]),
+    ]
+
+
+def bench_routes(client, requests, warmup, pool, seed):
+    rng = random.Random(seed)
+    report = []
+    for label, method, path, inputs in scenarios(rng, pool):
+        for i in range(warmup):
+            client.open(path, method=method, **inputs[i % len(inputs)])
+        client.get("/debug/memory?reset=1")
+        for i in range(requests):
+            client.open(path, method=method, **inputs[i % len(inputs)])
+        routes = client.get("/debug/memory").get_json()["routes"]
+        stats = routes[f"{method} {path}"]
+        report.append({"route": label, "method": method, "path": path, **stats})
+    return report
+
+
+def per_call(fn, args_list):
+    """Median and max peak bytes per call"""
+    peaks = []
+    for args in args_list:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        fn(*args)
+        peaks.append(tracemalloc.get_traced_memory()[1] - start)
+    return {"peak_bytes_median": statistics.median(peaks), "peak_bytes_max": max(peaks)}
+
+
+def bench_functions(calls, seed):
+    import reference
+    from lo_shu_bulk import lo_shu_grids
+    from numerology import LoShuResult, calculate_numerology, generate_lo_shu_grid, pythagorean
+
+    rng = random.Random(seed)
+    dates = [random_date(rng) for _ in range(calls)]
+    names = [(random_name(rng), pythagorean) for _ in range(calls)]
+    return {
+        "generate_lo_shu_grid": per_call(generate_lo_shu_grid, dates),
+        "reference.generate_lo_shu_grid": per_call(reference.generate_lo_shu_grid, dates),
+        "LoShuResult grid only": per_call(lambda *date: LoShuResult(*date).to_dict(("grid",)), dates),
+        "lo_shu_grids, 100 dates": per_call(lo_shu_grids, [(dates[i:i + 100],) for i in range(0, calls, 100)]),
+        "calculate_numerology": per_call(calculate_numerology, names),
+    }
+
+
+def string_kind(value):
+    """Bytes per character CPython uses for a str"""
+    if not value:
+        return 1
+    widest = max(map(ord, value))
+    return 1 if widest < 256 else 2 if widest < 65536 else 4
+
+
+def long_lived(objects, limit):
+    rows = []
+    for name, value in objects.items():
+        if isinstance(value, str):
+            rows.append({"name": name, "bytes": sys.getsizeof(value), "chars": len(value),
+                         "bytes_per_char": string_kind(value)})
+    rows.sort(key=lambda row: -row["bytes"])
+    return rows[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report allocations per request for each route")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per route")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per route first")
+    parser.add_argument("--pool", type=int, default=50, help="Distinct inputs per route")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    os.environ["NUMEROLOGY_MEMORY_DIAGNOSTICS"] = "1"
+    import logging
+    import index
+    logging.getLogger().setLevel(logging.WARNING)
+
+    client = index.app.test_client()
+    results = {
+        "routes": bench_routes(client, args.requests, args.warmup, args.pool, args.seed),
+        "functions": bench_functions(max(args.requests, 100), args.seed),
+        "long_lived": long_lived(vars(index), 10),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    kib = lambda n: f"{n / 1024:.1f}"
+    print(f"{'route':<24} {'peak KiB':>9} {'max KiB':>8} {'retained B':>11} {'body KiB':>9}")
+    for r in results["routes"]:
+        print(f"{r['route']:<24} {kib(r['peak_bytes_mean']):>9} {kib(r['peak_bytes_max']):>8} "
+              f"{r['retained_bytes_mean']:>11.0f} {kib(r['body_bytes_mean']):>9}")
+    print()
+    print(f"{'function (per call)':<32} {'peak KiB':>9} {'max KiB':>8}")
+    for name, r in results["functions"].items():
+        print(f"{name:<32} {kib(r['peak_bytes_median']):>9} {kib(r['peak_bytes_max']):>8}")
+    print()
+    print(f"{'long-lived string':<24} {'KiB':>8} {'chars':>8} {'B/char':>7}")
+    for r in results["long_lived"]:
+        print(f"{r['name']:<24} {kib(r['bytes']):>8} {r['chars']:>8} {r['bytes_per_char']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Compare the WSGI and ASGI serving paths at high concurrency.
+
+Starts each server in a subprocess on localhost and hits it with many
+concurrent clients. A share of the clients are "slow": they send their
+request body in small pieces with a delay in between, like mobile users on
+a bad connection. Latency is reported for the remaining fast clients.
+
+The WSGI side runs the Flask app on a fixed thread pool (like a threaded
+worker with N threads), where a slow upload holds a thread until it
+completes. The ASGI side runs `asgi:app` under uvicorn with the same number
+of threads for the Flask bridge.
+
+    pip install uvicorn
+    python tools/asgi_bench.py --concurrency 64,256 --threads 8
+
+--hot-share sends that fraction of the fast requests for one name, like a
+campaign burst; those are coalesced on the ASGI side. Requests shed by
+admission control (503) are counted separately from errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(os.path.dirname(TOOLS_DIR), "api")
+sys.path.insert(0, TOOLS_DIR)
+
+from loadtest import percentile, random_name  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_wsgi(port, threads):
+    """Serve the Flask app with a fixed-size thread pool (subprocess mode)"""
+    import logging
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+    sys.path.insert(0, API_DIR)
+    from index import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    class PoolWSGIServer(WSGIServer):
+        request_queue_size = 1024
+
+        def __init__(self, address, handler):
+            super().__init__(address, handler)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.work, request, client_address)
+
+        def work(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PoolWSGIServer(("127.0.0.1", port), QuietHandler)
+    server.set_app(app)
+    server.serve_forever()
+
+
+def start_server(kind, port, threads):
+    env = dict(os.environ, NUMEROLOGY_ASGI_THREADS=str(threads))
+    if kind == "wsgi":
+        cmd = [sys.executable, __file__, "--serve-wsgi", str(port), "--threads", str(threads)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port),
+               "--log-level", "warning", "--backlog", "1024"]
+    proc = subprocess.Popen(cmd, cwd=API_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{kind} server exited with code {proc.returncode}")
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+async def post(port, path, body, content_type, slow_delay=0.0, piece=16):
+    """Send one POST; if slow_delay is set, trickle the body piece by piece"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        head = (f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n")
+        writer.write(head.encode("latin-1"))
+        if slow_delay:
+            for i in range(0, len(body), piece):
+                writer.write(body[i:i + piece])
+                await writer.drain()
+                await asyncio.sleep(slow_delay)
+        else:
+            writer.write(body)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+HOT_NAME = "Taylor Swift"
+
+
+async def run_level(port, concurrency, requests, slow_share, slow_delay, batch_size, seed, hot_share=0.0):
+    rng = random.Random(seed)
+    queue = asyncio.Queue()
+    for i in range(requests):
+        if rng.random() < slow_share:
+            queue.put_nowait(("slow", "/name-calculator",
+                              urlencode({"name": random_name(rng)}).encode(),
+                              "application/x-www-form-urlencoded"))
+        elif batch_size and i % 10 == 0:
+            names = [random_name(rng) for _ in range(batch_size)]
+            queue.put_nowait(("batch", "/api/name-numbers",
+                              json.dumps({"names": names}).encode(), "application/json"))
+        else:
+            name = HOT_NAME if rng.random() < hot_share else random_name(rng)
+            queue.put_nowait(("fast", "/name-calculator", urlencode({"name": name}).encode(),
+                              "application/x-www-form-urlencoded"))
+    latencies = {}
+    errors = 0
+    shed = 0
+
+    async def client():
+        nonlocal errors, shed
+        while not queue.empty():
+            kind, path, body, ctype = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                status = await post(port, path, body, ctype, slow_delay if kind == "slow" else 0.0)
+                if status == 503:
+                    shed += 1
+                elif status >= 500:
+                    errors += 1
+            except OSError:
+                errors += 1
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    report = {"concurrency": concurrency, "throughput": requests / wall, "errors": errors, "shed": shed}
+    for kind, values in latencies.items():
+        values.sort()
+        report[kind] = {"count": len(values),
+                        "p50_ms": percentile(values, 50) * 1000,
+                        "p99_ms": percentile(values, 99) * 1000}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark WSGI vs ASGI serving")
+    parser.add_argument("--serve-wsgi", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads per server")
+    parser.add_argument("--concurrency", default="64,256", help="Comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per level")
+    parser.add_argument("--slow-share", type=float, default=0.2, help="Fraction of slow-upload clients")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Seconds between slow body pieces")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Names per batch request (every 10th request; 0 to disable)")
+    parser.add_argument("--hot-share", type=float, default=0.0,
+                        help="Fraction of fast requests for one hot name")
+    parser.add_argument("--servers", default="wsgi,asgi", help="Which servers to benchmark")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.serve_wsgi:
+        serve_wsgi(args.serve_wsgi, args.threads)
+        return 0
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = {}
+    for kind in args.servers.split(","):
+        port = free_port()
+        proc = start_server(kind, port, args.threads)
+        try:
+            results[kind] = [asyncio.run(run_level(port, level, args.requests, args.slow_share,
+                                                   args.slow_delay, args.batch_size, seed=level,
+                                                   hot_share=args.hot_share))
+                             for level in levels]
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'server':<6} {'conc':>5} {'req/s':>8} {'errs':>5} {'shed':>5} {'fast p50':>9} {'fast p99':>9} "
+          f"{'slow p50':>9} {'batch p50':>10}")
+    for kind, levels_report in results.items():
+        for r in levels_report:
+            def p(key, stat):
+                return f"{r[key][stat]:.1f}" if key in r else "-"
+            print(f"{kind:<6} {r['concurrency']:>5} {r['throughput']:>8.1f} {r['errors']:>5} {r['shed']:>5} "
+                  f"{p('fast', 'p50_ms'):>9} {p('fast', 'p99_ms'):>9} {p('slow', 'p50_ms'):>9} "
+                  f"{p('batch', 'p50_ms'):>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
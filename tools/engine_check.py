@@ -0,0 +1,721 @@
+"""Differential fuzzing and a speed gate for the numerology engines.
+
+Every optimized path (table lookups, precomputed reductions, caches, lazy
+results, the pre-rendered Lo Shu bundle, incremental live and batch
+scoring, the people directory's bitset indexes, the brand name search, the
+generated JavaScript engine, compiled tenant tables) is checked against
+the plain implementations in api/reference.py, or a brute-force search, on
+random names, numbers and dates. The gate then times each optimized path
+against its reference and fails if it is not actually faster.
+
+    pip install -r requirements-dev.txt
+    python tools/engine_check.py fuzz --examples 2000
+    python tools/engine_check.py gate
+    python tools/engine_check.py            # both
+
+Checks of the serving machinery (background jobs, the remote cache tier,
+admission control) are in tools/service_check.py. Exit status is non-zero
+when any check fails.
+"""
+import argparse
+import logging
+import os
+import random
+import string
+import sys
+import timeit
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+sys.path.insert(0, API_DIR)
+
+import numerology  # noqa: E402
+import reference  # noqa: E402
+
+MAPPINGS = {"pythagorean": numerology.pythagorean, "chaldean": numerology.chaldean}
+
+
+def outcome(fn, *args):
+    """Result of a call, or the exception type it raised"""
+    try:
+        return ("ok", fn(*args))
+    except Exception as e:
+        return ("error", type(e).__name__)
+
+
+# -- fuzz checks -------------------------------------------------------------
+
+def name_strategy():
+    from hypothesis import strategies as st
+
+    script_letters = "".join("".join(table) for table in numerology.SCRIPT_TABLES)
+    script_letters += script_letters.lower()
+    accented = "àáâãäåçèéêëìíîïñòóôõöùúûüýÿßæøœłđħŉǆﬁẞẠễ"
+    return st.text(
+        alphabet=st.one_of(
+            st.sampled_from(string.ascii_letters + " -'.’0123456789"),
+            st.sampled_from(script_letters + accented),
+            st.characters(),
+        ),
+        max_size=40,
+    )
+
+
+def date_strategy():
+    from hypothesis import strategies as st
+
+    dates = st.tuples(st.integers(-2, 40), st.integers(-2, 14), st.integers(0, 10000))
+    # Now and then one part is far outside any calendar, where datetime overflows
+    huge = st.integers(2 ** 31, 10 ** 30)
+    overflowing = st.one_of(st.tuples(huge, st.integers(1, 12), st.integers(1900, 2100)),
+                            st.tuples(st.integers(1, 28), huge, st.integers(1900, 2100)),
+                            st.tuples(st.integers(1, 28), st.integers(1, 12), huge))
+    return st.one_of(dates, dates, dates, dates, overflowing)
+
+
+def check_calculate(examples):
+    from hypothesis import given, settings
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(name_strategy())
+    def run(name):
+        for system, mapping in MAPPINGS.items():
+            expected = outcome(reference.calculate_numerology, name, mapping)
+            actual = outcome(numerology.calculate_numerology, name, mapping)
+            assert actual == expected, (system, name, actual, expected)
+    run()
+
+
+def check_reduce(examples):
+    from hypothesis import given, settings, strategies as st
+
+    # The precomputed range is small enough to check exhaustively
+    for number in range(-10, numerology.REDUCE_TABLE_SIZE + 10):
+        assert numerology.reduce_to_single_digit(number) == reference.reduce_to_single_digit(number), number
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(st.one_of(st.integers(-100, 20000), st.integers(0, 10 ** 12)))
+    def run(number):
+        assert numerology.reduce_to_single_digit(number) == reference.reduce_to_single_digit(number), number
+    run()
+
+
+def check_lo_shu(examples):
+    from hypothesis import given, settings
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(date_strategy())
+    def run(date):
+        expected = outcome(reference.generate_lo_shu_grid, *date)
+        actual = outcome(numerology.generate_lo_shu_grid, *date)
+        assert actual == expected, (date, actual, expected)
+    run()
+
+
+def check_lo_shu_bulk(examples):
+    import json
+
+    from hypothesis import given, settings, strategies as st
+
+    import columnar
+    import lo_shu_bulk
+
+    value = st.one_of(st.integers(-5, 10050), st.integers(), st.sampled_from(["7", "x", None, 3.5]))
+    rows = st.lists(st.one_of(date_strategy(), st.tuples(value, value, value)), max_size=60)
+
+    @settings(max_examples=max(1, examples // 5), deadline=None, database=None)
+    @given(rows)
+    def run(dates):
+        expected = []
+        for row in dates:
+            try:
+                expected.append(reference.generate_lo_shu_grid(*(int(v) for v in row)))
+            except (ValueError, TypeError, OverflowError):
+                expected.append(None)
+        results, errors = lo_shu_bulk.lo_shu_grids(dates)
+        assert results == expected, dates
+        assert [e["row"] for e in errors] == [i for i, r in enumerate(expected) if r is None], dates
+        assert json.loads(lo_shu_bulk.lo_shu_json(dates)) == json.loads(
+            json.dumps({"errors": errors, "results": results})), dates
+        # The binary format carries the same information
+        _, columns = columnar.decode(columnar.encode(lo_shu_bulk.lo_shu_columns(dates)))
+        for result, status, counts in zip(expected, columns["status"].tolist(), columns["counts"].tolist()):
+            assert (status == lo_shu_bulk.STATUS_OK) == (result is not None), dates
+            assert counts == (list(result["number_counts"].values()) if result else [0] * 9), dates
+    run()
+
+
+def check_lazy_results(examples):
+    import json
+
+    from hypothesis import given, settings, strategies as st
+
+    import lo_shu_bulk
+
+    name_fields = st.lists(st.sampled_from(numerology.NameResult.FIELDS), unique=True)
+    lo_shu_fields = st.lists(st.sampled_from(numerology.LoShuResult.FIELDS), unique=True)
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(name_strategy(), name_fields, date_strategy(), lo_shu_fields)
+    def run(name, n_fields, date, d_fields):
+        # Any subset of fields, in any order, equals the same keys of the full result
+        totals = {system: outcome(reference.calculate_numerology, name, m) for system, m in MAPPINGS.items()}
+        full = {"name": name}
+        for system, (kind, total) in totals.items():
+            full[system + "_total"] = (kind, total)
+            full[system] = (kind, reference.reduce_to_single_digit(total) if kind == "ok" else total)
+        result = numerology.NameResult(name)
+        for field in n_fields or numerology.NameResult.DEFAULT_FIELDS:
+            expected = full[field]
+            assert outcome(getattr, result, field) == (expected if field != "name" else ("ok", name)), (name, field)
+
+        expected = outcome(reference.generate_lo_shu_grid, *date)
+        actual = outcome(lambda: numerology.LoShuResult(*date).to_dict(d_fields))
+        if expected[0] == "ok":
+            wanted = d_fields or numerology.LoShuResult.FIELDS
+            assert actual == ("ok", {f: expected[1][f] for f in wanted}), (date, d_fields)
+            doc = json.loads(lo_shu_bulk.lo_shu_json([date], d_fields))
+            assert doc["results"][0] == json.loads(json.dumps({f: expected[1][f] for f in wanted})), (date, d_fields)
+        else:
+            assert actual == expected, date
+    run()
+
+
+def check_life_path(examples):
+    from hypothesis import given, settings, strategies as st
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(st.dates())
+    def run(date):
+        args = (date.day, date.month, date.year)
+        assert numerology.life_path_number(*args) == reference.life_path_number(*args), date
+    run()
+
+
+def check_cached_lookups(examples):
+    from hypothesis import given, settings
+
+    import index
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(name_strategy(), date_strategy())
+    def run(name, date):
+        # Twice: once computed, once served from the cache
+        for _ in range(2):
+            expected = outcome(lambda: {
+                "pythagorean": reference.reduce_to_single_digit(
+                    reference.calculate_numerology(name, numerology.pythagorean)),
+                "chaldean": reference.reduce_to_single_digit(
+                    reference.calculate_numerology(name, numerology.chaldean)),
+            })
+            assert outcome(index.lookup_name_numbers, name) == expected, name
+            if reference.is_valid_date(*date):
+                assert index.lookup_lo_shu_grid(*date) == reference.generate_lo_shu_grid(*date), date
+    run()
+
+
+def check_live_score(examples):
+    from hypothesis import given, settings, strategies as st
+
+    from live_score import LiveScore
+
+    ops = st.lists(st.one_of(
+        st.tuples(st.just("append"), name_strategy()),
+        st.tuples(st.just("delete"), st.integers(0, 5)),
+        st.tuples(st.just("reset"), name_strategy()),
+    ), max_size=20)
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(ops)
+    def run(operations):
+        live = LiveScore()
+        text = ""
+        for op, arg in operations:
+            if op == "append":
+                live.apply({"op": op, "text": arg})
+                text += arg
+            elif op == "delete":
+                live.apply({"op": op, "count": arg})
+                text = text[:max(0, len(text) - arg)]
+            else:
+                live.apply({"op": op, "text": arg})
+                text = arg
+        state = live.state()
+        expected = [outcome(reference.calculate_numerology, text, m) for m in MAPPINGS.values()]
+        if any(kind == "error" for kind, _ in expected):
+            assert state["pythagorean"] is None and state["chaldean"] is None, text
+        else:
+            assert (state["pythagorean"], state["chaldean"]) == tuple(
+                reference.reduce_to_single_digit(v) for _, v in expected), text
+    run()
+
+
+def check_lo_shu_bundle(examples):
+    from hypothesis import given, settings, strategies as st
+
+    import index
+
+    if index.LO_SHU_BUNDLE is None:
+        print("  (no Lo Shu bundle loaded; skipped)")
+        return
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(st.dates(min_value=lo_shu_bundle_first(), max_value=lo_shu_bundle_last()))
+    def run(date):
+        with index.app.test_request_context():
+            expected = index.render_page(
+                index.LO_SHU_PAGE, grid_data=reference.generate_lo_shu_grid(date.day, date.month, date.year),
+                day=date.day, month=date.month, year=date.year, error_message=None)
+        assert index.LO_SHU_BUNDLE.page(date.day, date.month, date.year) == expected, date
+    run()
+
+
+def check_name_stats(examples):
+    from hypothesis import given, settings, strategies as st
+
+    import name_stats
+
+    @settings(max_examples=max(1, examples // 10), deadline=None, database=None)
+    @given(st.lists(name_strategy(), max_size=50), st.integers(1, 7))
+    def run(names, chunk_size):
+        # Chunked and merged counting must equal one reference pass
+        dist = name_stats.NameDistribution()
+        for chunk in name_stats.chunked(names, chunk_size):
+            dist.merge(name_stats.count_chunk(chunk))
+        expected = name_stats.NameDistribution()
+        for name in names:
+            try:
+                totals = [reference.calculate_numerology(name, m) for m in MAPPINGS.values()]
+            except KeyError:
+                expected.unsupported += 1
+                continue
+            p, c = (min(t, name_stats.TOTAL_BINS - 1) for t in totals)
+            rp, rc = (reference.reduce_to_single_digit(t) for t in totals)
+            expected.count += 1
+            expected.totals[0, p] += 1
+            expected.totals[1, c] += 1
+            expected.reduced[0, rp] += 1
+            expected.reduced[1, rc] += 1
+            expected.joint_totals[p, c] += 1
+            expected.joint_reduced[rp, rc] += 1
+        assert dist.to_dict() == expected.to_dict(), names
+    run()
+
+
+def check_directory(examples):
+    import tempfile
+
+    from hypothesis import given, settings, strategies as st
+
+    import directory
+
+    people = st.lists(st.tuples(
+        st.text(alphabet=string.ascii_letters + " ", min_size=1, max_size=20),
+        st.dates(min_value=lo_shu_bundle_first(), max_value=lo_shu_bundle_last()),
+    ), max_size=150)
+    predicates = st.fixed_dictionaries({}, optional={
+        "life_path": st.lists(st.sampled_from([1, 2, 3, 4, 5, 6, 7, 8, 9, 11, 22, 33]), min_size=1, max_size=3),
+        "chaldean": st.integers(1, 33),
+        "present": st.lists(st.integers(1, 9), max_size=3),
+        "missing": st.lists(st.integers(1, 9), max_size=3),
+    })
+
+    @settings(max_examples=max(1, examples // 10), deadline=None, database=None)
+    @given(people, st.lists(st.integers(0, 149), max_size=10), predicates, st.integers(0, 160),
+           st.integers(0, 80))
+    def run(records, removed, criteria, offset, limit):
+        # Bitset queries must equal a scan of reference profiles
+        people_dir = directory.PeopleDirectory(capacity=1)
+        people_dir.add_many([(name, d.day, d.month, d.year) for name, d in records])
+        for person_id in removed:
+            people_dir.remove(person_id)
+        expected = []
+        for i, (name, d) in enumerate(records):
+            if i in removed:
+                continue
+            grid = reference.generate_lo_shu_grid(d.day, d.month, d.year)
+            profile = {
+                "life_path": reference.life_path_number(d.day, d.month, d.year),
+                "chaldean": reference.reduce_to_single_digit(reference.calculate_numerology(name, numerology.chaldean)),
+            }
+            if "life_path" in criteria and profile["life_path"] not in criteria["life_path"]:
+                continue
+            if "chaldean" in criteria and profile["chaldean"] != criteria["chaldean"]:
+                continue
+            if any(n not in grid["present_numbers"] for n in criteria.get("present", ())):
+                continue
+            if any(n in grid["present_numbers"] for n in criteria.get("missing", ())):
+                continue
+            expected.append(i)
+        assert people_dir.query(**criteria) == expected, criteria
+        assert people_dir.count(**criteria) == len(expected), criteria
+        page = people_dir.search(limit=limit, offset=offset, **criteria)
+        assert page == (len(expected), expected[offset:offset + limit]), (criteria, offset, limit)
+
+        # Two workers sharing a log: writes through either reach both, with the same ids
+        preload = [(name, d.day, d.month, d.year) for name, d in records[:len(records) // 2]]
+        rest = [(name, d.day, d.month, d.year) for name, d in records[len(records) // 2:]]
+        with tempfile.TemporaryDirectory() as tmp:
+            workers = []
+            for _ in range(2):
+                local = directory.PeopleDirectory(capacity=1)
+                local.add_many(preload)
+                workers.append(directory.SharedDirectory(os.path.join(tmp, "people.db"), local,
+                                                         reload_interval=0))
+            ids = workers[0].add_many(rest[:len(rest) // 2]) + workers[1].add_many(rest[len(rest) // 2:])
+            assert ids == list(range(len(preload), len(records))), ids
+            for i, person_id in enumerate(removed):
+                workers[i % 2].remove(person_id)
+            for worker in workers:
+                assert worker.search(limit=limit, offset=offset, **criteria) == page, criteria
+                assert len(worker) == len(people_dir)
+    run()
+
+
+def check_brand_names(examples):
+    import itertools
+
+    from hypothesis import given, settings, strategies as st
+
+    import brand_names
+
+    word = st.text(alphabet=string.ascii_letters, min_size=1, max_size=6)
+    # Occasionally long enough for totals past the reduce table
+    word = st.one_of(word, word, word, st.builds(lambda w, n: w * n, word, st.integers(300, 2000)),
+                     st.sampled_from(["", " ", "\t "]))
+    target = st.one_of(st.none(), st.sampled_from(brand_names.TARGETS))
+
+    # A master number reached only by a total above 10000 (10017 + 2 = 10019)
+    assert [r["pythagorean_total"] for r in brand_names.generate(["I" * 1113 + "B"], pythagorean_target=11)] \
+        == [10019]
+
+    @settings(max_examples=max(1, examples // 5), deadline=None, database=None)
+    @given(st.lists(word, min_size=1, max_size=8), st.lists(word, max_size=2), st.lists(word, max_size=2),
+           st.integers(1, 2), target, target, st.sampled_from([5, 40, brand_names.MAX_STEPS]))
+    def run(words, prefixes, suffixes, words_per_name, p_target, c_target, max_steps):
+        # The pruned best-first search finds exactly the brute-force matches, cheapest first
+        search = brand_names.generate(words, prefixes, suffixes, words_per_name, p_target, c_target,
+                                      max_steps=max_steps)
+        # Blank entries are dropped rather than becoming empty words
+        words, prefixes, suffixes = (list(dict.fromkeys(item.strip() for item in items if item.strip()))
+                                     for items in (words, prefixes, suffixes))
+        if not words:
+            assert list(search) == []
+            return
+        expected = []
+        for prefix in prefixes or [""]:
+            for combo in itertools.product(words, repeat=words_per_name):
+                if len({w.lower() for w in combo}) < words_per_name:
+                    continue
+                for suffix in suffixes or [""]:
+                    name = prefix + " ".join(combo) + suffix
+                    p, c = (reference.reduce_to_single_digit(reference.calculate_numerology(name, m))
+                            for m in MAPPINGS.values())
+                    if p_target in (None, p) and c_target in (None, c):
+                        expected.append((sum(ch.isalpha() for ch in name), name))
+        actual = [(r["length"], r["name"]) for r in search]
+        if search.truncated:
+            # A truncated search still returns true matches, cheapest first
+            assert set(actual) <= set(expected), (words, actual)
+            assert [cost for cost, _ in actual] == sorted(cost for cost, _ in actual)
+            return
+        assert sorted(actual) == sorted(expected), (words, prefixes, suffixes)
+        assert [cost for cost, _ in actual] == sorted(cost for cost, _ in expected)
+    run()
+
+
+def check_incremental(examples):
+    import os
+    import tempfile
+
+    from hypothesis import given, settings, strategies as st
+
+    import incremental
+
+    row = st.tuples(st.sampled_from(["1", "2", "3", "4"]), name_strategy().map(str.strip),
+                    date_strategy().map(lambda date: tuple(map(str, date))))
+
+    def expected(name, date):
+        values = []
+        try:
+            values += [str(reference.reduce_to_single_digit(reference.calculate_numerology(name, mapping)))
+                       for mapping in MAPPINGS.values()]
+            error = []
+        except KeyError:
+            values += ["", ""]
+            error = ["Name contains unsupported characters"]
+        try:
+            grid = reference.generate_lo_shu_grid(*map(int, date))
+            values += [str(reference.life_path_number(*map(int, date))),
+                       "".join(map(str, grid["missing_numbers"]))]
+        except ValueError:
+            values += ["", ""]
+            error.append("Invalid date")
+        return tuple(values + ["; ".join(error)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "manifest")
+
+        @settings(max_examples=max(1, examples // 5), deadline=None, database=None)
+        @given(st.lists(row, max_size=30), st.lists(row, max_size=30), st.booleans())
+        def run(before, after, keyed):
+            # Results after an incremental run equal scoring every row from scratch
+            if os.path.exists(path):
+                os.unlink(path)
+            for rows in (before, after):
+                keys = [key for key, _, _ in rows] if keyed else None
+                records, report = incremental.rescore([name for _, name, _ in rows], [date for _, _, date in rows],
+                                                      incremental.read_manifest(path)[0], keys)
+                incremental.write_manifest(path, records)
+            assert report["skipped"] + report["recomputed"] == len(after)
+            identity = (lambda r: r) if keyed else (lambda r: r[1:])
+            assert report["skipped"] == sum(1 for r in after if identity(r) in set(map(identity, before)))
+            actual = list(incremental.output_columns(records))
+            assert actual == [expected(name, date) for _, name, date in after], after
+        run()
+
+        # Results stored by a different engine are never reused, even for unchanged rows
+        source, output = os.path.join(tmp, "input.csv"), os.path.join(tmp, "output.csv")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("id,name,day,month,year\n1,Ada Lovelace,10,12,1815\n2,Alan Turing,23,6,1912\n")
+        os.unlink(path)
+        assert incremental.run(source, path, output)["engine_changed"] is False
+        with open(output, encoding="utf-8") as f:
+            scored = f.read()
+        records, fingerprint = incremental.read_manifest(path)
+        assert fingerprint == incremental.engine_hash()
+        records["pythagorean"] = 0
+        incremental.write_manifest(path, records, b"\0" * 8)
+        report = incremental.run(source, path, output)
+        assert report["engine_changed"] and report["recomputed"] == 2 and report["changed"] == 2, report
+        with open(output, encoding="utf-8") as f:
+            assert f.read() == scored
+        assert incremental.run(source, path, output)["skipped"] == 2
+
+
+JS_RUNNER = """
+const engine = require(process.argv[1]);
+let input = '';
+process.stdin.on('data', chunk => input += chunk);
+process.stdin.on('end', () => {
+  const {names, numbers} = JSON.parse(input);
+  const scores = names.map(name => {
+    const result = engine.score(name);
+    return result === undefined ? 'server' : result;
+  });
+  process.stdout.write(JSON.stringify({scores, reduced: numbers.map(engine.reduce)}));
+});
+"""
+
+
+def check_js_engine(examples):
+    import json
+    import shutil
+    import subprocess
+    import tempfile
+
+    from hypothesis import given, settings
+
+    import js_engine
+
+    node = shutil.which("node")
+    if node is None:
+        print("  (node not found; skipped)")
+        return
+
+    names = [chr(code) for code in range(numerology.TABLE_SIZE + 64)]
+
+    @settings(max_examples=examples, deadline=None, database=None)
+    @given(name_strategy())
+    def collect(name):
+        names.append(name)
+    collect()
+    numbers = list(range(numerology.REDUCE_TABLE_SIZE + 1000)) + [10 ** 9 + 7, 2 ** 40]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine_path = os.path.join(tmp, "engine.js")
+        with open(engine_path, "w", encoding="utf-8") as f:
+            f.write(js_engine.build_source())
+        done = subprocess.run([node, "-e", JS_RUNNER, engine_path], input=json.dumps({"names": names, "numbers": numbers}),
+                              capture_output=True, text=True, check=True)
+    output = json.loads(done.stdout)
+
+    for name, actual in zip(names, output["scores"]):
+        if actual == "server":
+            # Only names with characters beyond the shipped tables go to the server
+            assert any(ord(c) >= numerology.TABLE_SIZE for c in name), name
+            continue
+        expected = {}
+        for system, mapping in MAPPINGS.items():
+            total = outcome(reference.calculate_numerology, name, mapping)
+            if total[0] == "error":
+                expected = None
+                break
+            expected[system] = reference.reduce_to_single_digit(total[1])
+        assert actual == expected, (name, actual, expected)
+    for number, actual in zip(numbers, output["reduced"]):
+        assert actual == reference.reduce_to_single_digit(number), (number, actual)
+
+
+def check_custom_tables(examples):
+    import tempfile
+
+    from hypothesis import given, settings, strategies as st
+
+    import custom_tables
+
+    extra_letters = "ØÞÆŒŁĐĦ"
+    mappings = st.fixed_dictionaries(
+        {letter: st.integers(0, custom_tables.MAX_VALUE) for letter in string.ascii_uppercase},
+        optional={letter: st.integers(0, custom_tables.MAX_VALUE) for letter in extra_letters})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tables.db")
+        # A tiny cache forces evictions; the second registry plays another worker
+        registry = custom_tables.TableRegistry(path, cache_size=2, reload_interval=0)
+        other = custom_tables.TableRegistry(path, cache_size=2, reload_interval=0)
+        registered = {}
+
+        @settings(max_examples=max(1, examples // 5), deadline=None, database=None)
+        @given(st.sampled_from(["acme", "globex"]), st.sampled_from(["a", "b", "c"]), mappings,
+               st.lists(name_strategy(), min_size=1, max_size=5))
+        def run(tenant, table_id, mapping, names):
+            record, _ = registry.register(tenant, table_id, mapping)
+            registered[(tenant, table_id, record["version"])] = record["mapping"]
+            for (t, i, version), stored in registered.items():
+                pinned = (registry.resolve(t, i, version), other.resolve(t, i, version))
+                for name in names:
+                    expected = outcome(reference.calculate_numerology, name, stored)
+                    for table in pinned:
+                        assert outcome(lambda: table.score(name)["total"]) == expected, (name, stored)
+            assert other.resolve(tenant, table_id).version == record["version"]
+        run()
+        # Ids straight from a JSON body are rejected, not looked up
+        for tenant, table_id in ((["acme"], "a"), ("acme", {"a": 1}), ("acme", None), ("a b", "a")):
+            assert outcome(registry.resolve, tenant, table_id) == ("error", "ValueError"), (tenant, table_id)
+
+
+def lo_shu_bundle_first():
+    import lo_shu_bundle
+    return lo_shu_bundle.FIRST_DATE
+
+
+def lo_shu_bundle_last():
+    import lo_shu_bundle
+    return lo_shu_bundle.LAST_DATE
+
+
+CHECKS = {
+    "calculate_numerology": check_calculate,
+    "reduce_to_single_digit": check_reduce,
+    "generate_lo_shu_grid": check_lo_shu,
+    "bulk Lo Shu": check_lo_shu_bulk,
+    "lazy results": check_lazy_results,
+    "life_path_number": check_life_path,
+    "cached lookups": check_cached_lookups,
+    "live scoring": check_live_score,
+    "Lo Shu bundle": check_lo_shu_bundle,
+    "name distributions": check_name_stats,
+    "people directory": check_directory,
+    "brand names": check_brand_names,
+    "JS engine": check_js_engine,
+    "incremental rescoring": check_incremental,
+    "custom tables": check_custom_tables,
+}
+
+
+def fuzz(examples, only=None, checks=None):
+    failures = 0
+    for label, check in (CHECKS if checks is None else checks).items():
+        if only and label not in only:
+            continue
+        print(f"fuzz {label} ...")
+        try:
+            check(examples)
+        except Exception as e:
+            failures += 1
+            print(f"  FAILED: {e!r}")
+        else:
+            print("  ok")
+    return failures
+
+
+# -- speed gate --------------------------------------------------------------
+
+def sample_inputs(seed=7):
+    rng = random.Random(seed)
+    words = ["Anna", "Maria", "Johnson", "Alexander", "Li", "Ng", "Fitzgerald", "O'Brien", "Smith-Jones"]
+    ascii_names = [" ".join(rng.sample(words, 2)) for _ in range(50)]
+    other_names = ["José Müller", "Александр Пушкин", "Ἀλέξανδρος", "דוד בן גוריון", "रामचन्द्र", "Nguyễn Văn An"]
+    numbers = [rng.randint(1, 400) for _ in range(50)]
+    dates = [(rng.randint(1, 28), rng.randint(1, 12), rng.randint(1900, 2100)) for _ in range(50)]
+    return ascii_names, other_names, numbers, dates
+
+
+def benchmarks():
+    import lo_shu_bulk
+
+    ascii_names, other_names, numbers, dates = sample_inputs()
+    many_dates = dates * 40
+    p = numerology.pythagorean
+    return [
+        ("calculate_numerology (ASCII)",
+         lambda: [numerology.calculate_numerology(n, p) for n in ascii_names],
+         lambda: [reference.calculate_numerology(n, p) for n in ascii_names]),
+        ("calculate_numerology (other scripts)",
+         lambda: [numerology.calculate_numerology(n, p) for n in other_names],
+         lambda: [reference.calculate_numerology(n, p) for n in other_names]),
+        ("reduce_to_single_digit",
+         lambda: [numerology.reduce_to_single_digit(n) for n in numbers],
+         lambda: [reference.reduce_to_single_digit(n) for n in numbers]),
+        ("generate_lo_shu_grid",
+         lambda: [numerology.generate_lo_shu_grid(*d) for d in dates],
+         lambda: [reference.generate_lo_shu_grid(*d) for d in dates]),
+        ("LoShuResult (one field)",
+         lambda: [numerology.LoShuResult(*d).to_dict(("missing_numbers",)) for d in dates],
+         lambda: [reference.generate_lo_shu_grid(*d) for d in dates]),
+        ("lo_shu_grids (2000 dates)",
+         lambda: lo_shu_bulk.lo_shu_grids(many_dates),
+         lambda: [reference.generate_lo_shu_grid(*d) for d in many_dates]),
+    ]
+
+
+def best_time(fn, repeat=7):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def gate(min_speedup):
+    failures = 0
+    print(f"{'path':<40} {'optimized':>12} {'reference':>12} {'speedup':>8}")
+    for label, optimized, baseline in benchmarks():
+        fast = best_time(optimized)
+        slow = best_time(baseline)
+        speedup = slow / fast
+        status = "ok" if speedup >= min_speedup else "FAIL"
+        if status == "FAIL":
+            failures += 1
+        print(f"{label:<40} {fast * 1e6:>10.1f}us {slow * 1e6:>10.1f}us {speedup:>7.2f}x {status}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check optimized engines against the reference")
+    parser.add_argument("command", nargs="?", choices=["fuzz", "gate", "all"], default="all")
+    parser.add_argument("--examples", type=int, default=500, help="Hypothesis examples per check")
+    parser.add_argument("--only", action="append", help="Run only the named fuzz check (repeatable)")
+    parser.add_argument("--min-speedup", type=float, default=1.0,
+                        help="Fail the gate when an optimized path is slower than this ratio")
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+
+    failures = 0
+    if args.command in ("fuzz", "all"):
+        failures += fuzz(args.examples, args.only)
+    if args.command in ("gate", "all"):
+        failures += gate(args.min_speedup)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Load generator for the numerology app.
+
+Drives the Flask app either in-process (through the WSGI test client) or
+against a running server, sweeping concurrency levels and reporting
+throughput plus p50/p95/p99 latency per route.
+
+Examples:
+
+    # in-process, default mix, sweep 1/4/16/64 workers
+    python tools/loadtest.py
+
+    # against a local server, replaying a recorded corpus
+    python tools/loadtest.py --url http://127.0.0.1:5000 --corpus traffic.jsonl
+
+    # write a synthetic corpus to replay later
+    python tools/loadtest.py --record traffic.jsonl --requests 5000
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+
+# Default traffic shape: route name -> relative weight
+DEFAULT_MIX = {"home": 1, "name": 6, "lo_shu": 3}
+
+SYLLABLES = ["an", "bel", "cor", "da", "el", "fin", "ga", "hal", "is", "jo",
+             "ka", "lin", "mar", "na", "or", "pe", "qui", "ra", "sa", "tor",
+             "ul", "vi", "wen", "xa", "yo", "zel"]
+
+
+def random_name(rng):
+    """Build a plausible two-part name from random syllables"""
+    parts = []
+    for _ in range(2):
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+        parts.append(word.capitalize())
+    return " ".join(parts)
+
+
+def random_request(rng, route):
+    """Create one corpus entry for the given route"""
+    if route == "home":
+        return {"route": "home", "method": "GET", "path": "/", "form": None}
+    if route == "name":
+        return {"route": "name", "method": "POST", "path": "/name-calculator",
+                "form": {"name": random_name(rng)}}
+    if route == "lo_shu":
+        year = rng.randint(1900, 2100)
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 28)
+        return {"route": "lo_shu", "method": "POST", "path": "/lo-shu-grid",
+                "form": {"day": str(day), "month": str(month), "year": str(year)}}
+    raise ValueError(f"Unknown route: {route}")
+
+
+def generate_corpus(count, mix, seed):
+    """Generate a synthetic request corpus following the route mix"""
+    rng = random.Random(seed)
+    routes = list(mix)
+    weights = [mix[r] for r in routes]
+    return [random_request(rng, rng.choices(routes, weights)[0]) for _ in range(count)]
+
+
+def load_corpus(path):
+    """Load a recorded corpus (one JSON request per line)"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_corpus(path, corpus):
+    """Write a corpus as JSON lines so it can be replayed later"""
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in corpus:
+            f.write(json.dumps(entry) + "\n")
+
+
+def parse_mix(text):
+    """Parse a mix spec such as 'home=1,name=6,lo_shu=3'"""
+    mix = {}
+    for part in text.split(","):
+        route, _, weight = part.partition("=")
+        mix[route.strip()] = float(weight)
+    for route in mix:
+        if route not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown route in mix: {route}")
+    return mix
+
+
+class InProcessClient:
+    """Sends corpus entries to the WSGI app through Flask's test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, entry):
+        if entry["method"] == "GET":
+            response = self.client.get(entry["path"])
+        else:
+            response = self.client.post(entry["path"], data=entry["form"])
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient:
+    """Sends corpus entries to a running server over a keep-alive connection"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.conn = None
+
+    def send(self, entry):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        body = None
+        headers = {}
+        if entry["form"] is not None:
+            body = urlencode(entry["form"])
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            self.conn.request(entry["method"], self.prefix + entry["path"], body, headers)
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def run_level(make_client, corpus, concurrency, total_requests):
+    """Run total_requests from the corpus with the given number of workers"""
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        client = make_client()
+        local_latencies = {}
+        local_errors = {}
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            entry = corpus[i % len(corpus)]
+            route = entry["route"]
+            start = time.perf_counter()
+            try:
+                status = client.send(entry)
+                failed = status >= 500
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - start
+            local_latencies.setdefault(route, []).append(elapsed)
+            if failed:
+                local_errors[route] = local_errors.get(route, 0) + 1
+        with lock:
+            for route, values in local_latencies.items():
+                latencies.setdefault(route, []).extend(values)
+            for route, count in local_errors.items():
+                errors[route] = errors.get(route, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    routes = {}
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors.get(route, 0),
+            "throughput": len(values) / wall,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return {
+        "concurrency": concurrency,
+        "requests": sum(r["requests"] for r in routes.values()),
+        "wall_seconds": wall,
+        "throughput": sum(r["requests"] for r in routes.values()) / wall,
+        "routes": routes,
+    }
+
+
+def print_report(results, target):
+    """Print a plain-text table of one sweep"""
+    print(f"Target: {target}")
+    header = f"{'conc':>5}  {'route':<8} {'reqs':>7} {'errs':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for level in results:
+        for route, stats in level["routes"].items():
+            print(f"{level['concurrency']:>5}  {route:<8} {stats['requests']:>7} {stats['errors']:>5} "
+                  f"{stats['throughput']:>9.1f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+        print(f"{level['concurrency']:>5}  {'total':<8} {level['requests']:>7} {'':>5} {level['throughput']:>9.1f}")
+        print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the numerology app")
+    parser.add_argument("--url", help="Base URL of a running server (default: drive the app in-process)")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        help="Comma-separated concurrency levels to sweep (default: 1,4,16,64)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Route weights, e.g. home=1,name=6,lo_shu=3")
+    parser.add_argument("--corpus", help="Replay requests from a JSON-lines corpus file")
+    parser.add_argument("--record", help="Write the generated corpus to this file and exit")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed for the synthetic corpus")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests sent before the sweep")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = generate_corpus(args.requests, args.mix, args.seed)
+    if args.record:
+        save_corpus(args.record, corpus)
+        print(f"Wrote {len(corpus)} requests to {args.record}")
+        return 0
+    if not corpus:
+        parser.error("corpus is empty")
+
+    if args.url:
+        target = args.url
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        sys.path.insert(0, API_DIR)
+        import logging
+        from index import app
+        # Per-request debug logging would dominate the measurements
+        logging.getLogger().setLevel(logging.WARNING)
+        target = "in-process WSGI"
+        make_client = lambda: InProcessClient(app)
+
+    if args.warmup:
+        run_level(make_client, corpus, 1, args.warmup)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    results = [run_level(make_client, corpus, level, args.requests) for level in levels]
+
+    if args.json:
+        print(json.dumps({"target": target, "levels": results}, indent=2))
+    else:
+        print_report(results, target)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
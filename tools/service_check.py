@@ -0,0 +1,361 @@
+"""Checks for the serving machinery around the numerology engines.
+
+These run the pieces that keep the service up under load and failure
+against local stand-ins, with random inputs and schedules:
+
+- background jobs: a worker dies mid-job and another resumes it from the
+  last committed chunk
+- remote cache: the sharded client against two local cache servers, with
+  pool exhaustion and a node going down
+- admission: load shedding, queue timeouts, cancellation hand-off and
+  request coalescing in the ASGI front end
+
+    pip install -r requirements-dev.txt
+    python tools/service_check.py --examples 500
+    python tools/service_check.py --only admission
+
+Exit status is non-zero when any check fails. Differential checks of the
+engines themselves are in tools/engine_check.py.
+"""
+import argparse
+import logging
+import sys
+
+from engine_check import MAPPINGS, date_strategy, fuzz, name_strategy, reference
+
+
+def check_jobs(examples):
+    import json
+    import tempfile
+
+    from hypothesis import given, settings, strategies as st
+
+    import jobs
+
+    def expected_name(name):
+        try:
+            return {"name": name, **{system: reference.reduce_to_single_digit(
+                reference.calculate_numerology(name, mapping)) for system, mapping in MAPPINGS.items()}}
+        except KeyError:
+            return {"name": name, "error": jobs.UNSUPPORTED_NAME}
+
+    def expected_date(row):
+        try:
+            return reference.generate_lo_shu_grid(*(int(v) for v in row))
+        except ValueError as e:
+            return {"error": str(e)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = jobs.JobStore(tmp)
+
+        @settings(max_examples=max(1, examples // 10), deadline=None, database=None)
+        @given(st.one_of(
+            st.tuples(st.just("names"), st.lists(name_strategy().filter(str.strip).map(str.strip),
+                                                 min_size=1, max_size=60)),
+            st.tuples(st.just("lo-shu"), st.lists(date_strategy().map(list), min_size=1, max_size=60)),
+        ), st.integers(1, 16), st.integers(0, 8), st.binary(max_size=20))
+        def run(job_input, chunk_size, crash_after, garbage):
+            # A worker commits some chunks, leaves uncommitted bytes and dies; another resumes
+            kind, rows = job_input
+            job = store.create(kind, rows)
+            first = jobs.JobRunner(store, workers=0, chunk_size=chunk_size)
+            first.owner = "first"
+            store.claim("first")
+            committed = min(crash_after * chunk_size, len(rows))
+            data = b"".join(jobs.score_chunk(kind, rows[i:i + chunk_size]) for i in range(0, committed, chunk_size))
+            with open(store.results_path(job["id"]), "r+b") as out:
+                out.write(data + garbage)
+            store.commit_progress(job["id"], "first", committed, len(data))
+            store._conn().execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", (job["id"],))
+
+            second = jobs.JobRunner(store, workers=0, chunk_size=chunk_size + 3)
+            second.owner = "second"
+            second.run(store.claim("second"))
+            assert store.status(job["id"])["status"] == "done"
+            with open(store.results_path(job["id"]), encoding="utf-8") as f:
+                actual = [json.loads(line) for line in f]
+            expected = [expected_name(row) if kind == "names" else expected_date(row) for row in rows]
+            # JSON object keys are strings (number_counts)
+            assert actual == json.loads(json.dumps(expected)), (kind, rows)
+            store.delete(job["id"])
+        run()
+
+
+def check_admission(examples):
+    import asyncio
+    import threading
+
+    from hypothesis import given, settings, strategies as st
+
+    import admission
+    import asgi
+
+    async def queue_full():
+        gate = asyncio.Event()
+        queue = admission.AdmissionQueue(1, max_queue=2, max_wait=10.0)
+        holders = [asyncio.ensure_future(queue.run(gate.wait)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert (queue.active, queue.queued) == (1, 2)
+        try:
+            await queue.run(gate.wait)
+            raise AssertionError("a full queue admitted a request")
+        except admission.Overloaded as e:
+            assert e.retry_after >= 1
+        gate.set()
+        await asyncio.gather(*holders)
+        assert (queue.active, queue.queued, queue.admitted, queue.shed) == (0, 0, 3, 1)
+
+    async def timeout():
+        gate = asyncio.Event()
+        queue = admission.AdmissionQueue(1, max_queue=4, max_wait=0.05)
+        holder = asyncio.ensure_future(queue.run(gate.wait))
+        await asyncio.sleep(0)
+        try:
+            await queue.run(gate.wait)
+            raise AssertionError("a request outlived max_wait in the queue")
+        except admission.Overloaded:
+            pass
+        assert (queue.active, queue.queued, queue.shed) == (1, 0, 1)
+        gate.set()
+        await holder
+        assert queue.active == 0
+
+    async def cancel_hand_off(granted):
+        # A waiter cancelled while queued, or just after the slot was handed to it,
+        # must leave the slot to the next waiter
+        gate = asyncio.Event()
+        queue = admission.AdmissionQueue(1, max_queue=4, max_wait=10.0)
+        ran = []
+
+        async def work(name):
+            ran.append(name)
+            await gate.wait()
+
+        await queue.acquire()
+        first = asyncio.ensure_future(queue.run(lambda: work("first")))
+        second = asyncio.ensure_future(queue.run(lambda: work("second")))
+        await asyncio.sleep(0)
+        assert queue.queued == 2
+        if granted:
+            queue.release()
+            first.cancel()
+        else:
+            first.cancel()
+            await asyncio.sleep(0)
+            queue.release()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert first.cancelled() and ran == ["second"], ran
+        assert (queue.active, queue.queued) == (1, 0)
+        gate.set()
+        await second
+        assert queue.active == 0
+
+    async def coalescing():
+        flight = admission.SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        callers = [asyncio.ensure_future(flight.do("key", compute)) for _ in range(20)]
+        await asyncio.sleep(0)
+        callers[0].cancel()
+        results = await asyncio.gather(*callers[1:])
+        assert results == [1] * 19 and len(calls) == 1 and flight.shared == 19 and len(flight) == 0
+        assert await flight.do("key", compute) == 2
+
+    async def request(app, path, query=b""):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": query,
+                 "headers": [], "http_version": "1.1"}
+        await app(scope, receive, send)
+        headers = dict(sent[0]["headers"])
+        return sent[0]["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+    async def through_app():
+        release = threading.Event()
+        calls = []
+
+        def wsgi(environ, start_response):
+            calls.append(environ["PATH_INFO"])
+            release.wait(5)
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [environ["PATH_INFO"].encode()]
+
+        app = asgi.ASGIApp(wsgi, threads=1)
+        app.admission = admission.AdmissionQueue(1, max_queue=1, max_wait=10.0)
+        # Identical page requests share one call and one queue slot
+        pages = [asyncio.ensure_future(request(app, "/name-calculator", b"name=Ada")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(request(app, "/about"))
+        await asyncio.sleep(0.05)
+        status, headers, _ = await request(app, "/other")
+        assert status == 503 and int(headers[b"retry-after"]) >= 1, (status, headers)
+        release.set()
+        assert [await page for page in pages] == [(200, {b"content-type": b"text/plain"}, b"/name-calculator")] * 5
+        assert (await queued)[0] == 200 and calls == ["/name-calculator", "/about"], calls
+        # Batch scoring is admitted like everything else
+        blocker = asyncio.ensure_future(app.admit(lambda: asyncio.sleep(0.1)))
+        await asyncio.sleep(0)
+        app.admission.max_wait = 0.01
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b'{"names": ["Ada"]}', "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await app({"type": "http", "method": "POST", "path": "/api/name-numbers", "query_string": b"",
+                   "headers": [], "http_version": "1.1"}, receive, send)
+        assert sent[0]["status"] == 503, sent
+        await blocker
+        app.shutdown()
+
+    asyncio.run(queue_full())
+    asyncio.run(timeout())
+    asyncio.run(cancel_hand_off(granted=False))
+    asyncio.run(cancel_hand_off(granted=True))
+    asyncio.run(coalescing())
+    asyncio.run(through_app())
+
+    # Random arrivals, hold times and cancellations never break the bookkeeping
+    job = st.tuples(st.integers(0, 5), st.integers(0, 8), st.one_of(st.none(), st.integers(0, 10)))
+
+    @settings(max_examples=max(1, examples // 5), deadline=None, database=None)
+    @given(st.integers(1, 4), st.integers(1, 6), st.lists(job, max_size=30))
+    def run(concurrency, max_queue, jobs):
+        async def scenario():
+            queue = admission.AdmissionQueue(concurrency, max_queue=max_queue, max_wait=10.0)
+            running = [0]
+
+            async def work(hold):
+                running[0] += 1
+                assert running[0] <= concurrency
+                try:
+                    for _ in range(hold):
+                        await asyncio.sleep(0)
+                finally:
+                    running[0] -= 1
+
+            async def client(delay, hold, cancel_after):
+                for _ in range(delay):
+                    await asyncio.sleep(0)
+                task = asyncio.ensure_future(queue.run(lambda: work(hold)))
+                if cancel_after is not None:
+                    for _ in range(cancel_after):
+                        await asyncio.sleep(0)
+                    task.cancel()
+                try:
+                    await task
+                    return "done"
+                except admission.Overloaded:
+                    return "shed"
+                except asyncio.CancelledError:
+                    return "cancelled"
+
+            outcomes = await asyncio.gather(*(client(*j) for j in jobs))
+            assert (queue.active, queue.queued, running[0]) == (0, 0, 0)
+            assert queue.shed == outcomes.count("shed")
+            assert queue.admitted >= outcomes.count("done")
+        asyncio.run(scenario())
+    run()
+
+
+def check_remote_cache(examples):
+    import threading
+    import time
+
+    from hypothesis import given, settings, strategies as st
+
+    import remote_cache
+
+    def serve():
+        server = remote_cache.CacheServer(("127.0.0.1", 0), 10000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    servers = [serve(), serve()]
+    nodes = [f"127.0.0.1:{server.server_address[1]}" for server in servers]
+    client = remote_cache.ShardedCacheClient(nodes, pool_size=2, timeout=0.5, retry_after=60.0)
+    values = st.one_of(
+        st.builds(lambda p, c: {"pythagorean": p, "chaldean": c}, st.integers(1, 33), st.integers(1, 33)),
+        st.dates().map(lambda date: reference.generate_lo_shu_grid(date.day, date.month, date.year)),
+    )
+    try:
+        @settings(max_examples=max(1, examples // 10), deadline=None, database=None)
+        @given(st.dictionaries(name_strategy().map(lambda name: "name:" + name.encode("utf-8", "replace").decode()),
+                               values, min_size=1, max_size=30))
+        def run(items):
+            # Round trip through both nodes, singly and batched
+            client.set_many(items)
+            assert client.get_many(list(items)) == items
+            key = next(iter(items))
+            client.set(key, items[key])
+            assert client.get(key) == items[key]
+            assert client.get("name:never stored") is None
+        run()
+        keys = {node: [] for node in nodes}
+        for i in range(200):
+            keys[client.ring.node_for(f"key:{i}")].append(f"key:{i}")
+        items = {f"key:{i}": {"n": i} for i in range(200)}
+        client.set_many(items)
+
+        # Pool exhaustion: a miss for that call only, the node stays up
+        pool = client.pools[nodes[0]]
+        held = [pool.acquire(), pool.acquire()]
+        start = time.monotonic()
+        assert client.get(keys[nodes[0]][0]) is None
+        assert time.monotonic() - start < 2.0
+        assert client.exhausted == 1 and pool.available()
+        for conn in held:
+            pool.release(conn)
+        assert client.get(keys[nodes[0]][0]) == items[keys[nodes[0]][0]]
+
+        # Node down: its keys miss (and it is skipped), the other node still answers
+        servers[0].shutdown()
+        servers[0].server_close()
+        for conn in list(pool._idle.queue):
+            conn.sock.shutdown(2)
+        found = client.get_many(list(items))
+        assert found == {key: items[key] for key in keys[nodes[1]]}, len(found)
+        assert not pool.available()
+        start = time.monotonic()
+        assert client.get_many(keys[nodes[0]]) == {}
+        assert time.monotonic() - start < 0.1
+        client.set_many(items)
+        assert client.get_many(keys[nodes[1]]) == {key: items[key] for key in keys[nodes[1]]}
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+CHECKS = {
+    "background jobs": check_jobs,
+    "remote cache": check_remote_cache,
+    "admission": check_admission,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check job, cache and admission machinery")
+    parser.add_argument("--examples", type=int, default=500, help="Hypothesis examples per check")
+    parser.add_argument("--only", action="append", help="Run only the named check (repeatable)")
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    return 1 if fuzz(args.examples, args.only, CHECKS) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Report per-process memory for a preforking server.
+
+Reads /proc (Linux only) for a master process and its children and prints
+RSS, PSS and shared/private pages per worker. PSS splits shared pages
+between the processes that map them, so the PSS total is the real memory
+cost of the whole server; a large gap between RSS and PSS means workers are
+sharing the master's copy-on-write pages as intended.
+
+    python tools/worker_rss.py <master-pid>
+    python tools/worker_rss.py $(cat /tmp/numerology.pid) --json
+"""
+import argparse
+import json
+import os
+import sys
+
+FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+}
+
+
+def read_memory(pid):
+    """Return memory counters (in kB) for one process from smaps_rollup"""
+    stats = {"pid": pid}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in FIELDS:
+                    stats[FIELDS[key]] = int(rest.split()[0])
+    except FileNotFoundError:
+        # Older kernels without smaps_rollup: fall back to VmRSS only
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    stats["rss_kb"] = int(line.split()[1])
+    return stats
+
+
+def child_pids(pid):
+    """Direct children of a process"""
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/children") as f:
+                children.extend(int(p) for p in f.read().split())
+        except FileNotFoundError:
+            continue
+    return sorted(set(children))
+
+
+def report(master_pid):
+    master = read_memory(master_pid)
+    workers = [read_memory(pid) for pid in child_pids(master_pid)]
+    total_rss = master.get("rss_kb", 0) + sum(w.get("rss_kb", 0) for w in workers)
+    total_pss = master.get("pss_kb", 0) + sum(w.get("pss_kb", 0) for w in workers)
+    return {"master": master, "workers": workers, "total_rss_kb": total_rss, "total_pss_kb": total_pss}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-worker RSS/PSS report")
+    parser.add_argument("pid", type=int, help="Master process ID")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    data = report(args.pid)
+    if args.json:
+        print(json.dumps(data, indent=2))
+        return 0
+    print(f"{'role':<7} {'pid':>7} {'rss MB':>8} {'pss MB':>8} {'shared MB':>10} {'private MB':>11}")
+    rows = [("master", data["master"])] + [("worker", w) for w in data["workers"]]
+    for role, m in rows:
+        shared = m.get("shared_clean_kb", 0) + m.get("shared_dirty_kb", 0)
+        private = m.get("private_clean_kb", 0) + m.get("private_dirty_kb", 0)
+        print(f"{role:<7} {m['pid']:>7} {m.get('rss_kb', 0) / 1024:>8.1f} {m.get('pss_kb', 0) / 1024:>8.1f} "
+              f"{shared / 1024:>10.1f} {private / 1024:>11.1f}")
+    print(f"{len(data['workers'])} workers: total RSS {data['total_rss_kb'] / 1024:.1f} MB, "
+          f"total PSS {data['total_pss_kb'] / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())